@@ -1,8 +1,13 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
+from django.core.exceptions import PermissionDenied
+from django.http import Http404, HttpResponse
+from django.urls import path, reverse
+from django.utils.html import format_html
 from .models import (
     User, Skill, Category, JobPosting, WorkerProfile, 
-    Application, Review, PaymentTransaction
+    Application, Review, PaymentTransaction, UserRatingSummary, LedgerEntry, BalanceSnapshot,
+    RequestProfile, SlowQuery
 )
 
 @admin.register(User)
@@ -48,11 +53,12 @@ class JobPostingAdmin(admin.ModelAdmin):
 
 @admin.register(WorkerProfile)
 class WorkerProfileAdmin(admin.ModelAdmin):
-    list_display = ('user', 'title', 'hourly_rate', 'currency', 'experience_years')
+    list_display = ('user', 'title', 'hourly_rate', 'currency', 'experience_years', 'score')
     list_filter = ('currency', 'availability', 'created_at')
     search_fields = ('user__email', 'title', 'bio')
     ordering = ('-created_at',)
     filter_horizontal = ('skills',)
+    readonly_fields = ('score', 'score_updated_at')
 
 @admin.register(Application)
 class ApplicationAdmin(admin.ModelAdmin):
@@ -72,6 +78,72 @@ class ReviewAdmin(admin.ModelAdmin):
 class PaymentTransactionAdmin(admin.ModelAdmin):
     list_display = ('reference_id', 'transaction_type', 'status', 'amount', 'currency', 'created_at')
     list_filter = ('transaction_type', 'status', 'currency', 'created_at')
-    search_fields = ('reference_id', 'sender__email', 'receiver__email')
+    search_fields = ('reference_id', 'legacy_reference_id', 'sender__email', 'receiver__email')
     ordering = ('-created_at',)
-    readonly_fields = ('reference_id',)
+    readonly_fields = ('reference_id', 'legacy_reference_id')
+
+@admin.register(UserRatingSummary)
+class UserRatingSummaryAdmin(admin.ModelAdmin):
+    list_display = ('user', 'review_count', 'average_rating', 'last_review_at')
+    search_fields = ('user__email',)
+    ordering = ('-review_count',)
+    readonly_fields = ('user', 'review_count', 'rating_sum', 'rating_1', 'rating_2',
+                       'rating_3', 'rating_4', 'rating_5', 'last_review_at')
+
+@admin.register(LedgerEntry)
+class LedgerEntryAdmin(admin.ModelAdmin):
+    list_display = ('id', 'transaction', 'user', 'amount', 'currency', 'created_at')
+    list_filter = ('currency', 'created_at')
+    search_fields = ('transaction__reference_id', 'user__email')
+    ordering = ('-id',)
+    readonly_fields = ('transaction', 'user', 'amount', 'currency', 'created_at')
+
+@admin.register(BalanceSnapshot)
+class BalanceSnapshotAdmin(admin.ModelAdmin):
+    list_display = ('user', 'currency', 'balance', 'last_entry_id', 'created_at')
+    list_filter = ('currency',)
+    search_fields = ('user__email',)
+    ordering = ('-last_entry_id',)
+
+@admin.register(RequestProfile)
+class RequestProfileAdmin(admin.ModelAdmin):
+    list_display = ('created_at', 'method', 'path', 'view', 'trigger', 'status_code',
+                    'duration_ms', 'query_count', 'db_ms', 'download_link')
+    list_filter = ('trigger', 'view')
+    search_fields = ('path', 'view')
+    ordering = ('-created_at',)
+    exclude = ('stats',)
+    readonly_fields = ('method', 'path', 'view', 'user', 'trigger', 'status_code', 'duration_ms',
+                       'query_count', 'db_ms', 'report', 'queries', 'created_at', 'download_link')
+
+    def get_urls(self):
+        return [
+            path('<path:object_id>/download/', self.admin_site.admin_view(self.download_view),
+                 name='api_requestprofile_download'),
+        ] + super().get_urls()
+
+    def download_view(self, request, object_id):
+        """The raw pstats dump, for python -m pstats or snakeviz"""
+        profile = self.get_object(request, object_id)
+        if profile is None:
+            raise Http404
+        if not self.has_view_permission(request, profile):
+            raise PermissionDenied
+        response = HttpResponse(bytes(profile.stats), content_type='application/octet-stream')
+        response['Content-Disposition'] = f'attachment; filename="profile-{profile.pk}.prof"'
+        return response
+
+    @admin.display(description='pstats')
+    def download_link(self, obj):
+        if obj.pk is None:
+            return ''
+        return format_html('<a href="{}">Download</a>', reverse('admin:api_requestprofile_download', args=[obj.pk]))
+
+@admin.register(SlowQuery)
+class SlowQueryAdmin(admin.ModelAdmin):
+    list_display = ('created_at', 'duration_ms', 'view', 'database', 'shape')
+    list_filter = ('view', 'database')
+    search_fields = ('sql', 'view', 'path', 'fingerprint')
+    ordering = ('-created_at',)
+    readonly_fields = ('database', 'view', 'method', 'path', 'duration_ms', 'sql', 'shape',
+                       'fingerprint', 'params', 'plan', 'created_at')
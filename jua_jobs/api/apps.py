@@ -4,3 +4,10 @@ from django.apps import AppConfig
 class ApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'api'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+        from .utils import sqlite  # noqa: F401  (connection_created pragmas)
+        from .utils.african_validators import get_registry
+        # Compile country and provider rules once, before the first request
+        get_registry()
@@ -0,0 +1,86 @@
+"""
+JWT authentication that resolves users from the cache.
+
+simplejwt's JWTAuthentication loads the user row on every request. Here the
+fields needed for authentication and role checks are cached per user id for
+JWT_USER_CACHE_TTL seconds, so authenticated reads don't touch api_user.
+Entries are dropped whenever a User is saved or deleted (see api/signals.py);
+bulk ``update()`` calls bypass signals, and the short TTL bounds staleness.
+Access tokens are also checked against the revocation store (see
+api/utils/revocation.py), which answers from memory for unrevoked tokens.
+"""
+import logging
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+
+from .utils.revocation import is_token_revoked
+
+logger = logging.getLogger('api')
+
+# Everything except the password hash and last_login; other fields load lazily if touched
+CACHED_USER_FIELDS = (
+    'id', 'email', 'username', 'first_name', 'last_name', 'role', 'is_active', 'is_staff',
+    'is_superuser', 'phone_number', 'country', 'city', 'email_verified', 'phone_verified', 'date_joined',
+)
+
+def _cached_fields(user_model):
+    # from_db() expects values in concrete field order
+    return tuple(field.attname for field in user_model._meta.concrete_fields if field.attname in CACHED_USER_FIELDS)
+
+def user_cache_key(user_id):
+    return f'auth_user:{user_id}'
+
+def invalidate_cached_user(user_id):
+    try:
+        cache.delete(user_cache_key(user_id))
+    except Exception:
+        logger.warning('Could not invalidate cached user %s', user_id, exc_info=True)
+
+class CachedJWTAuthentication(JWTAuthentication):
+
+    def get_validated_token(self, raw_token):
+        validated_token = super().get_validated_token(raw_token)
+        # Bloom filter check; only possible hits touch the database
+        if is_token_revoked(validated_token):
+            raise InvalidToken(_("Token has been revoked"))
+        return validated_token
+
+    def get_user(self, validated_token):
+        if api_settings.CHECK_REVOKE_TOKEN:
+            # Revocation compares the password hash, which is never cached
+            return super().get_user(validated_token)
+
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+
+        key = user_cache_key(user_id)
+        fields = _cached_fields(self.user_model)
+        try:
+            values = cache.get(key)
+        except Exception:
+            # Cache outage: authenticate against the database as usual
+            logger.warning('User cache unavailable', exc_info=True)
+            return super().get_user(validated_token)
+
+        if values is None or len(values) != len(fields):
+            # Miss, or an entry written before the cached field list changed
+            user = super().get_user(validated_token)
+            try:
+                cache.set(key, tuple(getattr(user, field) for field in fields),
+                          settings.JWT_USER_CACHE_TTL)
+            except Exception:
+                logger.warning('User cache unavailable', exc_info=True)
+            return user
+
+        user = self.user_model.from_db(DEFAULT_DB_ALIAS, fields, values)
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+        return user
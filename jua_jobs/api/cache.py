@@ -0,0 +1,31 @@
+from django_redis.cache import RedisCache
+
+from .utils.metrics import record_cache_lookup
+
+_MISSING = object()
+
+class InstrumentedRedisCache(RedisCache):
+    """django-redis cache that counts hits and misses for /metrics (an outage counts as misses)"""
+
+    def get(self, key, default=None, version=None, client=None):
+        try:
+            value = super().get(key, _MISSING, version=version, client=client)
+        except Exception:
+            # Redis unreachable; the caller decides how to carry on
+            record_cache_lookup(0, 1)
+            raise
+        # A cached None is indistinguishable from a miss for callers, so count it as one
+        hit = value is not _MISSING and value is not None
+        record_cache_lookup(int(hit), int(not hit))
+        return value if hit else default
+
+    def get_many(self, keys, version=None, client=None):
+        keys = list(keys)
+        try:
+            values = super().get_many(keys, version=version, client=client)
+        except Exception:
+            record_cache_lookup(0, len(keys))
+            raise
+        found = len(values) if values else 0
+        record_cache_lookup(found, len(keys) - found)
+        return values
@@ -0,0 +1,181 @@
+"""
+Read-replica and country-shard routing.
+
+ReplicaRoutingMiddleware marks GET/HEAD/OPTIONS requests as replica-safe;
+everything else, and any code running outside a request (commands, shells,
+signals fired from scripts), reads from the primary. Within a request, the
+first write pins the rest of it to the primary, and the middleware keeps the
+user on the primary for STICKY_SECONDS afterwards so they read their own
+writes while the replicas catch up.
+
+Replicas are probed at most every CHECK_INTERVAL seconds. One that errors or
+reports more than MAX_LAG seconds of replication lag is skipped until the next
+probe, and reads fall back to the primary when none are usable.
+
+CountryShardRouter runs first and only claims the sharded job models (see
+api/utils/sharding.py); every other model is left to ReplicaRouter.
+"""
+import contextvars
+import logging
+import random
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.signals import setting_changed
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.dispatch import receiver
+
+from .utils.sharding import home_shard, is_shard, is_sharded, shard_for_instance, sharding_enabled
+
+logger = logging.getLogger('api')
+
+# Seconds behind the primary, by database vendor. Vendors without an entry
+# (e.g. SQLite file copies standing in for replicas) are only checked for availability.
+LAG_QUERIES = {
+    'postgresql': 'SELECT COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)',
+}
+
+class RoutingState:
+    __slots__ = ('replica_allowed', 'wrote')
+
+    def __init__(self, replica_allowed=False):
+        self.replica_allowed = replica_allowed
+        self.wrote = False
+
+_state = contextvars.ContextVar('db_routing_state', default=None)
+
+def begin_request(replica_allowed):
+    return _state.set(RoutingState(replica_allowed))
+
+def end_request(token):
+    state = _state.get()
+    _state.reset(token)
+    return state
+
+def note_write():
+    state = _state.get()
+    if state is not None:
+        # Read-your-writes for the rest of this request
+        state.replica_allowed = False
+        state.wrote = True
+
+def sticky_key(user_id):
+    return f'db_primary:{user_id}'
+
+def stick_to_primary(user_id):
+    """Route ``user_id``'s reads to the primary for STICKY_SECONDS"""
+    try:
+        cache.set(sticky_key(user_id), True, settings.REPLICA_ROUTING['STICKY_SECONDS'])
+    except Exception:
+        logger.warning('Could not keep user %s on the primary', user_id, exc_info=True)
+
+def is_stuck_to_primary(user_id):
+    try:
+        return bool(cache.get(sticky_key(user_id)))
+    except Exception:
+        # Without the cache a recent write can't be ruled out, so stay on the primary
+        logger.warning('Sticky-primary cache unavailable', exc_info=True)
+        return True
+
+class ReplicaMonitor:
+    """Health and lag of each replica, re-probed at most every CHECK_INTERVAL seconds"""
+
+    def __init__(self):
+        self.status = {}
+        self._lock = threading.Lock()
+
+    def probe(self, alias):
+        connection = connections[alias]
+        query = LAG_QUERIES.get(connection.vendor, 'SELECT 0')
+        with connection.cursor() as cursor:
+            cursor.execute(query)
+            return float(cursor.fetchone()[0] or 0)
+
+    def is_usable(self, alias):
+        config = settings.REPLICA_ROUTING
+        now = time.monotonic()
+        status = self.status.get(alias)
+        if status is not None and now - status[1] < config['CHECK_INTERVAL']:
+            return status[0]
+        with self._lock:
+            try:
+                lag = self.probe(alias)
+                usable = lag <= config['MAX_LAG']
+                if not usable:
+                    logger.warning('Replica %s is %.1fs behind; reading from the primary', alias, lag)
+            except Exception:
+                logger.warning('Replica %s is unavailable; reading from the primary', alias, exc_info=True)
+                usable = False
+            self.status[alias] = (usable, now)
+        return usable
+
+    def usable_replicas(self):
+        return [alias for alias in settings.REPLICA_ROUTING['ALIASES'] if self.is_usable(alias)]
+
+    def reset(self):
+        self.status.clear()
+
+replica_monitor = ReplicaMonitor()
+
+@receiver(setting_changed)
+def reset_replica_monitor(setting, **kwargs):
+    if setting == 'REPLICA_ROUTING':
+        replica_monitor.reset()
+
+class ReplicaRouter:
+    """Send replica-safe reads to a healthy replica; all writes and migrations to the primary"""
+
+    def db_for_read(self, model, **hints):
+        state = _state.get()
+        if state is None or not state.replica_allowed or not settings.REPLICA_ROUTING['ALIASES']:
+            return None
+        replicas = replica_monitor.usable_replicas()
+        return random.choice(replicas) if replicas else DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        note_write()
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same data as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas get their schema through replication
+        return db == DEFAULT_DB_ALIAS
+
+class CountryShardRouter:
+    """Send the sharded job models to their shard: by instance, else use_shard(), else the user's country"""
+
+    def _db(self, model, hints):
+        if not sharding_enabled() or not is_sharded(model):
+            return None
+        instance = hints.get('instance')
+        return (shard_for_instance(instance) if instance is not None else None) or home_shard()
+
+    def db_for_read(self, model, **hints):
+        return self._db(model, hints)
+
+    def db_for_write(self, model, **hints):
+        alias = self._db(model, hints)
+        if alias is not None:
+            note_write()
+        return alias
+
+    def allow_relation(self, obj1, obj2, **hints):
+        if not sharding_enabled():
+            return None
+        if is_sharded(type(obj1)) and is_sharded(type(obj2)):
+            # Unsaved rows are placed with their parent when saved
+            return obj1._state.adding or obj2._state.adding or obj1._state.db == obj2._state.db
+        # Reference rows (users, skills, categories) exist on every shard
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if not is_shard(db):
+            return None
+        # Shards get the whole schema but no data migrations; prepare_shards
+        # copies the reference data they need from default
+        return model_name is not None
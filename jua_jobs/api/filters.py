@@ -1,6 +1,7 @@
 import django_filters
 from django.db.models import Q
-from .models import JobPosting, Application, Review, WorkerProfile, User
+from .models import JobPosting, Application, Review, WorkerProfile, User, PaymentTransaction
+from .utils.ids import reference_id_lower_bound
 
 class JobPostingFilter(django_filters.FilterSet):
     title = django_filters.CharFilter(lookup_expr='icontains')
@@ -75,3 +76,28 @@ class UserFilter(django_filters.FilterSet):
     class Meta:
         model = User
         fields = ['role', 'country', 'city', 'email', 'username']
+
+class PaymentTransactionFilter(django_filters.FilterSet):
+    """
+    Reference ids are time-ordered, so reference_after/reference_before act as
+    chronological keyset cursors and created_after/created_before map onto the
+    same index range.
+    """
+    status = django_filters.ChoiceFilter(choices=PaymentTransaction.STATUS_CHOICES)
+    transaction_type = django_filters.ChoiceFilter(choices=PaymentTransaction.TRANSACTION_TYPE_CHOICES)
+    currency = django_filters.CharFilter()
+    reference_after = django_filters.CharFilter(field_name='reference_id', lookup_expr='gt')
+    reference_before = django_filters.CharFilter(field_name='reference_id', lookup_expr='lt')
+    created_after = django_filters.DateTimeFilter(method='filter_created_after')
+    created_before = django_filters.DateTimeFilter(method='filter_created_before')
+
+    class Meta:
+        model = PaymentTransaction
+        fields = ['status', 'transaction_type', 'currency', 'reference_after', 'reference_before',
+                 'created_after', 'created_before']
+
+    def filter_created_after(self, queryset, name, value):
+        return queryset.filter(reference_id__gte=reference_id_lower_bound(value))
+
+    def filter_created_before(self, queryset, name, value):
+        return queryset.filter(reference_id__lt=reference_id_lower_bound(value))
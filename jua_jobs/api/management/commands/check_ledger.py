@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from api.utils.ledger import verify_ledger
+
+class Command(BaseCommand):
+    help = 'Verify ledger integrity: zero-sum postings, posting state, amounts and snapshot totals'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=100, help='Maximum offending rows shown per check')
+
+    def handle(self, *args, **options):
+        issues = verify_ledger(limit=options['limit'])
+        failed = False
+        for check, rows in issues.items():
+            if rows:
+                failed = True
+                self.stdout.write(self.style.ERROR(f'{check}: {len(rows)} problem(s)'))
+                for row in rows:
+                    self.stdout.write(f'  {row}')
+            else:
+                self.stdout.write(self.style.SUCCESS(f'{check}: ok'))
+        if failed:
+            raise CommandError('Ledger integrity check failed')
@@ -0,0 +1,45 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from api.models import User
+from api.utils.synthetic_data import DataGenerator
+
+class Command(BaseCommand):
+    help = 'Generate a seeded synthetic dataset (users, profiles, jobs, applications, reviews, payments) for load testing'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--jobs', type=int, default=500)
+        parser.add_argument('--applications', type=int, default=5000)
+        parser.add_argument('--reviews', type=int, default=1000)
+        parser.add_argument('--transactions', type=int, default=1000)
+        parser.add_argument('--seed', type=int, default=0, help='Same seed and counts give the same data')
+        parser.add_argument('--chunk-size', type=int, default=5000, help='Rows per bulk insert')
+        parser.add_argument('--days', type=int, default=365, help='Spread timestamps over the last N days')
+        parser.add_argument('--client-share', type=float, default=0.2, help='Share of users who are clients')
+        parser.add_argument('--password', default='password123', help='Password of every generated user')
+        parser.add_argument('--prefix', default='synthetic', help='Emails are <prefix><n>@example.com')
+
+    def handle(self, *args, **options):
+        if settings.SHARDING['ENABLED']:
+            raise CommandError('Generate data with sharding disabled; rows are written to the default database')
+        if User.objects.filter(email=f"{options['prefix']}0@example.com").exists():
+            raise CommandError(f"Users with the prefix {options['prefix']!r} exist already; pass another --prefix")
+
+        started = time.monotonic()
+        generator = DataGenerator(
+            seed=options['seed'], chunk_size=options['chunk_size'], password=options['password'],
+            prefix=options['prefix'], days=options['days'], client_share=options['client_share'],
+            progress=self.stdout.write,
+        )
+        counts = generator.run(
+            users=options['users'], jobs=options['jobs'], applications=options['applications'],
+            reviews=options['reviews'], transactions=options['transactions'],
+        )
+        for table, count in sorted(counts.items()):
+            self.stdout.write(f'{table}: {count}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Generated {sum(counts.values())} rows in {time.monotonic() - started:.1f}s'
+        ))
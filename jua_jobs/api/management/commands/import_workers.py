@@ -0,0 +1,42 @@
+import csv
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from api.utils.worker_import import IMPORT_COLUMNS, import_workers
+
+class Command(BaseCommand):
+    help = 'Bulk import workers (user, profile and skills) from a CSV file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('file', help=f'CSV with columns: {", ".join(IMPORT_COLUMNS)} (skills separated by ";")')
+        parser.add_argument('--chunk-size', type=int, default=settings.WORKER_IMPORT['CHUNK_SIZE'])
+        parser.add_argument('--processes', type=int, default=settings.WORKER_IMPORT['PROCESSES'],
+                            help='Password hashing processes (default: one per CPU, 0 = in-process)')
+        parser.add_argument('--errors', help='Write rejected rows and their errors to this CSV file')
+
+    def handle(self, *args, **options):
+        try:
+            with open(options['file'], newline='', encoding='utf-8-sig') as source:
+                report = import_workers(
+                    csv.DictReader(source), chunk_size=options['chunk_size'], processes=options['processes']
+                )
+        except OSError as exc:
+            raise CommandError(str(exc))
+
+        if options['errors'] and report['errors']:
+            with open(options['errors'], 'w', newline='') as output:
+                writer = csv.writer(output)
+                writer.writerow(['row', 'email', 'field', 'error'])
+                for error in report['errors']:
+                    for field, messages in error['errors'].items():
+                        for message in messages:
+                            writer.writerow([error['row'], error['email'], field, message])
+        else:
+            for error in report['errors'][:20]:
+                self.stdout.write(self.style.WARNING(f"Row {error['row']} ({error['email']}): {error['errors']}"))
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {report['created']}/{report['total']} workers ({report['failed']} rejected) "
+            f"in {report['seconds']}s ({report['rows_per_minute']} rows/min)"
+        ))
@@ -0,0 +1,18 @@
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+
+from api.utils.sharding import copy_reference_data
+
+class Command(BaseCommand):
+    help = 'Migrate every country shard, seed its id range and copy users, skills and categories to it'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        for alias in settings.SHARDING['SHARDS']:
+            # post_migrate seeds the shard's id range (see api/signals.py)
+            call_command('migrate', database=alias, interactive=False, verbosity=0)
+            copied = copy_reference_data(alias, chunk_size=options['chunk_size'])
+            self.stdout.write(self.style.SUCCESS(f'{alias}: migrated, {copied} reference rows copied'))
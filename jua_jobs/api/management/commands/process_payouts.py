@@ -0,0 +1,32 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from api.utils.payouts import process_payouts
+
+class Command(BaseCommand):
+    help = 'Pay out pending mobile-money withdrawals in batches through the provider APIs'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--max-batches', type=int, default=None, help='Stop after this many batches')
+        parser.add_argument('--loop', type=float, default=None, metavar='SECONDS',
+                            help='Keep polling for new withdrawals, sleeping this long when idle')
+
+    def handle(self, *args, **options):
+        while True:
+            started = time.monotonic()
+            totals = process_payouts(max_batches=options['max_batches'])
+            elapsed = time.monotonic() - started
+            processed = sum(totals.values())
+            if processed:
+                self.stdout.write(self.style.SUCCESS(
+                    f"Processed {processed} withdrawals in {elapsed:.2f}s "
+                    f"({processed / elapsed:.0f}/s): "
+                    + ', '.join(f'{count} {outcome}' for outcome, count in sorted(totals.items()))
+                ))
+            if options['loop'] is None:
+                if not processed:
+                    self.stdout.write('No pending withdrawals')
+                break
+            if not processed:
+                time.sleep(options['loop'])
@@ -0,0 +1,39 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from api.models import RequestProfile
+from api.utils.profiling import SAMPLED, hot_paths
+
+class Command(BaseCommand):
+    help = 'Summarise sampled request profiles: the views taking the most time and their hottest functions'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=7, help='Only profiles from the last N days')
+        parser.add_argument('--view', help='Only this URL name')
+        parser.add_argument('--limit', type=int, default=20, help='Functions listed per view')
+        parser.add_argument('--prune-days', type=int, help='First delete profiles older than N days')
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        if options['prune_days'] is not None:
+            deleted, _ = RequestProfile.objects.filter(
+                created_at__lt=now - timedelta(days=options['prune_days'])
+            ).delete()
+            self.stdout.write(f'Deleted {deleted} old profiles')
+
+        profiles = RequestProfile.objects.filter(
+            trigger=SAMPLED, created_at__gte=now - timedelta(days=options['days'])
+        )
+        if options['view']:
+            profiles = profiles.filter(view=options['view'])
+
+        views = 0
+        for view, samples, mean_ms, mean_queries, report in hot_paths(profiles, options['limit']):
+            views += 1
+            self.stdout.write(
+                f'{view or "(unresolved)"}: {samples} samples, {mean_ms:.1f} ms and {mean_queries:.1f} queries on average'
+            )
+            self.stdout.write(report)
+        self.stdout.write(self.style.SUCCESS(f'Reported {views} views'))
@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+
+from api.utils.revocation import prune_revoked_tokens
+
+class Command(BaseCommand):
+    help = 'Delete revoked JWT ids whose tokens have expired'
+
+    def handle(self, *args, **options):
+        deleted = prune_revoked_tokens()
+        self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} expired token revocations'))
@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+
+from api.utils.idempotency import purge_expired_keys
+
+class Command(BaseCommand):
+    help = 'Delete Idempotency-Key records past their TTL'
+
+    def handle(self, *args, **options):
+        deleted = purge_expired_keys()
+        self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} expired idempotency keys'))
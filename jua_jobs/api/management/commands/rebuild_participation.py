@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from api.utils.participation import rebuild_participation
+
+class Command(BaseCommand):
+    help = 'Rebuild the job participation index from jobs and applications'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        written = rebuild_participation(chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(f'Indexed {written} job participations'))
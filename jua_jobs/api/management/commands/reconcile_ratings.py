@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from api.utils.ratings import reconcile_rating_summaries
+
+class Command(BaseCommand):
+    help = 'Recompute per-user rating summaries from reviews and fix any drift'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Report drift without writing changes')
+        parser.add_argument('--chunk-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        stats = reconcile_rating_summaries(
+            dry_run=options['dry_run'],
+            chunk_size=options['chunk_size']
+        )
+        verb = 'Would fix' if options['dry_run'] else 'Fixed'
+        self.stdout.write(self.style.SUCCESS(
+            f"Checked {stats['checked']} reviewees. {verb}: "
+            f"{stats['created']} missing, {stats['updated']} drifted, {stats['reset']} orphaned summaries."
+        ))
@@ -0,0 +1,45 @@
+import csv
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.utils.reconciliation import reconcile_statement
+
+class Command(BaseCommand):
+    help = 'Reconcile provider statement CSVs against payment transactions'
+
+    def add_arguments(self, parser):
+        parser.add_argument('files', nargs='+', help='Statement CSV files')
+        parser.add_argument('--apply', action='store_true', help='Correct status drift towards final provider outcomes')
+        parser.add_argument('--chunk-size', type=int, default=5000, help='Statement rows matched per query')
+        parser.add_argument('--output', help='Write every mismatch to this CSV file')
+
+    def handle(self, *args, **options):
+        output = writer = None
+        if options['output']:
+            output = open(options['output'], 'w', newline='')
+            writer = csv.DictWriter(output, fieldnames=['file', 'line', 'reference', 'type', 'statement', 'ours'])
+            writer.writeheader()
+
+        try:
+            for path in options['files']:
+                on_mismatch = (lambda mismatch, path=path: writer.writerow({'file': path, **mismatch})) if writer else None
+                try:
+                    with open(path, newline='', encoding='utf-8-sig') as statement:
+                        report = reconcile_statement(
+                            statement, apply=options['apply'], chunk_size=options['chunk_size'],
+                            on_mismatch=on_mismatch, sample_size=0
+                        )
+                except (OSError, ValueError) as exc:
+                    raise CommandError(f'{path}: {exc}')
+
+                mismatches = ', '.join(f'{kind}={count}' for kind, count in report['mismatches'].items())
+                self.stdout.write(
+                    f"{path}: {report['rows']} rows, {report['matched']} matched, {mismatches}, "
+                    f"{report['corrected']} corrected in {report['seconds']}s "
+                    f"({report['rows_per_second']} rows/s)"
+                )
+        finally:
+            if output:
+                output.close()
+
+        self.stdout.write(self.style.SUCCESS('Reconciliation finished' + ('' if options['apply'] else ' (dry run)')))
@@ -0,0 +1,19 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from api.utils.scoring import refresh_worker_scores
+
+class Command(BaseCommand):
+    help = 'Recompute worker leaderboard scores and the per-skill/country top-N lists (run periodically)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=2000)
+        parser.add_argument('--top-n', type=int, default=None, help='Override WORKER_SCORE["TOP_N"]')
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        scored = refresh_worker_scores(chunk_size=options['chunk_size'], top_n=options['top_n'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Scored {scored} worker profiles in {time.monotonic() - started:.2f}s'
+        ))
@@ -0,0 +1,40 @@
+import asyncio
+
+from django.core.management.base import BaseCommand
+
+from api.utils.provider_simulator import ProviderSimulator
+
+class Command(BaseCommand):
+    help = 'Run a local mobile-money provider simulator for offline payout benchmarks'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=8765)
+        parser.add_argument('--latency-ms', type=float, default=50, help='Mean response latency')
+        parser.add_argument('--jitter-ms', type=float, default=20, help='Latency standard deviation')
+        parser.add_argument('--failure-rate', type=float, default=0.02, help='Share of payouts declined')
+        parser.add_argument('--error-rate', type=float, default=0.01, help='Share of requests answered with 503')
+        parser.add_argument('--seed', type=int, default=None)
+
+    def handle(self, *args, **options):
+        simulator = ProviderSimulator(
+            latency_ms=options['latency_ms'],
+            jitter_ms=options['jitter_ms'],
+            failure_rate=options['failure_rate'],
+            error_rate=options['error_rate'],
+            seed=options['seed'],
+        )
+
+        async def serve():
+            port = await simulator.start(options['host'], options['port'])
+            self.stdout.write(self.style.SUCCESS(
+                f"Provider simulator listening on http://{options['host']}:{port}/<provider>/payouts"
+            ))
+            await simulator.serve_forever()
+
+        try:
+            asyncio.run(serve())
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.stdout.write(f'Stats: {simulator.stats}')
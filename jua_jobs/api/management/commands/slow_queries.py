@@ -0,0 +1,43 @@
+import json
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from api.models import SlowQuery
+from api.utils.slow_queries import top_offenders
+
+class Command(BaseCommand):
+    help = 'List the slow query shapes with the most total time, with their views and query plans'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=7, help='Only queries from the last N days')
+        parser.add_argument('--view', help='Only this URL name')
+        parser.add_argument('--limit', type=int, default=10, help='Query shapes to list')
+        parser.add_argument('--prune-days', type=int, help='First delete slow queries older than N days')
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        if options['prune_days'] is not None:
+            deleted, _ = SlowQuery.objects.filter(
+                created_at__lt=now - timedelta(days=options['prune_days'])
+            ).delete()
+            self.stdout.write(f'Deleted {deleted} old slow queries')
+
+        queries = SlowQuery.objects.filter(created_at__gte=now - timedelta(days=options['days']))
+        if options['view']:
+            queries = queries.filter(view=options['view'])
+
+        offenders = top_offenders(queries, options['limit'])
+        for rank, offender in enumerate(offenders, 1):
+            self.stdout.write(
+                f"{rank}. {offender['total_ms']:.0f} ms total, {offender['calls']} calls, "
+                f"{offender['mean_ms']:.1f} ms mean, {offender['max_ms']:.1f} ms max "
+                f"[{', '.join(view or '(unresolved)' for view in offender['views'])}]"
+            )
+            self.stdout.write(f"   {offender['shape']}")
+            if offender['params'] is not None:
+                self.stdout.write(f"   params: {json.dumps(offender['params'])}")
+            for line in offender['plan'].splitlines():
+                self.stdout.write(f'   | {line}')
+        self.stdout.write(self.style.SUCCESS(f'Reported {len(offenders)} slow query shapes'))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from api.utils.ledger import take_snapshots
+
+class Command(BaseCommand):
+    help = 'Write per-user, per-currency balance snapshots for ledger entries since the last run'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000)
+        parser.add_argument('--keep', type=int, default=3, help='Snapshots to keep per user and currency')
+
+    def handle(self, *args, **options):
+        written = take_snapshots(chunk_size=options['chunk_size'], keep=options['keep'])
+        self.stdout.write(self.style.SUCCESS(f'Wrote {written} balance snapshots'))
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from api.utils.sqlite import current_pragmas, run_maintenance
+
+class Command(BaseCommand):
+    help = 'Run PRAGMA optimize and checkpoint the SQLite WAL (schedule e.g. hourly)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default='default')
+        parser.add_argument(
+            '--checkpoint', default='TRUNCATE', choices=['PASSIVE', 'FULL', 'RESTART', 'TRUNCATE'],
+            help='TRUNCATE also shrinks the WAL file back to zero bytes'
+        )
+        parser.add_argument('--analyze', action='store_true', help='Run a full ANALYZE first')
+
+    def handle(self, *args, **options):
+        result = run_maintenance(options['database'], options['checkpoint'], options['analyze'])
+        if result is None:
+            self.stdout.write('Not an SQLite database; nothing to do')
+            return
+        busy, wal_frames, checkpointed = result
+        pragmas = ', '.join(f'{name}={value}' for name, value in current_pragmas(options['database']).items())
+        self.stdout.write(self.style.SUCCESS(
+            f'Optimized; checkpointed {checkpointed}/{wal_frames} WAL frames'
+            f'{" (readers still active)" if busy else ""}. {pragmas}'
+        ))
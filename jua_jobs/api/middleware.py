@@ -0,0 +1,219 @@
+import logging
+import random
+import time
+
+from django.conf import settings
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+from .authentication import CachedJWTAuthentication
+from .db_routers import begin_request, end_request, is_stuck_to_primary, stick_to_primary
+from .utils import sharding
+from .utils.metrics import record_request
+from .utils.profiling import ON_DEMAND, SAMPLED, profile_request
+from .utils.query_stats import QueryStats, track_queries
+from .utils.slow_queries import record_slow_queries
+
+logger = logging.getLogger('api')
+
+REPLICA_SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+def _bearer_user_id(request):
+    """User id claimed by the request's Bearer token, unverified: it only picks a database"""
+    header = request.META.get(jwt_settings.AUTH_HEADER_NAME, '')
+    parts = header.split()
+    if len(parts) != 2 or parts[0] not in jwt_settings.AUTH_HEADER_TYPES:
+        return None
+    try:
+        return AccessToken(parts[1], verify=False).get(jwt_settings.USER_ID_CLAIM)
+    except Exception:
+        return None
+
+class ReplicaRoutingMiddleware:
+    """
+    Let safe requests read from replicas (see api/db_routers.py), except for
+    users who wrote within the last STICKY_SECONDS.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not settings.REPLICA_ROUTING['ALIASES']:
+            return self.get_response(request)
+
+        replica_allowed = request.method in REPLICA_SAFE_METHODS
+        if replica_allowed:
+            user_id = _bearer_user_id(request)
+            if user_id is None and request.user.is_authenticated:
+                user_id = request.user.pk
+            replica_allowed = user_id is None or not is_stuck_to_primary(user_id)
+
+        token = begin_request(replica_allowed)
+        try:
+            response = self.get_response(request)
+        finally:
+            state = end_request(token)
+
+        # DRF copies the authenticated (e.g. JWT) user back onto the Django request
+        user = getattr(request, 'user', None)
+        if state.wrote and user is not None and user.is_authenticated:
+            stick_to_primary(user.pk)
+        return response
+
+class ShardRoutingMiddleware:
+    """Expose the request to the shard router, which reads unhinted queries from the user's country shard"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not sharding.sharding_enabled():
+            return self.get_response(request)
+        token = sharding.begin_request(request)
+        try:
+            return self.get_response(request)
+        finally:
+            sharding.end_request(token)
+
+class QueryInstrumentationMiddleware:
+    """
+    Count each request's queries, DB time and repeated query shapes (N+1s),
+    report them in a Server-Timing header and log a warning when a view goes
+    over its QUERY_INSTRUMENTATION budget. Queries over the SLOW_QUERIES
+    threshold go to the slow query log.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        config = settings.QUERY_INSTRUMENTATION
+        if not config['ENABLED']:
+            return self.get_response(request)
+
+        slow = settings.SLOW_QUERIES
+        start = time.perf_counter()
+        with track_queries(QueryStats(slow['THRESHOLD_MS'] if slow['ENABLED'] else None)) as stats:
+            response = self.get_response(request)
+        total_ms = (time.perf_counter() - start) * 1000
+        # For MetricsMiddleware
+        request.query_stats = stats
+
+        if config['SERVER_TIMING']:
+            response['Server-Timing'] = (
+                f'db;dur={stats.duration_ms:.1f};desc="{stats.count} queries", total;dur={total_ms:.1f}'
+            )
+        self.check_budget(request, stats, config)
+        if stats.slow:
+            # Outside track_queries(), so EXPLAIN and the log insert aren't counted
+            record_slow_queries(request, stats.slow)
+        return response
+
+    def check_budget(self, request, stats, config):
+        match = request.resolver_match
+        view = match.url_name if match is not None else None
+        budget = {**config['BUDGETS'], **config['VIEW_BUDGETS'].get(view, {})}
+        duplicates = stats.duplicates(threshold=budget['DUPLICATES'] + 1)
+
+        exceeded = []
+        if stats.count > budget['QUERIES']:
+            exceeded.append('queries')
+        if stats.duration_ms > budget['DB_MS']:
+            exceeded.append('db_time')
+        if duplicates:
+            exceeded.append('duplicates')
+        if not exceeded:
+            return
+
+        logger.warning(
+            'Query budget exceeded (%s) on %s %s: %d queries, %.1f ms in the database',
+            ', '.join(exceeded), request.method, view or request.path, stats.count, stats.duration_ms,
+            extra={
+                'view': view,
+                'path': request.path,
+                'queries': stats.count,
+                'db_ms': round(stats.duration_ms, 1),
+                'duplicates': [{'sql': shape, 'count': count} for shape, count in duplicates],
+                'exceeded': exceeded,
+            }
+        )
+
+class MetricsMiddleware:
+    """
+    Record latency, request/response sizes, status codes and DB time per route
+    (URL name) for /metrics. Runs outermost, so DB time comes from the
+    QueryInstrumentationMiddleware inside it.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not settings.METRICS['ENABLED']:
+            return self.get_response(request)
+
+        start = time.perf_counter()
+        response = self.get_response(request)
+        duration = time.perf_counter() - start
+
+        match = request.resolver_match
+        route = (match.url_name or match.route) if match is not None else 'unmatched'
+        stats = getattr(request, 'query_stats', None)
+        try:
+            request_size = int(request.META.get('CONTENT_LENGTH') or 0)
+        except ValueError:
+            request_size = 0
+        record_request(
+            route=route,
+            method=request.method,
+            status=response.status_code,
+            duration=duration,
+            db_duration=stats.duration if stats is not None else None,
+            request_size=request_size,
+            response_size=None if response.streaming else len(response.content),
+        )
+        return response
+
+def _staff_user(request):
+    """The request's staff user from its session or a verified JWT, else None"""
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_authenticated and user.is_staff:
+        return user
+    try:
+        authenticated = CachedJWTAuthentication().authenticate(request)
+    except Exception:
+        return None
+    if authenticated is not None and authenticated[0].is_staff:
+        return authenticated[0]
+    return None
+
+class ProfilingMiddleware:
+    """
+    Run a request under cProfile when a staff user sends the X-Profile header
+    or ?profile=1 (the response's X-Profile-Id names the stored profile), and
+    a PROFILING['SAMPLE_RATE'] share of all requests for profile_report.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        config = settings.PROFILING
+        if not config['ENABLED']:
+            return self.get_response(request)
+
+        trigger = None
+        if request.META.get(config['HEADER']) or request.GET.get(config['QUERY_PARAM']):
+            # Anyone else's flag is ignored
+            if _staff_user(request) is not None:
+                trigger = ON_DEMAND
+        if trigger is None and config['SAMPLE_RATE'] and random.random() < config['SAMPLE_RATE']:
+            trigger = SAMPLED
+        if trigger is None:
+            return self.get_response(request)
+
+        response, profile = profile_request(self.get_response, request, trigger)
+        if profile is not None and trigger == ON_DEMAND:
+            response['X-Profile-Id'] = str(profile.pk)
+        return response
@@ -0,0 +1,51 @@
+# Generated by Django 5.2.3 on 2026-10-19 00:20
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Max, Q, Sum
+
+
+def backfill_rating_summaries(apps, schema_editor):
+    Review = apps.get_model('api', 'Review')
+    UserRatingSummary = apps.get_model('api', 'UserRatingSummary')
+    annotations = {
+        'review_count': Count('id'),
+        'rating_sum': Sum('rating'),
+        'last_review_at': Max('created_at'),
+    }
+    for rating in range(1, 6):
+        annotations[f'rating_{rating}'] = Count('id', filter=Q(rating=rating))
+    rows = Review.objects.order_by().values('reviewee_id').annotate(**annotations)
+    UserRatingSummary.objects.bulk_create(
+        [UserRatingSummary(user_id=row.pop('reviewee_id'), **row) for row in rows],
+        batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0009_alter_review_options'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserRatingSummary',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='rating_summary', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('review_count', models.PositiveIntegerField(default=0)),
+                ('rating_sum', models.PositiveIntegerField(default=0)),
+                ('rating_1', models.PositiveIntegerField(default=0)),
+                ('rating_2', models.PositiveIntegerField(default=0)),
+                ('rating_3', models.PositiveIntegerField(default=0)),
+                ('rating_4', models.PositiveIntegerField(default=0)),
+                ('rating_5', models.PositiveIntegerField(default=0)),
+                ('last_review_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name_plural': 'User rating summaries',
+            },
+        ),
+        migrations.RunPython(backfill_rating_summaries, migrations.RunPython.noop),
+    ]
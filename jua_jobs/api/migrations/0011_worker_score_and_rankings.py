@@ -0,0 +1,39 @@
+# Generated by Django 5.2.3 on 2026-10-19 00:22
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0010_userratingsummary'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='workerprofile',
+            name='score',
+            field=models.FloatField(db_index=True, default=0),
+        ),
+        migrations.AddField(
+            model_name='workerprofile',
+            name='score_updated_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='WorkerRanking',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('country', models.CharField(blank=True, max_length=2)),
+                ('rank', models.PositiveIntegerField()),
+                ('score', models.FloatField()),
+                ('profile', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rankings', to='api.workerprofile')),
+                ('skill', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='rankings', to='api.skill')),
+            ],
+            options={
+                'ordering': ['rank'],
+                'indexes': [models.Index(fields=['skill', 'country', 'rank'], name='api_ranking_lookup_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 5.2.3 on 2026-10-19 00:24
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def post_completed_transactions(apps, schema_editor):
+    PaymentTransaction = apps.get_model('api', 'PaymentTransaction')
+    LedgerEntry = apps.get_model('api', 'LedgerEntry')
+    entries = []
+    for payment in PaymentTransaction.objects.filter(status='completed').iterator():
+        entries.append(LedgerEntry(transaction_id=payment.id, user_id=payment.sender_id,
+                                   currency=payment.currency, amount=-payment.amount))
+        entries.append(LedgerEntry(transaction_id=payment.id, user_id=payment.receiver_id,
+                                   currency=payment.currency, amount=payment.amount))
+    LedgerEntry.objects.bulk_create(entries, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0011_worker_score_and_rankings'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BalanceSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('currency', models.CharField(max_length=3)),
+                ('balance', models.DecimalField(decimal_places=2, max_digits=14)),
+                ('last_entry_id', models.BigIntegerField(help_text='Highest LedgerEntry id included in the balance')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='balance_snapshots', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-last_entry_id'],
+                'indexes': [models.Index(fields=['user', 'currency', '-last_entry_id'], name='api_snapshot_latest_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='LedgerEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('currency', models.CharField(max_length=3)),
+                ('amount', models.DecimalField(decimal_places=2, help_text='Signed: negative debits, positive credits', max_digits=12)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('transaction', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ledger_entries', to='api.paymenttransaction')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ledger_entries', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['id'],
+                'indexes': [models.Index(fields=['user', 'currency', 'id'], name='api_ledger_user_cur_idx')],
+            },
+        ),
+        migrations.RunPython(post_completed_transactions, migrations.RunPython.noop),
+    ]
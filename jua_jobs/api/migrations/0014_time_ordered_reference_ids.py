@@ -0,0 +1,77 @@
+# Generated by Django 5.2.3 on 2026-10-19 00:32
+
+import os
+
+import api.utils.ids
+from django.db import migrations, models
+
+# Frozen copy of the ULID encoder in api.utils.ids as of this migration
+ALPHABET = '0123456789ABCDEFGHJKMNPQRSTVWXYZ'
+LENGTH = 26
+RANDOM_BITS = 80
+
+
+def encode(value):
+    chars = []
+    for _ in range(LENGTH):
+        value, remainder = divmod(value, 32)
+        chars.append(ALPHABET[remainder])
+    return ''.join(reversed(chars))
+
+
+def is_reference_id(value):
+    return len(value) == LENGTH and value[0] in '01234567' and all(char in ALPHABET for char in value)
+
+
+def rekey_references(apps, schema_editor):
+    # Re-key pre-ULID rows from their creation time; the old value stays searchable
+    PaymentTransaction = apps.get_model('api', 'PaymentTransaction')
+    rows = [
+        row for row in PaymentTransaction.objects.order_by('created_at', 'id').values_list('id', 'reference_id', 'created_at')
+        if not is_reference_id(row[1])
+    ]
+    updates = []
+    last_timestamp, last_random = -1, 0
+    for payment_id, reference_id, created_at in rows:
+        timestamp_ms = int(created_at.timestamp() * 1000)
+        # Rows from the same millisecond increment the random part, so ids stay unique and ordered
+        if timestamp_ms == last_timestamp:
+            last_random = (last_random + 1) % (1 << RANDOM_BITS)
+        else:
+            last_timestamp, last_random = timestamp_ms, int.from_bytes(os.urandom(10), 'big')
+        updates.append(PaymentTransaction(
+            id=payment_id,
+            reference_id=encode((timestamp_ms << RANDOM_BITS) | last_random),
+            legacy_reference_id=reference_id,
+        ))
+    PaymentTransaction.objects.bulk_update(updates, ['reference_id', 'legacy_reference_id'], batch_size=1000)
+
+
+def restore_references(apps, schema_editor):
+    PaymentTransaction = apps.get_model('api', 'PaymentTransaction')
+    PaymentTransaction.objects.bulk_update([
+        PaymentTransaction(id=payment_id, reference_id=legacy_reference_id)
+        for payment_id, legacy_reference_id in
+        PaymentTransaction.objects.exclude(legacy_reference_id='').values_list('id', 'legacy_reference_id')
+    ], ['reference_id'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0013_idempotencykey'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='paymenttransaction',
+            name='legacy_reference_id',
+            field=models.CharField(blank=True, db_index=True, help_text='Original reference for rows created before ULID ids', max_length=100),
+        ),
+        migrations.RunPython(rekey_references, restore_references),
+        migrations.AlterField(
+            model_name='paymenttransaction',
+            name='reference_id',
+            field=models.CharField(default=api.utils.ids.generate_reference_id, max_length=26, unique=True),
+        ),
+    ]
@@ -0,0 +1,79 @@
+# Generated by Django 5.2.3 on 2026-10-19 00:45
+
+import re
+
+from django.db import migrations, models
+
+# Frozen copy of the country rules and api.utils.phone_numbers as of this
+# migration, so later changes to either can't change what it rewrites.
+# Country -> (dialing code, E.164 pattern)
+PHONE_RULES = {
+    'KE': ('254', re.compile(r'^\+254[17]\d{8}$')),
+    'NG': ('234', re.compile(r'^\+234[789]\d{9}$')),
+    'ZA': ('27', re.compile(r'^\+27[1-9]\d{8}$')),
+    'UG': ('256', re.compile(r'^\+256[37]\d{8}$')),
+    'TZ': ('255', re.compile(r'^\+255[67]\d{8}$')),
+}
+SEPARATORS = str.maketrans('', '', ' -().\t/')
+
+
+def normalize(value, country):
+    """E.164 form of ``value``, or None if it can't be normalized"""
+    raw = value.strip().translate(SEPARATORS)
+    rule = PHONE_RULES.get(country)
+    if raw.startswith('+'):
+        candidate = raw
+    elif raw.startswith('00'):
+        candidate = '+' + raw[2:]
+    elif rule is None:
+        candidate = '+' + raw
+    elif raw.startswith(rule[0]) and rule[1].match('+' + raw):
+        candidate = '+' + raw
+    elif raw.startswith('0'):
+        candidate = '+' + rule[0] + raw[1:]
+    else:
+        candidate = '+' + rule[0] + raw
+
+    if not candidate[1:].isdigit():
+        return None
+    # Without a known country, any country's rule will do
+    patterns = [rule[1]] if rule else [pattern for _, pattern in PHONE_RULES.values()]
+    return candidate if any(pattern.match(candidate) for pattern in patterns) else None
+
+
+def normalize_existing(apps, schema_editor):
+    # Rewrite stored numbers to E.164 where the country rules allow it; others are left as they are
+    User = apps.get_model('api', 'User')
+    PaymentMethod = apps.get_model('api', 'PaymentMethod')
+    for model, rows in (
+        (User, User.objects.exclude(phone_number='').values_list('id', 'phone_number', 'country')),
+        (PaymentMethod, PaymentMethod.objects.exclude(phone_number='')
+            .values_list('id', 'phone_number', 'user__country')),
+    ):
+        updates = []
+        for row_id, phone_number, country in rows:
+            number = normalize(phone_number, country)
+            if number and number != phone_number:
+                updates.append(model(id=row_id, phone_number=number))
+        model.objects.bulk_update(updates, ['phone_number'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0014_time_ordered_reference_ids'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='paymentmethod',
+            name='phone_number',
+            field=models.CharField(blank=True, db_index=True, help_text='E.164', max_length=20),
+        ),
+        migrations.AlterField(
+            model_name='user',
+            name='phone_number',
+            field=models.CharField(blank=True, db_index=True, max_length=20),
+        ),
+        migrations.RunPython(normalize_existing, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.3 on 2026-10-19 00:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0015_normalize_phone_numbers'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RevokedToken',
+            fields=[
+                ('jti', models.CharField(max_length=64, primary_key=True, serialize=False)),
+                ('expires_at', models.DateTimeField(db_index=True)),
+                ('revoked_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.3 on 2026-10-19 01:04
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_participation(apps, schema_editor):
+    JobPosting = apps.get_model('api', 'JobPosting')
+    Application = apps.get_model('api', 'Application')
+    JobParticipation = apps.get_model('api', 'JobParticipation')
+
+    rows = [
+        JobParticipation(user_id=user_id, job_id=job_id, role='owner')
+        for job_id, user_id in JobPosting.objects.exclude(posted_by=None).values_list('id', 'posted_by_id').iterator()
+    ]
+    rows += [
+        JobParticipation(user_id=user_id, job_id=job_id, role='accepted' if status == 'accepted' else 'applicant')
+        for job_id, user_id, status in Application.objects.values_list('job_id', 'worker_id', 'status').iterator()
+    ]
+    JobParticipation.objects.bulk_create(rows, batch_size=1000, ignore_conflicts=True)
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0016_revokedtoken'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='JobParticipation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('role', models.CharField(choices=[('owner', 'Owner'), ('applicant', 'Applicant'), ('accepted', 'Accepted')], max_length=10)),
+                ('job', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='participations', to='api.jobposting')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='participations', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('user', 'job'), name='api_unique_job_participation')],
+            },
+        ),
+        migrations.RunPython(backfill_participation, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.3 on 2026-10-19 01:23
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def backfill_country(apps, schema_editor):
+    JobPosting = apps.get_model('api', 'JobPosting')
+    User = apps.get_model('api', 'User')
+    poster_country = User.objects.filter(pk=OuterRef('posted_by_id')).values('country')[:1]
+    JobPosting.objects.filter(country='').update(country=Coalesce(Subquery(poster_country), Value('')))
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0017_jobparticipation'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='jobposting',
+            name='country',
+            field=models.CharField(blank=True, db_index=True, max_length=2),
+        ),
+        migrations.RunPython(backfill_country, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.3 on 2026-10-19 01:36
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0018_jobposting_country'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RequestProfile',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('method', models.CharField(max_length=10)),
+                ('path', models.CharField(max_length=500)),
+                ('view', models.CharField(blank=True, db_index=True, help_text='URL name', max_length=200)),
+                ('trigger', models.CharField(choices=[('on_demand', 'On demand'), ('sampled', 'Sampled')], db_index=True, max_length=10)),
+                ('status_code', models.PositiveSmallIntegerField()),
+                ('duration_ms', models.FloatField()),
+                ('query_count', models.PositiveIntegerField(default=0)),
+                ('db_ms', models.FloatField(default=0)),
+                ('stats', models.BinaryField(help_text="marshal'd pstats data (pstats.Stats.dump_stats format)")),
+                ('report', models.TextField(blank=True, help_text='Top functions by cumulative time')),
+                ('queries', models.JSONField(blank=True, default=list, help_text='SQL, time and calling line of each query')),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='request_profiles', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.3 on 2026-10-19 01:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0019_requestprofile'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SlowQuery',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('database', models.CharField(max_length=100)),
+                ('view', models.CharField(blank=True, db_index=True, help_text='URL name', max_length=200)),
+                ('method', models.CharField(blank=True, max_length=10)),
+                ('path', models.CharField(blank=True, max_length=500)),
+                ('duration_ms', models.FloatField()),
+                ('sql', models.TextField()),
+                ('shape', models.TextField(help_text='SQL with literals erased')),
+                ('fingerprint', models.CharField(db_index=True, help_text='SHA-1 of shape', max_length=40)),
+                ('params', models.JSONField(blank=True, help_text='Redacted parameters', null=True)),
+                ('plan', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
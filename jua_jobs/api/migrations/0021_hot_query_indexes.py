@@ -0,0 +1,49 @@
+# Generated by Django 5.2.3 on 2026-10-19 01:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0020_slowquery'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='application',
+            index=models.Index(fields=['job', 'status'], name='api_app_job_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='application',
+            index=models.Index(fields=['worker', 'status'], name='api_app_worker_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='jobposting',
+            index=models.Index(fields=['status', '-created_at'], name='api_job_status_recent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='jobposting',
+            index=models.Index(fields=['posted_by', 'status'], name='api_job_poster_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='jobposting',
+            index=models.Index(fields=['status', 'deadline'], name='api_job_status_deadline_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='paymenttransaction',
+            index=models.Index(fields=['sender', '-created_at'], name='api_payment_sender_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='paymenttransaction',
+            index=models.Index(fields=['receiver', '-created_at'], name='api_payment_receiver_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='paymenttransaction',
+            index=models.Index(condition=models.Q(('status', 'pending'), ('transaction_type', 'withdrawal')), fields=['payment_method', 'id'], name='api_payment_payout_queue_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['reviewee', '-created_at'], name='api_review_reviewee_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.3 on 2026-10-19 02:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0021_hot_query_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='workerprofile',
+            name='availability',
+            field=models.CharField(choices=[('available', 'Available'), ('busy', 'Busy'), ('part_time', 'Part time')], default='available', max_length=50),
+        ),
+    ]
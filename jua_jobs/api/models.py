@@ -1,10 +1,13 @@
 from django.contrib.auth.models import AbstractUser, BaseUserManager
-from django.db import models
+from django.db import models, router, transaction
 from django.utils import timezone
 from django.contrib.auth import get_user_model
 from django.core.validators import MinValueValidator, MaxValueValidator
-from django.conf import settings
-import re
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .utils.african_validators import get_registry
+from .utils.ids import generate_reference_id
+from .utils.phone_numbers import normalize_or_keep
 
 class UserManager(BaseUserManager):
     def create_user(self, email, username=None, password=None, **extra_fields):
@@ -27,7 +30,8 @@ class UserManager(BaseUserManager):
 
 class User(AbstractUser):
     email = models.EmailField(unique=True)
-    phone_number = models.CharField(max_length=15, blank=True)
+    # Stored in E.164 so lookups by phone are exact indexed matches
+    phone_number = models.CharField(max_length=20, blank=True, db_index=True)
     
     ROLE_CHOICES = (
         ('client', 'Client'),
@@ -55,12 +59,11 @@ class User(AbstractUser):
         super().clean()
         # Validate phone number for African countries
         if self.phone_number and self.country:
-            country_config = settings.AFRICAN_COUNTRIES.get(self.country)
-            if country_config:
-                pattern = country_config['phone_pattern']
-                if not re.match(pattern, self.phone_number):
-                    from django.core.exceptions import ValidationError
-                    raise ValidationError(f'Invalid phone number format for {country_config["name"]}')
+            get_registry().validate_phone(normalize_or_keep(self.phone_number, self.country), self.country)
+
+    def save(self, *args, **kwargs):
+        self.phone_number = normalize_or_keep(self.phone_number, self.country)
+        super().save(*args, **kwargs)
 
 class Skill(models.Model):
     name = models.CharField(max_length=100, unique=True)
@@ -107,6 +110,8 @@ class JobPosting(models.Model):
     salary_max = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
     employment_type = models.CharField(max_length=20, choices=EMPLOYMENT_TYPE_CHOICES, default='full_time')
     location = models.CharField(max_length=255, blank=True)
+    # The poster's country when the job was created; picks the job's shard (see api/utils/sharding.py)
+    country = models.CharField(max_length=2, blank=True, db_index=True)
     remote_work = models.BooleanField(default=False)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='active')
     posted_by = models.ForeignKey(
@@ -123,10 +128,23 @@ class JobPosting(models.Model):
 
     class Meta:
         ordering = ['-created_at']  # Fix the UnorderedObjectListWarning
+        indexes = [
+            # Listings: status filter (always 'active' for the public) in created_at order
+            models.Index(fields=['status', '-created_at'], name='api_job_status_recent_idx'),
+            # Client dashboards count their jobs by status
+            models.Index(fields=['posted_by', 'status'], name='api_job_poster_status_idx'),
+            # ?ordering=deadline on the same listings
+            models.Index(fields=['status', 'deadline'], name='api_job_status_deadline_idx'),
+        ]
 
     def __str__(self):
         return self.title
 
+    def save(self, *args, **kwargs):
+        if not self.country and self.posted_by_id:
+            self.country = self.posted_by.country
+        super().save(*args, **kwargs)
+
 class WorkerProfile(models.Model):
     user = models.OneToOneField(get_user_model(), on_delete=models.CASCADE, related_name='worker_profile')
     title = models.CharField(max_length=200)
@@ -135,13 +153,41 @@ class WorkerProfile(models.Model):
     hourly_rate = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
     currency = models.CharField(max_length=3, default='USD')
     experience_years = models.PositiveIntegerField(default=0)
-    availability = models.CharField(max_length=50, default='available')
+    AVAILABILITY_CHOICES = [
+        ('available', 'Available'),
+        ('busy', 'Busy'),
+        ('part_time', 'Part time'),
+    ]
+    availability = models.CharField(max_length=50, choices=AVAILABILITY_CHOICES, default='available')
+    # Leaderboard score, recomputed in bulk by the refresh_worker_scores command
+    score = models.FloatField(default=0, db_index=True)
+    score_updated_at = models.DateTimeField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
     def __str__(self):
         return f"{self.user.email} - {self.title}"
 
+class WorkerRanking(models.Model):
+    """
+    Precomputed top-N worker lists per skill and country. A null skill or a
+    blank country means "any", so (None, '') is the global leaderboard.
+    """
+    skill = models.ForeignKey(Skill, on_delete=models.CASCADE, null=True, blank=True, related_name='rankings')
+    country = models.CharField(max_length=2, blank=True)
+    rank = models.PositiveIntegerField()
+    profile = models.ForeignKey(WorkerProfile, on_delete=models.CASCADE, related_name='rankings')
+    score = models.FloatField()
+
+    class Meta:
+        ordering = ['rank']
+        indexes = [
+            models.Index(fields=['skill', 'country', 'rank'], name='api_ranking_lookup_idx'),
+        ]
+
+    def __str__(self):
+        return f"#{self.rank} {self.profile_id} ({self.skill_id or 'all'}/{self.country or 'all'})"
+
 class Application(models.Model):
     STATUS_CHOICES = [
         ('pending', 'Pending'),
@@ -160,6 +206,12 @@ class Application(models.Model):
     class Meta:
         unique_together = ('worker', 'job')
         ordering = ['-applied_at']
+        indexes = [
+            # Accepted and pending applicants of a job
+            models.Index(fields=['job', 'status'], name='api_app_job_status_idx'),
+            # A worker's applications by status (dashboard counts)
+            models.Index(fields=['worker', 'status'], name='api_app_worker_status_idx'),
+        ]
 
     def __str__(self):
         return f"{self.worker.email} applied to {self.job.title}"
@@ -175,10 +227,87 @@ class Review(models.Model):
     class Meta:
         unique_together = ('reviewer', 'reviewee', 'job')
         ordering = ['-created_at']  # Fix the UnorderedObjectListWarning
+        indexes = [
+            # user_reviews: a user's received reviews, newest first
+            models.Index(fields=['reviewee', '-created_at'], name='api_review_reviewee_idx'),
+        ]
 
     def __str__(self):
         return f"Review by {self.reviewer.email} for {self.reviewee.email}"
 
+    def save(self, *args, **kwargs):
+        # Keep the reviewee's rating summary (updated from signals) in the same transaction,
+        # unless the review is on a shard (see api/utils/ratings.py)
+        with transaction.atomic(using=kwargs.get('using') or router.db_for_write(type(self), instance=self)):
+            super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic(using=kwargs.get('using') or router.db_for_write(type(self), instance=self)):
+            return super().delete(*args, **kwargs)
+
+class JobParticipation(models.Model):
+    """
+    Who takes part in a job and how: one row per job owner and per applicant,
+    maintained from JobPosting and Application saves (see api/utils/participation.py).
+    """
+    ROLE_CHOICES = [
+        ('owner', 'Owner'),
+        ('applicant', 'Applicant'),
+        ('accepted', 'Accepted'),
+    ]
+
+    user = models.ForeignKey(get_user_model(), on_delete=models.CASCADE, related_name='participations')
+    job = models.ForeignKey(JobPosting, on_delete=models.CASCADE, related_name='participations')
+    role = models.CharField(max_length=10, choices=ROLE_CHOICES)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'job'], name='api_unique_job_participation'),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} {self.role} on {self.job_id}"
+
+class UserRatingSummary(models.Model):
+    """
+    Per-user review aggregates, maintained incrementally on review writes so
+    profile views never have to aggregate over Review.
+    """
+    user = models.OneToOneField(
+        get_user_model(),
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='rating_summary'
+    )
+    review_count = models.PositiveIntegerField(default=0)
+    rating_sum = models.PositiveIntegerField(default=0)
+    rating_1 = models.PositiveIntegerField(default=0)
+    rating_2 = models.PositiveIntegerField(default=0)
+    rating_3 = models.PositiveIntegerField(default=0)
+    rating_4 = models.PositiveIntegerField(default=0)
+    rating_5 = models.PositiveIntegerField(default=0)
+    last_review_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name_plural = "User rating summaries"
+
+    def __str__(self):
+        return f"{self.user_id}: {self.review_count} reviews"
+
+    @property
+    def average_rating(self):
+        if not self.review_count:
+            return None
+        return round(self.rating_sum / self.review_count, 2)
+
+    @property
+    def rating_distribution(self):
+        return [
+            {'rating': rating, 'count': getattr(self, f'rating_{rating}')}
+            for rating in range(1, 6)
+            if getattr(self, f'rating_{rating}')
+        ]
+
 class PaymentTransaction(models.Model):
     TRANSACTION_TYPE_CHOICES = [
         ('job_payment', 'Job Payment'),
@@ -202,15 +331,160 @@ class PaymentTransaction(models.Model):
     sender = models.ForeignKey(get_user_model(), on_delete=models.CASCADE, related_name='sent_payments')
     receiver = models.ForeignKey(get_user_model(), on_delete=models.CASCADE, related_name='received_payments')
     job = models.ForeignKey(JobPosting, on_delete=models.CASCADE, null=True, blank=True)
-    reference_id = models.CharField(max_length=100, unique=True)
+    # Time-ordered (ULID) so new rows append to the index and ranges follow creation order
+    reference_id = models.CharField(max_length=26, unique=True, default=generate_reference_id)
+    legacy_reference_id = models.CharField(max_length=100, blank=True, db_index=True,
+                                           help_text="Original reference for rows created before ULID ids")
     payment_method = models.CharField(max_length=50, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # A user's payments (sent or received), newest first
+            models.Index(fields=['sender', '-created_at'], name='api_payment_sender_idx'),
+            models.Index(fields=['receiver', '-created_at'], name='api_payment_receiver_idx'),
+            # The payout queue (claim_withdrawals); partial, so it holds only pending withdrawals
+            models.Index(fields=['payment_method', 'id'], name='api_payment_payout_queue_idx',
+                         condition=models.Q(transaction_type='withdrawal', status='pending')),
+        ]
     
     def __str__(self):
         # Format amount to always show 2 decimal places
         return f"{self.transaction_type} - {self.amount:.2f} {self.currency}"
 
+    def save(self, *args, **kwargs):
+        # Ledger postings (written from signals) commit or roll back with the status change
+        with transaction.atomic(using=kwargs.get('using') or router.db_for_write(type(self), instance=self)):
+            super().save(*args, **kwargs)
+
+class LedgerEntry(models.Model):
+    """
+    Double-entry posting for a completed transaction: a debit on the sender and
+    a matching credit on the receiver, so entries per transaction sum to zero.
+    """
+    transaction = models.ForeignKey(PaymentTransaction, on_delete=models.CASCADE, related_name='ledger_entries')
+    user = models.ForeignKey(get_user_model(), on_delete=models.CASCADE, related_name='ledger_entries')
+    currency = models.CharField(max_length=3)
+    amount = models.DecimalField(max_digits=12, decimal_places=2, help_text="Signed: negative debits, positive credits")
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['user', 'currency', 'id'], name='api_ledger_user_cur_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} {self.amount:+.2f} {self.currency}"
+
+class BalanceSnapshot(models.Model):
+    """Balance of a user in one currency as of a ledger entry id, stored on that entry's shard"""
+    user = models.ForeignKey(get_user_model(), on_delete=models.CASCADE, related_name='balance_snapshots')
+    currency = models.CharField(max_length=3)
+    balance = models.DecimalField(max_digits=14, decimal_places=2)
+    last_entry_id = models.BigIntegerField(help_text="Highest LedgerEntry id included in the balance")
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-last_entry_id']
+        indexes = [
+            models.Index(fields=['user', 'currency', '-last_entry_id'], name='api_snapshot_latest_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} {self.balance:.2f} {self.currency} @ {self.last_entry_id}"
+
+class IdempotencyKey(models.Model):
+    """Stored outcome of a create request sent with an Idempotency-Key header"""
+    STATUS_CHOICES = [
+        ('in_progress', 'In Progress'),
+        ('completed', 'Completed'),
+    ]
+
+    user = models.ForeignKey(get_user_model(), on_delete=models.CASCADE, related_name='idempotency_keys')
+    key = models.CharField(max_length=255)
+    scope = models.CharField(max_length=255, help_text="HTTP method and path the key was used on")
+    fingerprint = models.CharField(max_length=64, help_text="SHA-256 of the request payload")
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='in_progress')
+    response_status = models.PositiveSmallIntegerField(null=True, blank=True)
+    response_body = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder)
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(db_index=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'scope', 'key'], name='api_unique_idempotency_key'),
+        ]
+
+    def __str__(self):
+        return f"{self.scope} {self.key} ({self.status})"
+
+class RevokedToken(models.Model):
+    """JWT id of a rotated or logged-out token, kept until the token would have expired"""
+    jti = models.CharField(max_length=64, primary_key=True)
+    expires_at = models.DateTimeField(db_index=True)
+    revoked_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    def __str__(self):
+        return f"{self.jti} (expires {self.expires_at:%Y-%m-%d %H:%M})"
+
+class RequestProfile(models.Model):
+    """
+    One request run under cProfile, on demand by staff or sampled in the
+    background (see api/utils/profiling.py). ``stats`` is the pstats dump,
+    downloadable from the admin as a .prof file.
+    """
+    TRIGGER_CHOICES = [
+        ('on_demand', 'On demand'),
+        ('sampled', 'Sampled'),
+    ]
+
+    method = models.CharField(max_length=10)
+    path = models.CharField(max_length=500)
+    view = models.CharField(max_length=200, blank=True, db_index=True, help_text="URL name")
+    user = models.ForeignKey(get_user_model(), on_delete=models.SET_NULL, null=True, blank=True,
+                             related_name='request_profiles')
+    trigger = models.CharField(max_length=10, choices=TRIGGER_CHOICES, db_index=True)
+    status_code = models.PositiveSmallIntegerField()
+    duration_ms = models.FloatField()
+    query_count = models.PositiveIntegerField(default=0)
+    db_ms = models.FloatField(default=0)
+    stats = models.BinaryField(help_text="marshal'd pstats data (pstats.Stats.dump_stats format)")
+    report = models.TextField(blank=True, help_text="Top functions by cumulative time")
+    queries = models.JSONField(default=list, blank=True, help_text="SQL, time and calling line of each query")
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.method} {self.path} ({self.duration_ms:.0f} ms, {self.trigger})"
+
+class SlowQuery(models.Model):
+    """
+    A query that took longer than SLOW_QUERIES['THRESHOLD_MS'] during a
+    request (see api/utils/slow_queries.py). ``params`` are redacted;
+    ``fingerprint`` groups repeats of one query shape.
+    """
+    database = models.CharField(max_length=100)
+    view = models.CharField(max_length=200, blank=True, db_index=True, help_text="URL name")
+    method = models.CharField(max_length=10, blank=True)
+    path = models.CharField(max_length=500, blank=True)
+    duration_ms = models.FloatField()
+    sql = models.TextField()
+    shape = models.TextField(help_text="SQL with literals erased")
+    fingerprint = models.CharField(max_length=40, db_index=True, help_text="SHA-1 of shape")
+    params = models.JSONField(null=True, blank=True, help_text="Redacted parameters")
+    plan = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.duration_ms:.0f} ms on {self.view or self.path}: {self.shape[:80]}"
+
 # African Market Specific Models
 class PaymentMethod(models.Model):
     PAYMENT_TYPES = [
@@ -223,7 +497,7 @@ class PaymentMethod(models.Model):
     
     user = models.ForeignKey(get_user_model(), on_delete=models.CASCADE, related_name='payment_methods')
     payment_type = models.CharField(max_length=20, choices=PAYMENT_TYPES)
-    phone_number = models.CharField(max_length=15, blank=True)
+    phone_number = models.CharField(max_length=20, blank=True, db_index=True, help_text="E.164")
     account_details = models.JSONField(default=dict)
     is_verified = models.BooleanField(default=False)
     is_default = models.BooleanField(default=False)
@@ -235,16 +509,30 @@ class PaymentMethod(models.Model):
     def clean(self):
         super().clean()
         # Validate mobile money phone numbers
-        if self.payment_type in ['mpesa', 'airtel_money', 'mtn_mobile_money']:
+        registry = get_registry()
+        if self.payment_type in registry.mobile_money_types:
             if not self.phone_number:
                 from django.core.exceptions import ValidationError
                 raise ValidationError('Phone number is required for mobile money payments')
-            
-            # Validate phone number format based on payment type and user country
-            if self.user.country:
-                country_config = settings.AFRICAN_COUNTRIES.get(self.user.country)
-                if country_config:
-                    pattern = country_config['phone_pattern']
-                    if not re.match(pattern, self.phone_number):
-                        from django.core.exceptions import ValidationError
-                        raise ValidationError(f'Invalid phone number format for {country_config["name"]}')
+
+            # Validate provider availability and phone number format for the user's country
+            country = self.owner_country()
+            if country:
+                registry.validate_mobile_money(
+                    self.payment_type, normalize_or_keep(self.phone_number, country), country
+                )
+
+    def owner_country(self):
+        """The user's country: from the loaded user, else by id; None while there is no user"""
+        if self.user_id is None:
+            return None
+        if PaymentMethod.user.is_cached(self):
+            return self.user.country
+        return get_user_model().objects.filter(pk=self.user_id).values_list('country', flat=True).first()
+
+    def save(self, *args, **kwargs):
+        # Numbers already in E.164 (e.g. every re-save) need no country, so no user lookup
+        phone = self.phone_number
+        if phone and self.user_id is not None and not (phone.startswith('+') and phone[1:].isdigit()):
+            self.phone_number = normalize_or_keep(phone, self.owner_country())
+        super().save(*args, **kwargs)
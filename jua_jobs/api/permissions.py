@@ -1,5 +1,5 @@
 from rest_framework import permissions
-from .models import JobPosting, Application
+from .utils.participation import get_participation_role
 
 class IsOwnerOrReadOnly(permissions.BasePermission):
     """
@@ -35,14 +35,11 @@ class IsApplicationOwnerOrJobOwner(permissions.BasePermission):
     """
     def has_object_permission(self, request, view, obj):
         # Worker can access their own applications
-        if obj.worker == request.user:
+        if obj.worker_id == request.user.id:
             return True
         
         # Client can access applications to their jobs
-        if obj.job.posted_by == request.user:
-            return True
-        
-        return False
+        return obj.job.posted_by_id == request.user.id
 
 class IsReviewParticipant(permissions.BasePermission):
     """
@@ -53,24 +50,18 @@ class IsReviewParticipant(permissions.BasePermission):
             return False
         
         if request.method == 'POST':
-            job_id = request.data.get('job_id')
-            if job_id:
-                try:
-                    job = JobPosting.objects.get(id=job_id)
-                    # Check if user is job owner or has applied to the job
-                    if job.posted_by == request.user:
-                        return True
-                    if Application.objects.filter(job=job, worker=request.user).exists():
-                        return True
-                except JobPosting.DoesNotExist:
-                    pass
-            return False
+            # Job owner or applicant, from the participation index
+            try:
+                job_id = int(request.data.get('job_id'))
+            except (TypeError, ValueError):
+                return False
+            return get_participation_role(request.user.id, job_id) is not None
         
         return True
 
     def has_object_permission(self, request, view, obj):
         # Only reviewer can edit their own review
-        return obj.reviewer == request.user
+        return obj.reviewer_id == request.user.id
 
 class IsProfileOwner(permissions.BasePermission):
     """
@@ -1,7 +1,16 @@
 from rest_framework import serializers
 from django.contrib.auth import authenticate, get_user_model
+from django.db import IntegrityError
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, TokenError
+from rest_framework_simplejwt.serializers import TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from rest_framework_simplejwt.tokens import RefreshToken
 from .models import JobPosting, Application, Review, WorkerProfile, Skill, Category, PaymentTransaction, PaymentMethod
-from .utils.african_validators import AfricanPhoneValidator, CurrencyValidator, MobileMoneyValidator
+from .utils.african_validators import CurrencyValidator, MobileMoneyValidator, get_registry
+from .utils.phone_numbers import normalize_phone, normalize_or_keep
+from .utils.participation import OWNER, get_participation_role
+from .utils.revocation import is_token_revoked, revoke_token
+from .utils.sharding import shard_for_id
 
 User = get_user_model()
 
@@ -18,9 +27,9 @@ class UserSignupSerializer(serializers.ModelSerializer):
 
     def validate_phone_number(self, value):
         if value:
+            # Accept local formats (07xx, 2547xx, spaces) and store E.164
             country = self.initial_data.get('country')
-            validator = AfricanPhoneValidator(country)
-            validator(value)
+            value = normalize_phone(value, country)
         return value
 
     def validate(self, attrs):
@@ -56,12 +65,63 @@ class UserLoginSerializer(serializers.Serializer):
         
         return data
 
+class RevokingTokenRefreshSerializer(TokenRefreshSerializer):
+    """
+    Token refresh that enforces rotation against the revocation store: the
+    presented refresh token is revoked when a new pair is issued, so replaying
+    it is rejected. Replaces the stock validate(), which needs simplejwt's
+    token_blacklist app (not installed) once rotation is on.
+    """
+
+    def validate(self, attrs):
+        refresh = self.token_class(attrs['refresh'])
+        if is_token_revoked(refresh):
+            raise TokenError('Token has been revoked')
+
+        user_id = refresh.payload.get(jwt_settings.USER_ID_CLAIM)
+        user = get_user_model().objects.filter(**{jwt_settings.USER_ID_FIELD: user_id}).first()
+        if user is None or not jwt_settings.USER_AUTHENTICATION_RULE(user):
+            raise AuthenticationFailed(self.error_messages['no_active_account'], 'no_active_account')
+
+        data = {'access': str(refresh.access_token)}
+        if jwt_settings.ROTATE_REFRESH_TOKENS:
+            # The insert fails if a concurrent refresh already used this token
+            if jwt_settings.BLACKLIST_AFTER_ROTATION and not revoke_token(refresh):
+                raise TokenError('Token has been revoked')
+            refresh.set_jti()
+            refresh.set_exp()
+            refresh.set_iat()
+            data['refresh'] = str(refresh)
+        return data
+
+class TokenRevokeSerializer(serializers.Serializer):
+    refresh = serializers.CharField()
+
+    def validate_refresh(self, value):
+        try:
+            return RefreshToken(value)
+        except TokenError as exc:
+            raise serializers.ValidationError(str(exc))
+
+def rating_summary_data(user):
+    """Rating aggregates for a user; free when the queryset select_related('rating_summary')"""
+    summary = getattr(user, 'rating_summary', None)
+    if summary is None:
+        return {'average_rating': None, 'total_reviews': 0}
+    return {'average_rating': summary.average_rating, 'total_reviews': summary.review_count}
+
 class UserSerializer(serializers.ModelSerializer):
+    rating_summary = serializers.SerializerMethodField()
+
     class Meta:
         model = User
-        fields = ['id', 'username', 'email', 'role', 'phone_number', 'country', 'city', 'date_joined']
+        fields = ['id', 'username', 'email', 'role', 'phone_number', 'country', 'city', 'date_joined',
+                 'rating_summary']
         read_only_fields = ['id', 'date_joined']
 
+    def get_rating_summary(self, obj):
+        return rating_summary_data(obj)
+
 class SkillSerializer(serializers.ModelSerializer):
     class Meta:
         model = Skill
@@ -80,12 +140,17 @@ class WorkerProfileSerializer(serializers.ModelSerializer):
         write_only=True,
         required=False
     )
+    rating_summary = serializers.SerializerMethodField()
 
     class Meta:
         model = WorkerProfile
         fields = ['id', 'user', 'title', 'bio', 'skills', 'skill_ids', 'hourly_rate', 
-                 'currency', 'experience_years', 'availability', 'created_at', 'updated_at']
-        read_only_fields = ['id', 'created_at', 'updated_at']
+                 'currency', 'experience_years', 'availability', 'rating_summary', 'score',
+                 'created_at', 'updated_at']
+        read_only_fields = ['id', 'score', 'created_at', 'updated_at']
+
+    def get_rating_summary(self, obj):
+        return rating_summary_data(obj.user)
 
     def validate_currency(self, value):
         validator = CurrencyValidator()
@@ -134,7 +199,10 @@ class JobPostingSerializer(serializers.ModelSerializer):
 
     def get_applicants(self, obj):
         if self.context.get('request') and self.context['request'].user == obj.posted_by:
-            applications = obj.applications.select_related('worker')
+            # Prefetched by the job-serving viewsets (see serialized_jobs in views.py)
+            applications = getattr(obj, 'owner_applications', None)
+            if applications is None:
+                applications = obj.applications.select_related('worker')
             return [
                 {
                     "worker_id": app.worker.id,
@@ -149,7 +217,9 @@ class JobPostingSerializer(serializers.ModelSerializer):
         return []
 
     def get_application_count(self, obj):
-        return obj.applications.count()
+        # Annotated by serialized_jobs; counted here for jobs just created
+        count = getattr(obj, 'application_count', None)
+        return obj.applications.count() if count is None else count
 
     def create(self, validated_data):
         category_id = validated_data.pop('category_id', None)
@@ -203,7 +273,7 @@ class ApplicationSerializer(serializers.ModelSerializer):
 
     def validate_job_id(self, value):
         try:
-            job = JobPosting.objects.get(id=value)
+            job = JobPosting.objects.using(shard_for_id(value)).get(id=value)
             if job.status not in ['active']:
                 raise serializers.ValidationError("Cannot apply to inactive job")
             return value
@@ -215,16 +285,11 @@ class ApplicationSerializer(serializers.ModelSerializer):
         if request and request.user:
             job_id = attrs.get('job_id')
             if job_id:
-                try:
-                    job = JobPosting.objects.get(id=job_id)
-                    if job.posted_by == request.user:
-                        raise serializers.ValidationError("Cannot apply to your own job")
-                    
-                    # Check if already applied
-                    if Application.objects.filter(worker=request.user, job=job).exists():
-                        raise serializers.ValidationError("Already applied to this job")
-                except JobPosting.DoesNotExist:
-                    pass
+                role = get_participation_role(request.user.id, job_id)
+                if role == OWNER:
+                    raise serializers.ValidationError("Cannot apply to your own job")
+                if role:
+                    raise serializers.ValidationError("Already applied to this job")
         return attrs
 
 class ReviewSerializer(serializers.ModelSerializer):
@@ -255,21 +320,19 @@ class ReviewSerializer(serializers.ModelSerializer):
         request = self.context.get('request')
         if request and request.user:
             reviewee_id = attrs.get('reviewee_id')
-            job_id = attrs.get('job_id')
             
             if reviewee_id == request.user.id:
                 raise serializers.ValidationError("Cannot review yourself")
-            
-            # Check if review already exists
-            if Review.objects.filter(
-                reviewer=request.user,
-                reviewee_id=reviewee_id,
-                job_id=job_id
-            ).exists():
-                raise serializers.ValidationError("Review already exists for this job")
         
         return attrs
 
+    def create(self, validated_data):
+        # Duplicates are caught by the (reviewer, reviewee, job) unique constraint, not a lookup first
+        try:
+            return super().create(validated_data)
+        except IntegrityError:
+            raise serializers.ValidationError("Review already exists for this job")
+
 class PaymentTransactionSerializer(serializers.ModelSerializer):
     sender = UserSerializer(read_only=True)
     receiver = UserSerializer(read_only=True)
@@ -283,8 +346,8 @@ class PaymentTransactionSerializer(serializers.ModelSerializer):
         model = PaymentTransaction
         fields = ['id', 'transaction_type', 'status', 'amount', 'currency', 
                  'sender', 'receiver', 'receiver_id', 'job', 'job_id', 
-                 'reference_id', 'payment_method', 'created_at', 'updated_at']
-        read_only_fields = ['id', 'sender', 'reference_id', 'created_at', 'updated_at']
+                 'reference_id', 'legacy_reference_id', 'payment_method', 'created_at', 'updated_at']
+        read_only_fields = ['id', 'sender', 'reference_id', 'legacy_reference_id', 'created_at', 'updated_at']
 
     def validate_amount(self, value):
         if value <= 0:
@@ -296,6 +359,51 @@ class PaymentTransactionSerializer(serializers.ModelSerializer):
         validator(value)
         return value
 
+class BulkPaymentItemSerializer(serializers.Serializer):
+    receiver_id = serializers.IntegerField()
+    amount = serializers.DecimalField(max_digits=10, decimal_places=2, required=False)
+
+    def validate_amount(self, value):
+        if value <= 0:
+            raise serializers.ValidationError("Amount must be greater than 0")
+        return value
+
+class BulkPaymentSerializer(serializers.Serializer):
+    """
+    Payments to several workers on one job. Either list ``payments`` (with
+    per-recipient amounts, falling back to ``amount``) or give just ``amount``
+    to pay every accepted applicant the same.
+    """
+    MAX_RECIPIENTS = 500
+
+    payments = BulkPaymentItemSerializer(many=True, required=False)
+    amount = serializers.DecimalField(max_digits=10, decimal_places=2, required=False)
+    currency = serializers.CharField(max_length=3, default='USD')
+    payment_method = serializers.CharField(max_length=50, required=False, allow_blank=True, default='')
+
+    def validate_amount(self, value):
+        if value <= 0:
+            raise serializers.ValidationError("Amount must be greater than 0")
+        return value
+
+    def validate_currency(self, value):
+        validator = CurrencyValidator()
+        validator(value)
+        return value
+
+    def validate_payments(self, value):
+        if len(value) > self.MAX_RECIPIENTS:
+            raise serializers.ValidationError(f"At most {self.MAX_RECIPIENTS} payments per request")
+        return value
+
+    def validate(self, attrs):
+        payments = attrs.get('payments')
+        if not payments and 'amount' not in attrs:
+            raise serializers.ValidationError("Provide payments or an amount for all accepted workers")
+        if payments and 'amount' not in attrs and any('amount' not in item for item in payments):
+            raise serializers.ValidationError("Every payment needs an amount when no default amount is given")
+        return attrs
+
 class PaymentMethodSerializer(serializers.ModelSerializer):
     user = UserSerializer(read_only=True)
 
@@ -310,14 +418,16 @@ class PaymentMethodSerializer(serializers.ModelSerializer):
         phone_number = attrs.get('phone_number')
         
         # Validate mobile money requirements
-        if payment_type in ['mpesa', 'airtel_money', 'mtn_mobile_money']:
+        if payment_type in get_registry().mobile_money_types:
             if not phone_number:
                 raise serializers.ValidationError("Phone number is required for mobile money payments")
             
             # Get user's country from context
             request = self.context.get('request')
-            if request and request.user and request.user.country:
+            country = request.user.country if request and request.user.is_authenticated else ''
+            attrs['phone_number'] = normalize_or_keep(phone_number, country)
+            if country:
                 validator = MobileMoneyValidator()
-                validator(payment_type, phone_number, request.user.country)
+                validator(payment_type, attrs['phone_number'], country)
         
         return attrs
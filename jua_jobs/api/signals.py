@@ -0,0 +1,97 @@
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models.signals import pre_save, post_save, post_delete, post_migrate
+from django.dispatch import receiver
+
+from .authentication import invalidate_cached_user
+from .models import User, Skill, Category, Review, PaymentTransaction, JobPosting, Application
+from .utils.ledger import POSTED_STATUS, sync_ledger
+from .utils.participation import (
+    OWNER, add_participation, application_role, remove_participation, set_participation, sync_job_owner
+)
+from .utils.ratings import record_review_added, record_review_removed
+from .utils.sharding import delete_reference_row, replicate_reference_row, seed_shard_ids, sharding_enabled
+
+@receiver(pre_save, sender=Review)
+def remember_previous_rating(sender, instance, **kwargs):
+    """Stash the stored reviewee/rating so an edit can move the review between buckets"""
+    instance._previous_rating = None
+    if instance.pk and not instance._state.adding:
+        instance._previous_rating = (
+            sender.objects.using(kwargs.get('using')).filter(pk=instance.pk).values_list('reviewee_id', 'rating').first()
+        )
+
+@receiver(post_save, sender=Review)
+def update_rating_summary_on_save(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        record_review_added(instance.reviewee_id, instance.rating, instance.created_at)
+        return
+
+    previous = getattr(instance, '_previous_rating', None)
+    if previous and previous != (instance.reviewee_id, instance.rating):
+        previous_reviewee_id, previous_rating = previous
+        record_review_removed(previous_reviewee_id, previous_rating)
+        record_review_added(instance.reviewee_id, instance.rating, instance.created_at)
+
+@receiver(post_delete, sender=Review)
+def update_rating_summary_on_delete(sender, instance, **kwargs):
+    record_review_removed(instance.reviewee_id, instance.rating)
+
+@receiver(post_save, sender=PaymentTransaction)
+def sync_ledger_on_save(sender, instance, created, raw=False, **kwargs):
+    if raw or (created and instance.status != POSTED_STATUS):
+        return
+    sync_ledger([instance])
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_cached_user_on_change(sender, instance, **kwargs):
+    # Drop it now and again on commit, so a request racing the transaction can't re-cache the old row
+    invalidate_cached_user(instance.pk)
+    transaction.on_commit(lambda: invalidate_cached_user(instance.pk))
+
+@receiver(post_save, sender=JobPosting)
+def index_job_owner(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        if instance.posted_by_id:
+            add_participation(instance.posted_by_id, instance.pk, OWNER)
+    else:
+        sync_job_owner(instance.pk, instance.posted_by_id)
+
+@receiver(post_save, sender=Application)
+def index_applicant(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    role = application_role(instance.status)
+    if created:
+        add_participation(instance.worker_id, instance.job_id, role)
+    else:
+        set_participation(instance.worker_id, instance.job_id, role)
+
+@receiver(post_delete, sender=Application)
+def unindex_applicant(sender, instance, **kwargs):
+    remove_participation(instance.worker_id, instance.job_id)
+
+@receiver(post_save, sender=User)
+@receiver(post_save, sender=Skill)
+@receiver(post_save, sender=Category)
+def replicate_to_shards(sender, instance, raw=False, using=DEFAULT_DB_ALIAS, **kwargs):
+    if raw or using != DEFAULT_DB_ALIAS or not sharding_enabled():
+        return
+    replicate_reference_row(instance)
+
+@receiver(post_delete, sender=User)
+@receiver(post_delete, sender=Skill)
+@receiver(post_delete, sender=Category)
+def delete_from_shards(sender, instance, using=DEFAULT_DB_ALIAS, **kwargs):
+    if using != DEFAULT_DB_ALIAS or not sharding_enabled():
+        return
+    delete_reference_row(instance)
+
+@receiver(post_migrate)
+def seed_shard_id_ranges(sender, using=DEFAULT_DB_ALIAS, **kwargs):
+    if sender.name == 'api':
+        seed_shard_ids(using)
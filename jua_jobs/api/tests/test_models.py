@@ -1,7 +1,14 @@
 from django.test import TestCase
 from django.contrib.auth import get_user_model
 from django.core.exceptions import ValidationError
-from api.models import JobPosting, Application, Review, WorkerProfile, Skill, Category, PaymentTransaction
+from api.models import JobPosting, Application, Review, WorkerProfile, Skill, Category, PaymentTransaction, UserRatingSummary
+from api.utils.ratings import reconcile_rating_summaries
+from api.utils.ledger import get_balances, sync_ledger, take_snapshots, verify_ledger
+from api.utils.ids import reference_id_timestamp
+from api.utils.participation import get_participation_role, rebuild_participation
+from api.models import LedgerEntry, BalanceSnapshot, PaymentMethod
+from datetime import timedelta
+from decimal import Decimal
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.utils import timezone
 import tempfile
@@ -128,6 +135,39 @@ class ApplicationModelTests(TestCase):
         with self.assertRaises(Exception):
             Application.objects.create(worker=self.worker, job=self.job, cover_letter=fake_file2)
 
+class JobParticipationTests(TestCase):
+
+    def setUp(self):
+        self.worker = User.objects.create_user(email='worker@example.com', password='pass123', role='worker')
+        self.poster = User.objects.create_user(email='poster@example.com', password='pass123', role='client')
+        self.job = JobPosting.objects.create(title='Plumber', description='Fix pipes', posted_by=self.poster)
+
+    def test_job_and_application_writes_maintain_index(self):
+        self.assertEqual(get_participation_role(self.poster.id, self.job.id), 'owner')
+        self.assertIsNone(get_participation_role(self.worker.id, self.job.id))
+
+        fake_file = SimpleUploadedFile("cv.pdf", b"file_content", content_type="application/pdf")
+        application = Application.objects.create(worker=self.worker, job=self.job, cover_letter=fake_file)
+        self.assertEqual(get_participation_role(self.worker.id, self.job.id), 'applicant')
+        application.status = 'accepted'
+        application.save()
+        self.assertEqual(get_participation_role(self.worker.id, self.job.id), 'accepted')
+        application.delete()
+        self.assertIsNone(get_participation_role(self.worker.id, self.job.id))
+
+    def test_owner_row_follows_job_owner(self):
+        self.job.posted_by = self.worker
+        self.job.save()
+        self.assertIsNone(get_participation_role(self.poster.id, self.job.id))
+        self.assertEqual(get_participation_role(self.worker.id, self.job.id), 'owner')
+
+    def test_rebuild_matches_signals(self):
+        fake_file = SimpleUploadedFile("cv.pdf", b"file_content", content_type="application/pdf")
+        Application.objects.create(worker=self.worker, job=self.job, cover_letter=fake_file, status='accepted')
+        before = set(self.job.participations.values_list('user_id', 'role'))
+        self.assertEqual(rebuild_participation(), 2)
+        self.assertEqual(set(self.job.participations.values_list('user_id', 'role')), before)
+
 class ReviewModelTests(TestCase):
 
     def setUp(self):
@@ -158,6 +198,49 @@ class ReviewModelTests(TestCase):
         with self.assertRaises(ValidationError):
             review.full_clean()
 
+class UserRatingSummaryTests(TestCase):
+
+    def setUp(self):
+        self.reviewer = User.objects.create_user(email='reviewer@example.com', password='pass123', role='client')
+        self.other_reviewer = User.objects.create_user(email='other@example.com', password='pass123', role='client')
+        self.reviewee = User.objects.create_user(email='reviewee@example.com', password='pass123', role='worker')
+        self.job = JobPosting.objects.create(title='Backend Dev', description='API work', posted_by=self.reviewer)
+
+    def create_review(self, reviewer, rating):
+        return Review.objects.create(
+            reviewer=reviewer, reviewee=self.reviewee, job=self.job, rating=rating, comment='Review'
+        )
+
+    def test_summary_tracks_create_update_and_delete(self):
+        first = self.create_review(self.reviewer, 5)
+        second = self.create_review(self.other_reviewer, 3)
+
+        summary = UserRatingSummary.objects.get(user=self.reviewee)
+        self.assertEqual(summary.review_count, 2)
+        self.assertEqual(summary.average_rating, 4.0)
+        self.assertEqual(summary.last_review_at, second.created_at)
+
+        first.rating = 1
+        first.save()
+        summary.refresh_from_db()
+        self.assertEqual((summary.rating_1, summary.rating_3, summary.rating_5), (1, 1, 0))
+        self.assertEqual(summary.average_rating, 2.0)
+
+        second.delete()
+        summary.refresh_from_db()
+        self.assertEqual(summary.review_count, 1)
+        self.assertEqual(summary.rating_distribution, [{'rating': 1, 'count': 1}])
+        self.assertEqual(summary.last_review_at, first.created_at)
+
+    def test_reconcile_repairs_drift(self):
+        self.create_review(self.reviewer, 4)
+        UserRatingSummary.objects.filter(user=self.reviewee).update(review_count=7, rating_sum=1)
+
+        stats = reconcile_rating_summaries()
+        self.assertEqual(stats['updated'], 1)
+        summary = UserRatingSummary.objects.get(user=self.reviewee)
+        self.assertEqual((summary.review_count, summary.rating_sum, summary.rating_4), (1, 4, 1))
+
 class PaymentTransactionModelTests(TestCase):
 
     def setUp(self):
@@ -182,3 +265,95 @@ class PaymentTransactionModelTests(TestCase):
         self.assertEqual(payment.amount, 1000.00)
         self.assertEqual(payment.status, 'pending')  # default status
         self.assertEqual(str(payment), 'job_payment - 1000.00 USD')
+
+    def test_default_reference_ids_are_time_ordered(self):
+        payments = [
+            PaymentTransaction.objects.create(
+                transaction_type='job_payment', amount=10, sender=self.sender, receiver=self.receiver
+            )
+            for _ in range(5)
+        ]
+        references = [payment.reference_id for payment in payments]
+        self.assertTrue(all(len(reference) == 26 for reference in references))
+        self.assertEqual(references, sorted(references))
+        self.assertEqual(len(set(references)), 5)
+        encoded = reference_id_timestamp(references[0])
+        self.assertLess(abs((encoded - payments[0].created_at).total_seconds()), 1)
+
+class PaymentMethodModelTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(email='worker@example.com', password='pass123', country='KE')
+
+    def test_national_numbers_use_the_owners_country(self):
+        method = PaymentMethod(user_id=self.user.id, payment_type='mpesa', phone_number='0722 000 111')
+        # The country column, then the insert
+        with self.assertNumQueries(2):
+            method.save()
+        self.assertEqual(method.phone_number, '+254722000111')
+
+    def test_resaving_a_stored_number_skips_the_user(self):
+        PaymentMethod.objects.create(user=self.user, payment_type='mpesa', phone_number='0722000111')
+        method = PaymentMethod.objects.get()
+        method.is_default = True
+        with self.assertNumQueries(1):
+            method.save()
+
+    def test_missing_user_is_a_validation_error(self):
+        method = PaymentMethod(payment_type='mpesa', phone_number='0722000111')
+        with self.assertRaises(ValidationError) as raised:
+            method.full_clean()
+        self.assertIn('user', raised.exception.message_dict)
+
+class LedgerTests(TestCase):
+
+    def setUp(self):
+        self.sender = User.objects.create_user(email='sender@example.com', password='pass123', role='client')
+        self.receiver = User.objects.create_user(email='receiver@example.com', password='pass123', role='worker')
+
+    def pay(self, amount, reference, status='completed', currency='KES'):
+        return PaymentTransaction.objects.create(
+            transaction_type='job_payment', status=status, amount=amount, currency=currency,
+            sender=self.sender, receiver=self.receiver, reference_id=reference
+        )
+
+    def test_completed_transactions_are_posted_and_reversed(self):
+        pending = self.pay(Decimal('50.00'), 'REF-1', status='pending')
+        self.assertFalse(LedgerEntry.objects.exists())
+
+        pending.status = 'completed'
+        pending.save()
+        self.assertEqual(get_balances(self.receiver), {'KES': Decimal('50.00')})
+        self.assertEqual(get_balances(self.sender), {'KES': Decimal('-50.00')})
+
+        pending.status = 'cancelled'
+        pending.save()
+        self.assertEqual(LedgerEntry.objects.count(), 4)
+        self.assertEqual(get_balances(self.receiver), {'KES': Decimal('0.00')})
+
+    def test_sync_posts_the_stored_status_once(self):
+        payment = self.pay(Decimal('30.00'), 'REF-1', status='pending')
+        # Completed by another writer; this copy is stale and passed twice
+        PaymentTransaction.objects.filter(pk=payment.pk).update(status='completed')
+        self.assertEqual(sync_ledger([payment, payment]), 2)
+        self.assertEqual(sync_ledger([payment]), 0)
+        self.assertEqual(get_balances(self.receiver), {'KES': Decimal('30.00')})
+
+    def test_balance_is_snapshot_plus_newer_entries(self):
+        self.pay(Decimal('100.00'), 'REF-1')
+        self.pay(Decimal('10.00'), 'REF-2', currency='USD')
+        self.assertEqual(take_snapshots(safety_lag=timedelta(0)), 4)
+        self.pay(Decimal('25.50'), 'REF-3')
+
+        self.assertEqual(
+            BalanceSnapshot.objects.get(user=self.receiver, currency='KES').balance, Decimal('100.00')
+        )
+        self.assertEqual(get_balances(self.receiver), {'KES': Decimal('125.50'), 'USD': Decimal('10.00')})
+        self.assertFalse(any(verify_ledger().values()))
+
+    def test_verify_ledger_reports_tampering(self):
+        payment = self.pay(Decimal('40.00'), 'REF-1')
+        LedgerEntry.objects.filter(transaction=payment, user=self.receiver).update(amount=Decimal('45.00'))
+        issues = verify_ledger()
+        self.assertEqual(issues['unbalanced_transactions'][0]['transaction_id'], payment.id)
+        self.assertEqual(len(issues['amount_mismatches']), 1)
@@ -0,0 +1,92 @@
+import re
+from unittest import skipUnless
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.db import connection
+from django.test import TestCase
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+from api.models import JobPosting, Application, PaymentTransaction
+from api.views import JobPostingViewSet, ApplicationViewSet, ReviewViewSet, PaymentTransactionViewSet
+
+User = get_user_model()
+
+@skipUnless(connection.vendor == 'sqlite', 'Asserts on SQLite EXPLAIN QUERY PLAN output')
+class QueryPlanTests(TestCase):
+    """
+    The hot viewset queries must reach their main table through an index.
+    A plan step like "SCAN api_jobposting" (no USING ...) is a full table scan;
+    "USE TEMP B-TREE FOR ORDER BY" means the rows are sorted after fetching
+    instead of read in index order.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.client_user = User.objects.create_user(email="client@example.com", username="client", password="pass123", role='client')
+        cls.worker = User.objects.create_user(email="worker@example.com", username="worker", password="pass123", role='worker')
+
+    def viewset_queryset(self, viewset_class, user, params=None, action='list'):
+        request = Request(APIRequestFactory().get('/', params or {}))
+        request.user = user
+        view = viewset_class(action=action, request=request, args=(), kwargs={}, format_kwarg=None)
+        return view.filter_queryset(view.get_queryset())
+
+    def assertIndexed(self, queryset, table, index=None, ordered=False):
+        plan = queryset.explain()
+        steps = [line for line in plan.splitlines() if re.search(rf'\b(SCAN|SEARCH) {table}\b', line)]
+        self.assertTrue(steps, f'{table} not in plan:\n{plan}')
+        for step in steps:
+            self.assertIn('USING', step, f'Full scan of {table}:\n{plan}')
+        if index is not None:
+            self.assertIn(index, plan)
+        if ordered:
+            self.assertNotIn('TEMP B-TREE FOR ORDER BY', plan)
+
+    def test_public_job_listing(self):
+        queryset = self.viewset_queryset(JobPostingViewSet, AnonymousUser())
+        self.assertIndexed(queryset, 'api_jobposting', 'api_job_status_recent_idx', ordered=True)
+
+    def test_client_job_listing_by_status(self):
+        queryset = self.viewset_queryset(JobPostingViewSet, self.client_user, {'status': 'paused'})
+        self.assertIndexed(queryset, 'api_jobposting', 'api_job_status_recent_idx', ordered=True)
+
+    def test_job_listing_by_deadline(self):
+        queryset = self.viewset_queryset(JobPostingViewSet, AnonymousUser(), {'ordering': 'deadline'})
+        self.assertIndexed(queryset, 'api_jobposting', 'api_job_status_deadline_idx', ordered=True)
+
+    def test_dashboard_counts(self):
+        # count() drops the default ordering
+        self.assertIndexed(JobPosting.objects.filter(posted_by=self.client_user, status='active').order_by(),
+                           'api_jobposting', 'api_job_poster_status_idx')
+        self.assertIndexed(Application.objects.filter(worker=self.worker, status='pending').order_by(),
+                           'api_application', 'api_app_worker_status_idx')
+        self.assertIndexed(Application.objects.filter(job__posted_by=self.client_user, status='pending').order_by(),
+                           'api_application')
+
+    def test_job_applicants_by_status(self):
+        job = JobPosting.objects.create(title="Job", description="Description", posted_by=self.client_user)
+        self.assertIndexed(job.applications.filter(status='accepted'), 'api_application', 'api_app_job_status_idx')
+
+    def test_application_listings(self):
+        self.assertIndexed(self.viewset_queryset(ApplicationViewSet, self.worker, {'status': 'pending'}),
+                           'api_application', 'api_app_worker_status_idx')
+        self.assertIndexed(self.viewset_queryset(ApplicationViewSet, self.client_user), 'api_application')
+
+    def test_user_reviews(self):
+        queryset = self.viewset_queryset(ReviewViewSet, AnonymousUser(), action='user_reviews')
+        self.assertIndexed(queryset.filter(reviewee_id=self.worker.id), 'api_review',
+                           'api_review_reviewee_idx', ordered=True)
+
+    def test_payment_listing(self):
+        queryset = self.viewset_queryset(PaymentTransactionViewSet, self.worker)
+        self.assertIndexed(queryset, 'api_paymenttransaction')
+        self.assertIndexed(queryset.filter(receiver=self.worker), 'api_paymenttransaction',
+                           'api_payment_receiver_idx', ordered=True)
+
+    def test_payout_queue(self):
+        pending = PaymentTransaction.objects.filter(
+            transaction_type='withdrawal', status='pending', payment_method__in=['mpesa', 'airtel_money']
+        ).order_by('id')
+        self.assertIndexed(pending, 'api_paymenttransaction', 'api_payment_payout_queue_idx')
+
@@ -0,0 +1,637 @@
+import asyncio
+import io
+import json
+import os
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import connection
+from django.db.models import F
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from api.models import User, PaymentMethod, PaymentTransaction, LedgerEntry, JobPosting, WorkerProfile, Skill, RequestProfile, SlowQuery
+from api.models import Application, Review, JobParticipation, UserRatingSummary, BalanceSnapshot
+from api.utils.payouts import ProviderClient, claim_ids, claim_withdrawals, process_payouts
+from api.utils.provider_simulator import ProviderSimulator
+from api.utils.reconciliation import reconcile_statement
+from api.utils.exports import iter_values
+from api.utils.worker_import import import_workers
+from api.utils.phone_numbers import normalize_many, normalize_phone
+from api.utils.african_validators import AfricanPhoneValidator, CurrencyValidator, get_registry, validate_many
+from api.utils.revocation import BloomFilter, RevocationStore, prune_revoked_tokens
+from api import throttling
+from api.throttling import LocalBuckets
+from api.utils.sqlite import current_pragmas, run_maintenance
+from api.utils.sharding import shard_for_country, shard_for_id
+from api.db_routers import CountryShardRouter
+from api.utils.caching import PerformanceMonitor
+from api.utils.query_stats import QueryStats, sql_shape, track_queries
+from api.utils.slow_queries import redact, top_offenders
+from api.utils.synthetic_data import DataGenerator
+from api.utils.ledger import get_balances, take_snapshots, verify_ledger
+from api.utils import metrics
+from api.utils.profiling import SAMPLED, hot_paths, profile_request
+
+class ProviderSimulatorMixin:
+    """Runs a ProviderSimulator on its own event loop thread for the test"""
+
+    def setUp(self):
+        self.simulator = ProviderSimulator(latency_ms=1, jitter_ms=0, failure_rate=0, error_rate=0, seed=1)
+        self.loop = asyncio.new_event_loop()
+        started = threading.Event()
+
+        def serve():
+            asyncio.set_event_loop(self.loop)
+            self.port = self.loop.run_until_complete(self.simulator.start(port=0))
+            started.set()
+            self.loop.run_forever()
+
+        self.thread = threading.Thread(target=serve, daemon=True)
+        self.thread.start()
+        started.wait(5)
+
+    def tearDown(self):
+        asyncio.run_coroutine_threadsafe(self.simulator.stop(), self.loop).result(5)
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join(5)
+        self.loop.close()
+
+    def config(self, **overrides):
+        return {
+            'BATCH_SIZE': 3, 'TIMEOUT': 5, 'RETRIES': 2, 'BACKOFF': 0,
+            'PROVIDERS': {'mpesa': {'url': f'http://127.0.0.1:{self.port}/mpesa/payouts', 'concurrency': 2}},
+            **overrides,
+        }
+
+class PayoutEngineTests(ProviderSimulatorMixin, TransactionTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.worker = User.objects.create_user(email='worker@example.com', password='pass123', country='KE')
+        PaymentMethod.objects.create(user=self.worker, payment_type='mpesa', phone_number='+254712345678')
+
+    def withdraw(self, reference, payment_method='mpesa'):
+        return PaymentTransaction.objects.create(
+            transaction_type='withdrawal', amount='100.00', currency='KES', sender=self.worker,
+            receiver=self.worker, reference_id=reference, payment_method=payment_method
+        )
+
+    def test_withdrawals_are_paid_in_batches(self):
+        for i in range(7):
+            self.withdraw(f'WD-{i}')
+        bank = self.withdraw('WD-bank', payment_method='bank_transfer')
+
+        totals = process_payouts(config=self.config())
+
+        self.assertEqual(totals, {'completed': 7, 'unresolved': 0})
+        self.assertEqual(PaymentTransaction.objects.filter(status='completed').count(), 7)
+        self.assertEqual(LedgerEntry.objects.count(), 14)
+        bank.refresh_from_db()
+        self.assertEqual(bank.status, 'pending')
+        self.assertEqual(self.simulator.stats['requests'], 7)
+
+    def test_transient_errors_are_retried(self):
+        self.simulator.error_rate = 0.5
+        for i in range(5):
+            self.withdraw(f'WD-{i}')
+
+        totals = process_payouts(config=self.config(RETRIES=20))
+
+        self.assertEqual(totals, {'completed': 5, 'unresolved': 0})
+        self.assertGreater(self.simulator.stats['errors'], 0)
+
+    def test_declines_and_missing_numbers_fail(self):
+        self.simulator.failure_rate = 1
+        self.withdraw('WD-declined')
+        PaymentTransaction.objects.create(
+            transaction_type='withdrawal', amount='5.00', currency='KES', reference_id='WD-no-number',
+            sender=self.worker, receiver=User.objects.create_user(email='new@example.com', password='pass123'),
+            payment_method='mpesa'
+        )
+
+        totals = process_payouts(config=self.config())
+
+        self.assertEqual(totals, {'failed': 2, 'unresolved': 0})
+        self.assertEqual(self.simulator.stats['requests'], 1)
+        self.assertFalse(LedgerEntry.objects.exists())
+
+    def test_claims_return_only_rows_this_call_moved(self):
+        first, second, third = (self.withdraw(f'WD-{i}') for i in range(3))
+        # Another engine claimed ``first`` between this engine's select and update
+        self.assertEqual(claim_ids([first.id]), [first.id])
+        self.assertEqual(sorted(claim_ids([first.id, second.id])), [second.id])
+
+        rows = claim_withdrawals(10, ['mpesa'])
+        self.assertEqual([row['id'] for row in rows], [third.id])
+        self.assertEqual(rows[0]['phone_number'], '+254712345678')
+        self.assertEqual(claim_withdrawals(10, ['mpesa']), [])
+        self.assertEqual(PaymentTransaction.objects.filter(status='processing').count(), 3)
+
+    def test_client_follows_the_url_scheme(self):
+        client = ProviderClient('https://payouts.example.com/mpesa')
+        self.assertEqual((client.ssl, client.port, client.path), (True, 443, '/mpesa'))
+        client = ProviderClient('http://127.0.0.1:8080/mpesa')
+        self.assertEqual((client.ssl, client.port), (False, 8080))
+        with self.assertRaises(ValueError):
+            ProviderClient('ftp://payouts.example.com/mpesa')
+
+@override_settings(SHARDING={**settings.SHARDING, 'ENABLED': True})
+class ShardedBatchJobTests(ProviderSimulatorMixin, TransactionTestCase):
+    databases = {'default', 'shard_east', 'shard_west', 'shard_south'}
+
+    def setUp(self):
+        super().setUp()
+        self.client_user = User.objects.create_user(
+            email='client@example.com', password='pass123', role='client', country='NG'
+        )
+        self.worker = User.objects.create_user(email='worker@example.com', password='pass123', country='KE')
+        PaymentMethod.objects.create(user=self.worker, payment_type='mpesa', phone_number='+254712345678')
+
+    def pay(self, using, reference, amount='100.00', status='pending', transaction_type='withdrawal'):
+        sender = self.worker if transaction_type == 'withdrawal' else self.client_user
+        return PaymentTransaction.objects.using(using).create(
+            transaction_type=transaction_type, amount=amount, currency='KES', status=status,
+            sender=sender, receiver=self.worker, reference_id=reference, payment_method='mpesa'
+        )
+
+    def test_withdrawals_on_every_shard_are_paid(self):
+        for i in range(3):
+            self.pay('shard_east', f'WD-E{i}')
+        self.pay('shard_west', 'WD-W')
+        self.pay('default', 'WD-D')
+
+        totals = process_payouts(config=self.config())
+
+        self.assertEqual(totals, {'completed': 5, 'unresolved': 0})
+        for alias, paid in (('default', 1), ('shard_east', 3), ('shard_west', 1)):
+            self.assertEqual(PaymentTransaction.objects.using(alias).filter(status='completed').count(), paid)
+            self.assertEqual(LedgerEntry.objects.using(alias).count(), 2 * paid)
+        self.assertEqual(self.simulator.stats['requests'], 5)
+
+    def test_reconciliation_finds_and_corrects_rows_on_shards(self):
+        self.pay('shard_east', 'REF-E', status='processing')
+        self.pay('default', 'REF-D', status='processing')
+        statement = io.StringIO('Reference,Amount,Currency,Status\nREF-E,100.00,KES,completed\nREF-D,100.00,KES,failed\n')
+
+        report = reconcile_statement(statement, apply=True)
+
+        self.assertEqual(report['matched'], 2)
+        self.assertEqual(report['mismatches']['missing'], 0)
+        self.assertEqual(report['corrected'], 2)
+        self.assertEqual(PaymentTransaction.objects.using('shard_east').get(reference_id='REF-E').status, 'completed')
+        self.assertEqual(LedgerEntry.objects.using('shard_east').count(), 2)
+        self.assertEqual(PaymentTransaction.objects.using('default').get(reference_id='REF-D').status, 'failed')
+
+    def test_snapshots_and_checks_cover_every_shard(self):
+        self.pay('shard_east', 'REF-E', status='completed', transaction_type='job_payment')
+        self.pay('shard_west', 'REF-W', amount='40.00', status='completed', transaction_type='job_payment')
+        self.pay('default', 'REF-D', amount='5.00', status='completed', transaction_type='job_payment')
+
+        # A client and a worker pair on each shard
+        self.assertEqual(take_snapshots(safety_lag=timedelta(0)), 6)
+        for alias in ('default', 'shard_east', 'shard_west'):
+            self.assertEqual(BalanceSnapshot.objects.using(alias).count(), 2)
+        self.pay('shard_east', 'REF-E2', amount='1.00', status='completed', transaction_type='job_payment')
+        self.assertEqual(get_balances(self.worker), {'KES': Decimal('146.00')})
+        self.assertFalse(any(verify_ledger().values()))
+
+        BalanceSnapshot.objects.using('shard_west').filter(user=self.worker).update(balance='1.00')
+        self.assertEqual(
+            [(row['database'], row['user_id']) for row in verify_ledger()['snapshot_mismatches']],
+            [('shard_west', self.worker.id)]
+        )
+
+class StatementReconciliationTests(TestCase):
+
+    def setUp(self):
+        self.client_user = User.objects.create_user(email='client@example.com', password='pass123', role='client')
+        self.worker = User.objects.create_user(email='worker@example.com', password='pass123')
+
+    def pay(self, reference, amount='100.00', status='processing'):
+        return PaymentTransaction.objects.create(
+            transaction_type='withdrawal', amount=amount, currency='KES', status=status,
+            sender=self.worker, receiver=self.worker, reference_id=reference
+        )
+
+    def statement(self, *rows):
+        return io.StringIO('Reference,Amount,Currency,Status\n' + ''.join(f'{row}\n' for row in rows))
+
+    def test_mismatches_are_reported(self):
+        self.pay('REF-OK', status='completed')
+        self.pay('REF-DRIFT', amount='90.00')
+        self.pay('REF-LATE')
+        statement = self.statement(
+            'REF-OK,100.00,KES,SUCCESS', 'REF-DRIFT,100.00,KES,SUCCESS', 'REF-LATE,100.00,KES,SUCCESS',
+            'REF-GHOST,5.00,KES,SUCCESS', 'REF-BAD,abc,KES,SUCCESS',
+        )
+
+        report = reconcile_statement(statement, chunk_size=2)
+
+        self.assertEqual(report['rows'], 5)
+        self.assertEqual(report['matched'], 3)
+        self.assertEqual(report['mismatches'], {
+            'missing': 1, 'amount_drift': 1, 'currency_drift': 0, 'status_drift': 1, 'invalid': 1,
+        })
+        self.assertEqual(report['corrected'], 0)
+        self.assertEqual(PaymentTransaction.objects.get(reference_id='REF-LATE').status, 'processing')
+
+    def test_apply_corrects_status_and_posts_ledger(self):
+        self.pay('REF-LATE')
+        self.pay('REF-DECLINED', status='completed')
+        statement = self.statement('REF-LATE,100.00,KES,completed', 'REF-DECLINED,100.00,KES,declined')
+
+        report = reconcile_statement(statement, apply=True)
+
+        self.assertEqual(report['corrected'], 2)
+        self.assertEqual(PaymentTransaction.objects.get(reference_id='REF-LATE').status, 'completed')
+        self.assertEqual(PaymentTransaction.objects.get(reference_id='REF-DECLINED').status, 'failed')
+        # Posted for the late completion; posted then reversed for the decline
+        self.assertEqual(LedgerEntry.objects.filter(transaction__reference_id='REF-LATE').count(), 2)
+        self.assertEqual(LedgerEntry.objects.filter(transaction__reference_id='REF-DECLINED').count(), 4)
+        self.assertEqual(sum(entry.amount for entry in LedgerEntry.objects.all()), Decimal('0'))
+
+class ExportTests(TestCase):
+
+    def test_keyset_chunks_cover_every_row_once(self):
+        client = User.objects.create_user(email='client@example.com', password='pass123', role='client')
+        JobPosting.objects.bulk_create([
+            JobPosting(title=f'Job {i}', description='details', posted_by=client) for i in range(7)
+        ])
+        chunks = list(iter_values(JobPosting.objects.filter(posted_by=client).order_by('-title'), ['title'], chunk_size=3))
+        self.assertEqual([len(chunk) for chunk in chunks], [3, 3, 1])
+        self.assertEqual(sorted(row['title'] for chunk in chunks for row in chunk), [f'Job {i}' for i in range(7)])
+
+class ValidatorRegistryTests(SimpleTestCase):
+
+    def test_numbers_without_country_dispatch_on_prefix(self):
+        registry = get_registry()
+        self.assertEqual([rule.code for rule in registry.rules_for_number('+254712345678')], ['KE'])
+        self.assertEqual([rule.code for rule in registry.rules_for_number('+27821234567')], ['ZA'])
+        self.assertEqual(registry.rules_for_number('+44201234567'), ())
+        AfricanPhoneValidator()('+27821234567')
+        with self.assertRaises(ValidationError):
+            AfricanPhoneValidator()('+44201234567')
+
+    def test_validate_many(self):
+        errors = validate_many(['+254712345678', '+254612345678', '', '+256712345678'], 'KE')
+        self.assertEqual([error is None for error in errors], [True, False, True, False])
+        errors = validate_many(['+254712345678', '+256712345678'], ['KE', 'UG'])
+        self.assertEqual(errors, [None, None])
+
+    def test_currencies_are_a_frozen_set(self):
+        self.assertIsInstance(get_registry().currencies, frozenset)
+        CurrencyValidator()('UGX')
+        with self.assertRaises(ValidationError):
+            CurrencyValidator()('GBP')
+
+    def test_registry_rebuilds_when_settings_change(self):
+        countries = {'GH': {'name': 'Ghana', 'currency': 'GHS', 'dialing_code': '233',
+                            'phone_pattern': r'^\+233[235]\d{8}$'}}
+        with override_settings(AFRICAN_COUNTRIES=countries):
+            self.assertEqual(validate_many(['+233241234567']), [None])
+            self.assertIn('GHS', get_registry().currencies)
+        self.assertNotIn('GHS', get_registry().currencies)
+
+class PhoneNormalizationTests(TestCase):
+
+    def test_common_formats_normalize_to_e164(self):
+        inputs = ['0712 345 678', '+254 712-345-678', '254712345678', '00254712345678', '712345678']
+        self.assertEqual(
+            [number for number, _ in normalize_many(inputs, 'KE')], ['+254712345678'] * len(inputs)
+        )
+        self.assertEqual(normalize_phone('0803 123 4567', 'NG'), '+2348031234567')
+
+    def test_invalid_numbers_report_errors(self):
+        results = normalize_many(['0612345678', '07123', 'abc', '', '2567123'], 'KE')
+        self.assertTrue(all(number is None and error for number, error in results))
+        with self.assertRaises(ValidationError):
+            normalize_phone('0612345678', 'KE')
+
+    def test_without_country_only_international_numbers_resolve(self):
+        self.assertEqual(
+            normalize_many(['256712345678', '0712345678'])[0], ('+256712345678', None)
+        )
+        self.assertIsNone(normalize_many(['0712345678'])[0][0])
+
+    def test_models_store_normalized_numbers(self):
+        user = User.objects.create_user(
+            email='worker@example.com', password='pass123', country='KE', phone_number='0712 345 678'
+        )
+        method = PaymentMethod.objects.create(user=user, payment_type='mpesa', phone_number='0722-000-111')
+        self.assertEqual(User.objects.get(phone_number='+254712345678'), user)
+        self.assertEqual(PaymentMethod.objects.get(pk=method.pk).phone_number, '+254722000111')
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class WorkerImportTests(TestCase):
+
+    def row(self, i, **overrides):
+        return {
+            'email': f'worker{i}@example.com', 'password': 'password123', 'country': 'KE',
+            'phone_number': f'0712 000 {i:03d}', 'title': 'Plumber', 'hourly_rate': '12.50',
+            'currency': 'KES', 'experience_years': '3', 'skills': 'Plumbing; Welding', **overrides,
+        }
+
+    def test_bulk_import_creates_users_profiles_and_skills(self):
+        Skill.objects.create(name='Plumbing')
+        User.objects.create_user(email='taken@example.com', password='pass123')
+        rows = [self.row(i) for i in range(5)] + [
+            self.row(5, email='taken@example.com'),
+            self.row(6, title=''),
+            self.row(7, email='worker0@example.com'),
+            self.row(8, phone_number='12'),
+        ]
+
+        with CaptureQueriesContext(connection) as queries:
+            report = import_workers(rows, chunk_size=3, processes=0)
+
+        self.assertEqual((report['total'], report['created'], report['failed']), (9, 5, 4))
+        self.assertEqual([error['row'] for error in report['errors']], [6, 7, 8, 9])
+        self.assertIn('email', report['errors'][0]['errors'])
+        self.assertIn('title', report['errors'][1]['errors'])
+        self.assertIn('phone_number', report['errors'][3]['errors'])
+
+        profile = WorkerProfile.objects.select_related('user').get(user__email='worker3@example.com')
+        self.assertEqual(profile.user.phone_number, '+254712000003')
+        self.assertEqual(profile.user.role, 'worker')
+        self.assertTrue(profile.user.check_password('password123'))
+        self.assertEqual(sorted(profile.skills.values_list('name', flat=True)), ['Plumbing', 'Welding'])
+        self.assertEqual(Skill.objects.count(), 2)
+        # Queries scale with chunks, not rows
+        self.assertLess(len(queries.captured_queries), 40)
+
+    def test_rows_are_checked_against_the_model_fields(self):
+        rows = [
+            self.row(1, country='XX'),
+            self.row(2, country='KEN'),
+            self.row(3, availability='sometimes'),
+            self.row(4, hourly_rate='NaN'),
+            self.row(5, hourly_rate='Infinity'),
+            self.row(6, hourly_rate='123456789.00'),
+            self.row(7, username='x' * 151),
+            self.row(8, username='has spaces'),
+            self.row(9, title='t' * 201),
+            self.row(10, city='c' * 101),
+            self.row(11, phone_number='+234 803 123 4567'),
+            self.row(12, availability='part_time', city='Nairobi'),
+        ]
+        report = import_workers(rows, processes=0)
+        errors = {error['row']: set(error['errors']) for error in report['errors']}
+        self.assertEqual(errors, {
+            1: {'country'}, 2: {'country'}, 3: {'availability'}, 4: {'hourly_rate'}, 5: {'hourly_rate'},
+            6: {'hourly_rate'}, 7: {'username'}, 8: {'username'}, 9: {'title'}, 10: {'city'},
+            11: {'phone_number'},
+        })
+        self.assertEqual(report['created'], 1)
+        self.assertEqual(WorkerProfile.objects.get().availability, 'part_time')
+
+    def test_rows_without_password_get_unusable_password(self):
+        report = import_workers([self.row(1, password='')], processes=0)
+        self.assertEqual(report['created'], 1)
+        self.assertFalse(User.objects.get(email='worker1@example.com').has_usable_password())
+
+    def test_passwords_hashed_in_process_pool(self):
+        report = import_workers([self.row(i) for i in range(4)], processes=2)
+        self.assertEqual(report['created'], 4)
+        self.assertTrue(User.objects.get(email='worker2@example.com').check_password('password123'))
+
+class RevocationStoreTests(TestCase):
+
+    def test_bloom_filter_has_no_false_negatives(self):
+        bloom = BloomFilter(1000, 0.01)
+        for i in range(1000):
+            bloom.add(f'jti-{i}')
+        self.assertTrue(all(f'jti-{i}' in bloom for i in range(1000)))
+        false_positives = sum(f'other-{i}' in bloom for i in range(10000))
+        self.assertLess(false_positives, 300)
+
+    def test_revocations_from_other_processes_are_synced(self):
+        from api.models import RevokedToken
+        expires = timezone.now() + timedelta(days=1)
+        store = RevocationStore(capacity=100, sync_interval=0)
+        self.assertFalse(store.is_revoked('a'))
+
+        RevokedToken.objects.create(jti='a', expires_at=expires)
+        self.assertTrue(store.is_revoked('a'))
+        self.assertTrue(store.revoke('b', expires))
+        self.assertFalse(store.revoke('b', expires))
+        self.assertTrue(store.is_revoked('b'))
+
+    def test_prune_drops_expired_revocations(self):
+        from api.models import RevokedToken
+        RevokedToken.objects.create(jti='old', expires_at=timezone.now() - timedelta(minutes=1))
+        RevokedToken.objects.create(jti='live', expires_at=timezone.now() + timedelta(days=1))
+        self.assertEqual(prune_revoked_tokens(), 1)
+        self.assertEqual(list(RevokedToken.objects.values_list('jti', flat=True)), ['live'])
+
+class LocalBucketTests(SimpleTestCase):
+
+    def test_bucket_refills_over_time(self):
+        buckets = LocalBuckets()
+        self.assertEqual(buckets.take('k', 2, 100, 2), (True, 0))
+        allowed, wait = buckets.take('k', 2, 100, 1)
+        self.assertFalse(allowed)
+        self.assertGreater(wait, 0)
+        time.sleep(wait + 0.01)
+        self.assertTrue(buckets.take('k', 2, 100, 1)[0])
+
+    def test_full_buckets_are_evicted(self):
+        buckets = LocalBuckets(max_buckets=2)
+        for key in 'abc':
+            buckets.take(key, 10, 1000, 1)
+        time.sleep(0.02)
+        buckets.take('d', 10, 1000, 1)
+        self.assertEqual(list(buckets.buckets), ['d'])
+
+class SharedBucketTests(SimpleTestCase):
+
+    def setUp(self):
+        throttling.reset_buckets('RATE_LIMITS')
+        self.addCleanup(throttling.reset_buckets, 'RATE_LIMITS')
+
+    def test_production_cache_uses_redis_buckets(self):
+        # settings.CACHES as shipped. The script is registered before Redis is
+        # reached, so this holds whether or not the test Redis is up.
+        self.assertEqual(settings.CACHES['default']['BACKEND'], 'api.cache.InstrumentedRedisCache')
+        self.assertTrue(throttling.take_tokens('shared', 2, 1, 1)[0])
+        self.assertIsNotNone(throttling._redis.script)
+
+    @override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+    def test_other_caches_use_local_buckets(self):
+        self.assertEqual(throttling.take_tokens('local', 2, 1, 1), (True, 0))
+        self.assertIsNone(throttling._redis.script)
+        self.assertIn('local', throttling._local.buckets)
+
+class SQLiteTuningTests(TestCase):
+
+    def test_pragmas_applied_to_connections(self):
+        # The in-memory test database can't use WAL; the per-connection pragmas still apply
+        pragmas = current_pragmas(names=['synchronous', 'cache_size', 'busy_timeout', 'temp_store'])
+        self.assertEqual(pragmas, {'synchronous': 1, 'cache_size': -65536, 'busy_timeout': 5000, 'temp_store': 2})
+
+class SQLiteMaintenanceTests(TransactionTestCase):
+
+    def test_maintenance_runs_outside_transactions(self):
+        busy, wal_frames, checkpointed = run_maintenance(analyze=True)
+        self.assertEqual(busy, 0)
+
+@override_settings(SHARDING={
+    'ENABLED': True, 'SHARDS': {'shard_east': ['KE', 'UG', 'TZ'], 'shard_west': ['NG']}, 'ID_SPAN': 1000,
+})
+class ShardPlacementTests(SimpleTestCase):
+
+    def test_countries_and_ids_name_their_shard(self):
+        self.assertEqual(shard_for_country('UG'), 'shard_east')
+        self.assertEqual(shard_for_country('GH'), 'default')
+        self.assertEqual([shard_for_id(pk) for pk in (5, 1005, 2005, 9005)], ['default', 'shard_east', 'shard_west', 'default'])
+
+    def test_shards_get_schema_but_no_data_migrations(self):
+        router = CountryShardRouter()
+        self.assertTrue(router.allow_migrate('shard_west', 'api', model_name='jobposting'))
+        self.assertFalse(router.allow_migrate('shard_west', 'api'))
+        self.assertIsNone(router.allow_migrate('default', 'api', model_name='jobposting'))
+
+    def test_unsharded_models_are_left_to_other_routers(self):
+        self.assertIsNone(CountryShardRouter().db_for_read(User))
+        self.assertEqual(CountryShardRouter().db_for_read(JobPosting), 'default')
+
+@override_settings(DEBUG=False)
+class QueryStatsTests(TestCase):
+
+    def test_counts_queries_without_debug(self):
+        with track_queries() as stats:
+            for pk in range(3):
+                list(User.objects.filter(pk=pk))
+            list(Skill.objects.filter(pk__in=[1, 2, 3]))
+        self.assertEqual(stats.count, 4)
+        self.assertGreater(stats.duration, 0)
+        [(shape, times)] = stats.duplicates()
+        self.assertEqual(times, 3)
+        self.assertIn('FROM "api_user"', shape)
+
+    def test_shape_ignores_literals_and_in_list_length(self):
+        self.assertEqual(
+            sql_shape('SELECT * FROM t WHERE id IN (%s, %s, %s) LIMIT 21'),
+            sql_shape("SELECT *  FROM t WHERE id IN (%s) LIMIT 5"),
+        )
+
+    def test_log_query_count(self):
+        @PerformanceMonitor.log_query_count
+        def chatty():
+            for pk in range(11):
+                User.objects.filter(pk=pk).exists()
+
+        with self.assertLogs('api', 'WARNING') as logs:
+            chatty()
+        self.assertIn('High query count in chatty: 11 queries', logs.output[0])
+
+class MetricsRegistryTests(SimpleTestCase):
+
+    def test_processes_are_summed_from_their_files(self):
+        with tempfile.TemporaryDirectory() as directory, \
+                override_settings(METRICS={**settings.METRICS, 'DIRECTORY': directory}):
+            metrics.record_request('jobposting-list', 'GET', 200, 0.02, 0.004, 0, 512)
+            # Another worker process's flushed totals
+            other = metrics.MetricsRegistry()
+            other.observe('http_request_duration_seconds', {'route': 'jobposting-list', 'method': 'GET'}, 3.0)
+            other.inc('http_requests_total', {'route': 'jobposting-list', 'method': 'GET', 'status': '200'})
+            with open(os.path.join(directory, '99999-1.json'), 'w') as handle:
+                json.dump(other.snapshot(), handle)
+
+            body = metrics.render()
+        self.assertIn('http_requests_total{method="GET",route="jobposting-list",status="200"} 2', body)
+        self.assertIn('http_request_duration_seconds_bucket{method="GET",route="jobposting-list",le="0.025"} 1', body)
+        self.assertIn('http_request_duration_seconds_bucket{method="GET",route="jobposting-list",le="5.0"} 2', body)
+        self.assertIn('http_request_duration_seconds_sum{method="GET",route="jobposting-list"} 3.02', body)
+
+class HotPathTests(TestCase):
+
+    def test_samples_are_merged_per_view(self):
+        def view(request):
+            sum(range(1000))
+            return HttpResponse('ok')
+
+        for _ in range(3):
+            response, profile = profile_request(view, RequestFactory().get('/api/jobs/'), SAMPLED)
+            self.assertEqual(response.status_code, 200)
+            self.assertIsNotNone(profile)
+        rows = list(hot_paths(RequestProfile.objects.all(), limit=5))
+        self.assertEqual(len(rows), 1)
+        view_name, samples, mean_ms, mean_queries, report = rows[0]
+        self.assertEqual((view_name, samples, mean_queries), ('', 3, 0))
+        self.assertIn('view', report)
+
+class SlowQueryLogTests(TestCase):
+
+    def test_threshold(self):
+        with track_queries(QueryStats(slow_ms=0)) as stats:
+            User.objects.filter(email='someone@example.com').exists()
+        [(alias, sql, params, many, duration_ms)] = stats.slow
+        self.assertEqual((alias, many), ('default', False))
+        self.assertIn('someone@example.com', params)
+
+    def test_redaction_keeps_choice_values_and_numbers(self):
+        self.assertEqual(
+            redact(['someone@example.com', 'active', 42, Decimal('10.50'), None]),
+            ['<str:19>', 'active', 42, '10.50', None]
+        )
+
+    def test_top_offenders_group_by_shape(self):
+        def log(sql, duration_ms, view):
+            SlowQuery.objects.create(database='default', view=view, duration_ms=duration_ms, sql=sql,
+                                     shape=sql_shape(sql), fingerprint=sql_shape(sql)[:40], plan='SCAN api_jobposting')
+
+        log('SELECT * FROM api_jobposting WHERE budget_min > 10', 120, 'jobposting-list')
+        log('SELECT * FROM api_jobposting WHERE budget_min > 99', 150, 'jobposting-search')
+        log('SELECT * FROM api_user WHERE id = 1', 200, 'user-detail')
+        offenders = top_offenders(SlowQuery.objects.all())
+        self.assertEqual([offender['calls'] for offender in offenders], [2, 1])
+        self.assertEqual(offenders[0]['total_ms'], 270)
+        self.assertEqual(offenders[0]['views'], ['jobposting-list', 'jobposting-search'])
+        self.assertEqual(offenders[0]['plan'], 'SCAN api_jobposting')
+
+class SyntheticDataTests(TestCase):
+
+    def generate(self):
+        generator = DataGenerator(seed=7, chunk_size=40, until=datetime(2026, 1, 1, tzinfo=dt_timezone.utc))
+        return generator.run(users=80, jobs=25, applications=120, reviews=15, transactions=30)
+
+    def snapshot(self):
+        return (
+            list(User.objects.order_by('email').values_list('email', 'role', 'country', 'phone_number', 'date_joined')),
+            list(JobPosting.objects.order_by('created_at').values_list('title', 'status', 'country', 'posted_by__email', 'created_at')),
+            list(Application.objects.order_by('applied_at').values_list('job__created_at', 'worker__email', 'status')),
+            list(PaymentTransaction.objects.order_by('reference_id').values_list('reference_id', 'amount', 'currency', 'status')),
+        )
+
+    def test_seeded_runs_are_identical(self):
+        self.generate()
+        first = self.snapshot()
+        User.objects.all().delete()
+        self.generate()
+        self.assertEqual(self.snapshot(), first)
+
+    def test_rows_and_derived_tables(self):
+        counts = self.generate()
+        self.assertEqual(counts['user'], 80)
+        self.assertEqual(counts['jobposting'], 25)
+        self.assertEqual(JobParticipation.objects.count(), JobPosting.objects.count() + Application.objects.count())
+        self.assertEqual(UserRatingSummary.objects.filter(review_count__gt=0).count(),
+                         Review.objects.values('reviewee').distinct().count())
+        self.assertFalse(any(verify_ledger().values()))
+        self.assertEqual(LedgerEntry.objects.count(), 2 * PaymentTransaction.objects.filter(status='completed').count())
+        # Every job's country is its poster's, and timestamps were kept rather than set to now
+        self.assertFalse(JobPosting.objects.exclude(country=F('posted_by__country')).exists())
+        self.assertFalse(Application.objects.filter(applied_at__lt=F('job__created_at')).exists())
+        self.assertLess(JobPosting.objects.latest('created_at').created_at, datetime(2026, 1, 1, tzinfo=dt_timezone.utc))
+        # One shared hash, checked once
+        self.assertTrue(User.objects.first().check_password('password123'))
+        for user in User.objects.exclude(phone_number=''):
+            get_registry().validate_phone(user.phone_number, user.country)
+
@@ -1,9 +1,27 @@
-from rest_framework.test import APITestCase, APIClient
+from rest_framework.test import APITestCase, APIClient, APITransactionTestCase
 from django.urls import reverse
 from rest_framework import status
-from api.models import User, JobPosting, Application, Review, WorkerProfile, Skill, Category
+from api.models import User, JobPosting, Application, Review, WorkerProfile, Skill, Category, PaymentTransaction, IdempotencyKey
+from api.models import JobParticipation, LedgerEntry, RequestProfile, SlowQuery, UserRatingSummary
+from api.utils.idempotency import request_fingerprint
+from datetime import timedelta
+from django.conf import settings
+from django.test import override_settings
+from django.utils import timezone
+from rest_framework.parsers import JSONParser
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
 from django.core.files.uploadedfile import SimpleUploadedFile
 from rest_framework_simplejwt.tokens import RefreshToken
+from django.db import connection, connections
+from django.test.utils import CaptureQueriesContext
+import csv
+import io
+import json
+import marshal
+from api.utils.scoring import refresh_worker_scores
+from api.utils.ratings import reconcile_rating_summaries
+from api.utils.sharding import shard_for_id
 
 class UserAuthTests(APITestCase):
     
@@ -42,6 +60,79 @@ class UserAuthTests(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertIn("message", response.data)
 
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class CachedJWTAuthenticationTests(APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email="client@example.com", username="client", password="pass123", role="client"
+        )
+        refresh = RefreshToken.for_user(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {refresh.access_token}")
+
+    def test_user_served_from_cache(self):
+        self.assertEqual(self.client.get('/api/test-token/').status_code, status.HTTP_200_OK)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/test-token/')
+        self.assertEqual(response.data['role'], 'client')
+        self.assertFalse(any('api_user' in q['sql'] for q in queries.captured_queries))
+
+    def test_changes_invalidate_cached_user(self):
+        self.client.get('/api/test-token/')
+        self.user.role = 'worker'
+        self.user.save()
+        self.assertEqual(self.client.get('/api/test-token/').data['role'], 'worker')
+
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.client.get('/api/test-token/').status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_cache_outage_falls_back_to_the_database(self):
+        # Nothing listens on port 1
+        unreachable = {'default': {
+            'BACKEND': 'api.cache.InstrumentedRedisCache', 'LOCATION': 'redis://127.0.0.1:1/0',
+            'OPTIONS': {'CLIENT_CLASS': 'django_redis.client.DefaultClient'},
+        }}
+        with override_settings(CACHES=unreachable), self.assertLogs('api', 'WARNING') as logs:
+            response = self.client.get('/api/test-token/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['role'], 'client')
+        self.assertTrue(any('User cache unavailable' in line for line in logs.output))
+
+class TokenRevocationTests(APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(email="rotate@example.com", username="rotate", password="pass123")
+        self.refresh = RefreshToken.for_user(self.user)
+
+    def test_rotated_refresh_token_cannot_be_reused(self):
+        response = self.client.post(reverse('token_refresh'), {'refresh': str(self.refresh)})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('refresh', response.data)
+
+        replay = self.client.post(reverse('token_refresh'), {'refresh': str(self.refresh)})
+        self.assertEqual(replay.status_code, status.HTTP_401_UNAUTHORIZED)
+
+        rotated = self.client.post(reverse('token_refresh'), {'refresh': response.data['refresh']})
+        self.assertEqual(rotated.status_code, status.HTTP_200_OK)
+
+    def test_revoke_logs_out_refresh_and_access_tokens(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.refresh.access_token}")
+        response = self.client.post(reverse('token_revoke'), {'refresh': str(self.refresh)})
+        self.assertEqual(response.data['revoked'], 2)
+
+        self.assertEqual(self.client.get(reverse('test-token')).status_code, status.HTTP_401_UNAUTHORIZED)
+        self.client.credentials()
+        refresh = self.client.post(reverse('token_refresh'), {'refresh': str(self.refresh)})
+        self.assertEqual(refresh.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_unrevoked_access_token_checked_without_query(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.refresh.access_token}")
+        self.client.get(reverse('test-token'))
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse('test-token'))
+        self.assertFalse(any('api_revokedtoken' in q['sql'] for q in queries.captured_queries))
+
 class JobPostingTests(APITestCase):
     
     def setUp(self):
@@ -214,6 +305,41 @@ class ReviewTests(APITestCase):
         })
         self.assertEqual(response.status_code, status.HTTP_201_CREATED)
 
+    @override_settings(TOKEN_REVOCATION={'CAPACITY': 1000, 'ERROR_RATE': 0.001, 'SYNC_INTERVAL': 3600, 'REBUILD_INTERVAL': 3600})
+    def test_review_creation_query_count_is_constant(self):
+        self.authenticate_reviewer()
+        # Load the revocation filter up front so its sync queries aren't counted
+        self.client.get(reverse('test-token'))
+        workers = [
+            User.objects.create_user(email=f"w{i}@example.com", username=f"w{i}", password="pass123")
+            for i in range(2)
+        ]
+        counts = []
+        for worker in workers:
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.post('/api/reviews/', {
+                    "reviewee_id": worker.id, "job_id": self.job.id, "rating": 4, "comment": "Good"
+                })
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+            counts.append(len(queries.captured_queries))
+            # The permission check is one participation lookup, no duplicate-review probe
+            sql = [q['sql'] for q in queries.captured_queries]
+            self.assertEqual(sum('FROM "api_jobparticipation"' in q for q in sql), 1)
+            self.assertFalse(any(q.startswith('SELECT 1 AS "a" FROM "api_review"') for q in sql))
+        self.assertEqual(counts[0], counts[1])
+
+    def test_review_requires_participation_and_is_unique(self):
+        outsider = User.objects.create_user(email="out@example.com", username="out", password="pass123")
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {RefreshToken.for_user(outsider).access_token}")
+        payload = {"reviewee_id": self.reviewee.id, "job_id": self.job.id, "rating": 5, "comment": "Hi"}
+        self.assertEqual(self.client.post('/api/reviews/', payload).status_code, status.HTTP_403_FORBIDDEN)
+
+        self.authenticate_reviewer()
+        self.assertEqual(self.client.post('/api/reviews/', payload).status_code, status.HTTP_201_CREATED)
+        duplicate = self.client.post('/api/reviews/', payload)
+        self.assertEqual(duplicate.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("Review already exists for this job", str(duplicate.data))
+
     def test_user_reviews_endpoint(self):
         Review.objects.create(
             reviewer=self.reviewer,
@@ -228,6 +354,29 @@ class ReviewTests(APITestCase):
         self.assertIn("average_rating", response.data)
         self.assertIn("total_reviews", response.data)
 
+    def test_user_reviews_served_from_rating_summary(self):
+        Review.objects.create(
+            reviewer=self.reviewer,
+            reviewee=self.reviewee,
+            job=self.job,
+            rating=4,
+            comment="Good work"
+        )
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(f'/api/reviews/user_reviews/?user_id={self.reviewee.id}')
+        review_sql = [q['sql'] for q in queries.captured_queries if 'FROM "api_review"' in q['sql']]
+        # Only the paginator count and the page itself touch the review table
+        self.assertEqual(len(review_sql), 2)
+        self.assertFalse(any('AVG(' in sql or 'GROUP BY' in sql for sql in review_sql))
+        self.assertEqual(response.data["average_rating"], 4.0)
+        self.assertEqual(response.data["total_reviews"], 1)
+        self.assertEqual(response.data["rating_distribution"], [{"rating": 4, "count": 1}])
+        self.assertEqual(
+            response.data["results"][0]["reviewee"]["rating_summary"],
+            {"average_rating": 4.0, "total_reviews": 1}
+        )
+
 class WorkerProfileTests(APITestCase):
     
     def setUp(self):
@@ -267,6 +416,413 @@ class WorkerProfileTests(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(len(response.data['results']), 1)
 
+class WorkerImportTests(APITestCase):
+
+    def test_staff_bulk_import(self):
+        staff = User.objects.create_user(email="staff@example.com", username="staff", password="pass123", is_staff=True)
+        refresh = RefreshToken.for_user(staff)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {refresh.access_token}")
+        workers = [
+            {'email': 'a@example.com', 'title': 'Electrician', 'skills': ['Wiring']},
+            {'email': 'not-an-email', 'title': 'Painter'},
+        ]
+        with override_settings(WORKER_IMPORT={**settings.WORKER_IMPORT, 'CHUNK_SIZE': 100, 'MAX_API_ROWS': 10}):
+            response = self.client.post('/api/profiles/import/', {'workers': workers}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual((response.data['created'], response.data['failed']), (1, 1))
+        self.assertEqual(WorkerProfile.objects.get(user__email='a@example.com').skills.get().name, 'Wiring')
+
+    def test_import_requires_staff(self):
+        worker = User.objects.create_user(email="w@example.com", username="w", password="pass123")
+        refresh = RefreshToken.for_user(worker)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {refresh.access_token}")
+        response = self.client.post('/api/profiles/import/', {'workers': []}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+class WorkerLeaderboardTests(APITestCase):
+
+    def setUp(self):
+        self.client_user = User.objects.create_user(
+            email="client@example.com", username="client", password="pass123", role="client"
+        )
+        self.job = JobPosting.objects.create(title="Job", description="desc", posted_by=self.client_user)
+        self.skill = Skill.objects.create(name="Python")
+        self.one_review = self.create_worker("one", "KE", [5])
+        self.many_reviews = self.create_worker("many", "KE", [5, 5, 4, 5, 5, 4, 5])
+        self.nigerian = self.create_worker("ng", "NG", [3])
+
+    def create_worker(self, name, country, ratings):
+        worker = User.objects.create_user(
+            email=f"{name}@example.com", username=name, password="pass123", role="worker", country=country
+        )
+        profile = WorkerProfile.objects.create(user=worker, title=name, bio="bio")
+        profile.skills.add(self.skill)
+        for i, rating in enumerate(ratings):
+            reviewer = User.objects.create_user(
+                email=f"{name}-r{i}@example.com", username=f"{name}-r{i}", password="pass123", role="client"
+            )
+            Review.objects.create(reviewer=reviewer, reviewee=worker, job=self.job, rating=rating, comment="ok")
+        return profile
+
+    def test_bayesian_score_prefers_established_workers(self):
+        refresh_worker_scores()
+        self.one_review.refresh_from_db()
+        self.many_reviews.refresh_from_db()
+        self.assertGreater(self.many_reviews.score, self.one_review.score)
+
+        response = self.client.get('/api/profiles/?ordering=-score')
+        self.assertEqual(response.data['results'][0]['id'], self.many_reviews.id)
+
+    def test_top_endpoint_per_skill_and_country(self):
+        refresh_worker_scores()
+        response = self.client.get('/api/profiles/top/?skill=python&country=ke&limit=5')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [item['id'] for item in response.data['results']],
+            [self.many_reviews.id, self.one_review.id]
+        )
+        self.assertEqual(response.data['results'][0]['rank'], 1)
+
+        response = self.client.get('/api/profiles/top/')
+        self.assertEqual(len(response.data['results']), 3)
+
+class PaymentBalanceTests(APITestCase):
+
+    def setUp(self):
+        self.client_user = User.objects.create_user(
+            email="client@example.com", username="client", password="pass123", role="client"
+        )
+        self.worker = User.objects.create_user(
+            email="worker@example.com", username="worker", password="pass123", role="worker"
+        )
+
+    def test_balance_endpoint(self):
+        PaymentTransaction.objects.create(
+            transaction_type='job_payment', status='completed', amount='300.00', currency='KES',
+            sender=self.client_user, receiver=self.worker, reference_id='REF-1'
+        )
+        PaymentTransaction.objects.create(
+            transaction_type='job_payment', status='pending', amount='99.00', currency='KES',
+            sender=self.client_user, receiver=self.worker, reference_id='REF-2'
+        )
+        refresh = RefreshToken.for_user(self.worker)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {refresh.access_token}")
+
+        response = self.client.get('/api/payments/balance/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['balances'], [{'currency': 'KES', 'balance': '300.00'}])
+
+    def test_reference_id_keyset_cursor(self):
+        payments = [
+            PaymentTransaction.objects.create(
+                transaction_type='job_payment', amount='10.00', currency='KES',
+                sender=self.client_user, receiver=self.worker
+            )
+            for _ in range(3)
+        ]
+        refresh = RefreshToken.for_user(self.worker)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {refresh.access_token}")
+
+        response = self.client.get('/api/payments/', {
+            'reference_after': payments[0].reference_id, 'ordering': 'reference_id'
+        })
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [row['reference_id'] for row in response.data['results']],
+            [payments[1].reference_id, payments[2].reference_id]
+        )
+
+    # No revocation sync query may land in only one of the compared requests
+    @override_settings(TOKEN_REVOCATION={**settings.TOKEN_REVOCATION, 'SYNC_INTERVAL': 3600})
+    def test_listing_loads_nested_rows_up_front(self):
+        def add_payments(count):
+            for i in range(count):
+                job = JobPosting.objects.create(title=f"Job {i}", description="Description", posted_by=self.client_user)
+                Application.objects.create(job=job, worker=self.worker, cover_letter="cover.pdf", status='accepted')
+                Review.objects.create(reviewer=self.worker, reviewee=self.client_user, job=job, rating=4, comment="ok")
+                Review.objects.create(reviewer=self.client_user, reviewee=self.worker, job=job, rating=5, comment="ok")
+                PaymentTransaction.objects.create(
+                    transaction_type='job_payment', amount='10.00', currency='KES',
+                    sender=self.client_user, receiver=self.worker, job=job
+                )
+
+        refresh = RefreshToken.for_user(self.client_user)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {refresh.access_token}")
+        add_payments(1)
+        # The first request also builds per-process state such as the revocation filter
+        self.client.get('/api/payments/')
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get('/api/payments/')
+        add_payments(5)
+        # Summaries, jobs, skills, application counts and applicants don't add queries per row
+        with self.assertNumQueries(len(queries)):
+            response = self.client.get('/api/payments/')
+        self.assertEqual(len(response.data['results']), 6)
+        payment = response.data['results'][0]
+        self.assertEqual(payment['sender']['rating_summary'], {'average_rating': 4.0, 'total_reviews': 6})
+        self.assertEqual(payment['receiver']['rating_summary'], {'average_rating': 5.0, 'total_reviews': 6})
+        self.assertEqual(payment['job']['posted_by']['rating_summary']['total_reviews'], 6)
+        self.assertEqual(payment['job']['application_count'], 1)
+        self.assertEqual([applicant['worker_id'] for applicant in payment['job']['applicants']], [self.worker.id])
+
+class PaymentReconcileTests(APITestCase):
+
+    def setUp(self):
+        self.staff = User.objects.create_user(
+            email="staff@example.com", username="staff", password="pass123", is_staff=True
+        )
+        self.worker = User.objects.create_user(
+            email="worker@example.com", username="worker", password="pass123", role="worker"
+        )
+        PaymentTransaction.objects.create(
+            transaction_type='withdrawal', status='processing', amount='40.00', currency='KES',
+            sender=self.worker, receiver=self.worker, reference_id='REF-1'
+        )
+
+    def upload(self, user, apply=False):
+        refresh = RefreshToken.for_user(user)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {refresh.access_token}")
+        statement = SimpleUploadedFile(
+            'statement.csv', b'reference,amount,status\nREF-1,40.00,SUCCESS\nREF-2,10.00,SUCCESS\n', 'text/csv'
+        )
+        return self.client.post('/api/payments/reconcile/', {'file': statement, 'apply': apply}, format='multipart')
+
+    def test_staff_can_reconcile_statement(self):
+        response = self.upload(self.staff, apply=True)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['mismatches']['missing'], 1)
+        self.assertEqual(response.data['corrected'], 1)
+        self.assertEqual(PaymentTransaction.objects.get(reference_id='REF-1').status, 'completed')
+
+    def test_reconcile_requires_staff(self):
+        response = self.upload(self.worker)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+class IdempotencyKeyTests(APITestCase):
+
+    def setUp(self):
+        self.client_user = User.objects.create_user(
+            email="client@example.com", username="client", password="pass123", role="client"
+        )
+        self.worker = User.objects.create_user(
+            email="worker@example.com", username="worker", password="pass123", role="worker"
+        )
+        refresh = RefreshToken.for_user(self.client_user)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {refresh.access_token}")
+        self.payload = {
+            "transaction_type": "job_payment",
+            "amount": "150.00",
+            "currency": "KES",
+            "receiver_id": self.worker.id,
+        }
+
+    def test_retry_replays_stored_response(self):
+        first = self.client.post('/api/payments/', self.payload, format='json', HTTP_IDEMPOTENCY_KEY='retry-1')
+        self.assertEqual(first.status_code, status.HTTP_201_CREATED)
+
+        with CaptureQueriesContext(connection) as queries:
+            second = self.client.post(
+                '/api/payments/', self.payload, format='json', HTTP_IDEMPOTENCY_KEY='retry-1'
+            )
+        # Replays never reach validation or the payment tables
+        self.assertFalse(any('api_paymenttransaction' in q['sql'] for q in queries.captured_queries))
+        self.assertEqual(second.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(second['Idempotent-Replayed'], 'true')
+        self.assertEqual(second.data['reference_id'], first.data['reference_id'])
+        self.assertEqual(PaymentTransaction.objects.count(), 1)
+
+    def test_key_reused_with_different_payload(self):
+        self.client.post('/api/payments/', self.payload, format='json', HTTP_IDEMPOTENCY_KEY='retry-2')
+        response = self.client.post(
+            '/api/payments/', {**self.payload, "amount": "999.00"}, format='json', HTTP_IDEMPOTENCY_KEY='retry-2'
+        )
+        self.assertEqual(response.status_code, status.HTTP_422_UNPROCESSABLE_ENTITY)
+        self.assertEqual(PaymentTransaction.objects.count(), 1)
+
+    @override_settings(IDEMPOTENCY={'TTL': timedelta(hours=1), 'WAIT_TIMEOUT': 0})
+    def test_in_flight_duplicate_conflicts(self):
+        original = Request(APIRequestFactory().post('/', self.payload, format='json'), parsers=[JSONParser()])
+        IdempotencyKey.objects.create(
+            user=self.client_user, key='retry-3', scope='POST /api/payments/',
+            fingerprint=request_fingerprint(original),
+            expires_at=timezone.now() + timedelta(hours=1)
+        )
+        response = self.client.post('/api/payments/', self.payload, format='json', HTTP_IDEMPOTENCY_KEY='retry-3')
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+
+    def test_expired_key_is_reclaimed(self):
+        IdempotencyKey.objects.create(
+            user=self.client_user, key='retry-4', scope='POST /api/payments/', fingerprint='stale',
+            status='completed', response_status=201, response_body={},
+            expires_at=timezone.now() - timedelta(seconds=1)
+        )
+        response = self.client.post('/api/payments/', self.payload, format='json', HTTP_IDEMPOTENCY_KEY='retry-4')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(PaymentTransaction.objects.count(), 1)
+
+class BulkJobPaymentTests(APITestCase):
+
+    def setUp(self):
+        self.client_user = User.objects.create_user(
+            email="client@example.com", username="client", password="pass123", role="client"
+        )
+        self.workers = [
+            User.objects.create_user(
+                email=f"worker{i}@example.com", username=f"worker{i}", password="pass123", role="worker"
+            )
+            for i in range(3)
+        ]
+        self.job = JobPosting.objects.create(
+            title="Dev Job", description="details", posted_by=self.client_user, status="filled"
+        )
+        for worker, application_status in zip(self.workers, ['accepted', 'accepted', 'rejected']):
+            Application.objects.create(job=self.job, worker=worker, cover_letter="cover.pdf", status=application_status)
+        refresh = RefreshToken.for_user(self.client_user)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {refresh.access_token}")
+
+    def test_pays_every_accepted_worker(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(
+                f'/api/jobs/{self.job.id}/pay/', {'amount': '250.00', 'currency': 'KES'}, format='json'
+            )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['created'], 2)
+        self.assertEqual(
+            sorted(result['receiver_id'] for result in response.data['results']),
+            [self.workers[0].id, self.workers[1].id]
+        )
+        payments = PaymentTransaction.objects.filter(job=self.job)
+        self.assertEqual(payments.count(), 2)
+        self.assertTrue(all(len(payment.reference_id) == 26 for payment in payments))
+        # Inserts are batched rather than one per recipient
+        inserts = [q for q in queries.captured_queries if q['sql'].startswith('INSERT INTO "api_paymenttransaction"')]
+        self.assertEqual(len(inserts), 1)
+
+    def test_per_recipient_results(self):
+        response = self.client.post(f'/api/jobs/{self.job.id}/pay/', {
+            'currency': 'KES',
+            'payments': [
+                {'receiver_id': self.workers[0].id, 'amount': '100.00'},
+                {'receiver_id': self.workers[2].id, 'amount': '100.00'},
+                {'receiver_id': self.workers[0].id, 'amount': '100.00'},
+            ],
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(
+            [result['status'] for result in response.data['results']], ['created', 'rejected', 'rejected']
+        )
+        self.assertEqual(response.data['results'][0]['amount'], '100.00')
+        self.assertEqual(PaymentTransaction.objects.count(), 1)
+
+    def test_only_job_owner_can_pay(self):
+        other = User.objects.create_user(
+            email="other@example.com", username="other", password="pass123", role="client"
+        )
+        refresh = RefreshToken.for_user(other)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {refresh.access_token}")
+        response = self.client.post(f'/api/jobs/{self.job.id}/pay/', {'amount': '10.00'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertFalse(PaymentTransaction.objects.exists())
+
+class ExportTests(APITestCase):
+
+    def setUp(self):
+        self.client_user = User.objects.create_user(
+            email="client@example.com", username="client", password="pass123", role="client"
+        )
+        self.other_client = User.objects.create_user(
+            email="other@example.com", username="other", password="pass123", role="client"
+        )
+        self.worker = User.objects.create_user(
+            email="worker@example.com", username="worker", password="pass123", role="worker"
+        )
+        python = Skill.objects.create(name="Python")
+        self.jobs = []
+        for i in range(5):
+            job = JobPosting.objects.create(
+                title=f"Job {i}", description="details", posted_by=self.client_user,
+                status="active" if i < 4 else "closed", location="Nairobi" if i % 2 else "Lagos"
+            )
+            job.required_skills.add(python)
+            self.jobs.append(job)
+        Application.objects.create(job=self.jobs[0], worker=self.worker, cover_letter="cover.pdf")
+        other_job = JobPosting.objects.create(title="Other", description="details", posted_by=self.other_client)
+        Application.objects.create(job=other_job, worker=self.worker, cover_letter="cover.pdf")
+
+    def authenticate(self, user):
+        refresh = RefreshToken.for_user(user)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {refresh.access_token}")
+
+    def read_csv(self, response):
+        return list(csv.DictReader(io.StringIO(b''.join(response.streaming_content).decode())))
+
+    def test_job_export_streams_filtered_rows(self):
+        response = self.client.get('/api/jobs/export/', {'location': 'nairobi'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        rows = self.read_csv(response)
+        # Anonymous users only see active jobs, as in the list view
+        self.assertEqual([row['title'] for row in rows], ['Job 1', 'Job 3'])
+        self.assertEqual(rows[0]['required_skills'], 'Python')
+
+    def test_application_export_honours_visibility(self):
+        self.authenticate(self.client_user)
+        response = self.client.get('/api/applications/export/', {'output': 'ndjson'})
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+        self.assertEqual([row['job'] for row in rows], [self.jobs[0].id])
+
+    def test_export_rejects_unknown_output(self):
+        self.authenticate(self.client_user)
+        response = self.client.get('/api/payments/export/', {'output': 'xlsx'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+class PhoneValidationTests(APITestCase):
+
+    def setUp(self):
+        user = User.objects.create_user(email="client@example.com", username="client", password="pass123")
+        refresh = RefreshToken.for_user(user)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {refresh.access_token}")
+
+    def test_batch_validation(self):
+        response = self.client.post('/api/utils/phones/validate/', {
+            'country': 'KE',
+            'numbers': ['0712 345 678', '12345', {'number': '0772 123456', 'country': 'UG'}],
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual((response.data['valid'], response.data['invalid']), (2, 1))
+        self.assertEqual(
+            [(r['normalized'], r['country']) for r in response.data['results']],
+            [('+254712345678', 'KE'), (None, None), ('+256772123456', 'UG')]
+        )
+
+    def test_non_string_countries_are_rejected(self):
+        response = self.client.post('/api/utils/phones/validate/', {
+            'country': ['KE'], 'numbers': ['0712 345 678'],
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        response = self.client.post('/api/utils/phones/validate/', {
+            'country': 'KE',
+            'numbers': [{'number': '0772 123456', 'country': {'code': 'UG'}}, '0712 345 678'],
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [(r['normalized'], r['error']) for r in response.data['results']],
+            [(None, 'country must be a country code'), ('+254712345678', None)]
+        )
+
+    def test_signup_stores_e164(self):
+        self.client.credentials()
+        response = self.client.post('/api/signup/', {
+            'email': 'new@example.com', 'username': 'new', 'password': 'password123',
+            'password_confirm': 'password123', 'role': 'worker', 'country': 'KE',
+            'phone_number': '0712 345 678',
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(User.objects.get(email='new@example.com').phone_number, '+254712345678')
+
 class DashboardTests(APITestCase):
     
     def setUp(self):
@@ -324,3 +880,371 @@ class DashboardTests(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertIn("total_jobs", response.data)
         self.assertEqual(response.data["total_jobs"], 1)
+
+@override_settings(
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+    RATE_LIMITS={
+        'BUDGETS': {
+            'anon': {'CAPACITY': 10, 'REFILL_RATE': 0.001},
+            'worker': {'CAPACITY': 20, 'REFILL_RATE': 0.001},
+            'client': {'CAPACITY': 20, 'REFILL_RATE': 0.001},
+            'staff': None,
+        },
+        'COSTS': {'read': 1, 'list': 2, 'write': 2, 'search': 5, 'stats': 5, 'bulk': 20, 'export': 20},
+        'ROUTES': {'platform-stats': 'stats'},
+        'REDIS_RETRY': 30,
+    },
+)
+class RateLimitTests(APITestCase):
+
+    def setUp(self):
+        self.worker = User.objects.create_user(email="limit@example.com", username="limit", password="pass123")
+
+    def test_anonymous_search_costs_more_than_list(self):
+        for _ in range(2):
+            self.assertEqual(self.client.get('/api/jobs/?search=plumber').status_code, status.HTTP_200_OK)
+        response = self.client.get('/api/jobs/?search=plumber')
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertIn('Retry-After', response)
+        # Search and plain listing are separate route classes
+        self.assertEqual(self.client.get('/api/jobs/').status_code, status.HTTP_200_OK)
+
+    def test_stats_budget_is_per_role(self):
+        for _ in range(2):
+            self.client.get('/api/platform/stats/')
+        self.assertEqual(self.client.get('/api/platform/stats/').status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {RefreshToken.for_user(self.worker).access_token}")
+        for _ in range(4):
+            self.assertEqual(self.client.get('/api/platform/stats/').status_code, status.HTTP_200_OK)
+        self.assertEqual(self.client.get('/api/platform/stats/').status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+    def test_staff_are_not_limited(self):
+        staff = User.objects.create_user(email="ops@example.com", username="ops", password="pass123", is_staff=True)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {RefreshToken.for_user(staff).access_token}")
+        for _ in range(5):
+            self.assertEqual(self.client.get('/api/platform/stats/').status_code, status.HTTP_200_OK)
+
+@override_settings(
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+    REPLICA_ROUTING={'ALIASES': ['replica'], 'STICKY_SECONDS': 5, 'MAX_LAG': 5, 'CHECK_INTERVAL': 10},
+)
+class ReplicaRoutingTests(APITransactionTestCase):
+    # The test replica mirrors the default database; committed rows are visible through it
+    databases = {'default', 'replica'}
+
+    def setUp(self):
+        self.client_user = User.objects.create_user(
+            email="client@example.com", username="client", password="pass123", role="client"
+        )
+        self.other = User.objects.create_user(
+            email="other@example.com", username="other", password="pass123", role="client"
+        )
+        JobPosting.objects.create(title="Mason", description="Build walls", posted_by=self.client_user)
+
+    def queries_by_alias(self, method, *args, **kwargs):
+        with CaptureQueriesContext(connections['default']) as primary, \
+                CaptureQueriesContext(connections['replica']) as replica:
+            response = getattr(self.client, method)(*args, **kwargs)
+        return response, len(primary.captured_queries), len(replica.captured_queries)
+
+    def authenticate(self, user):
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {RefreshToken.for_user(user).access_token}")
+
+    def test_safe_requests_read_from_replica(self):
+        response, primary, replica = self.queries_by_alias('get', '/api/jobs/')
+        self.assertEqual(response.data['count'], 1)
+        self.assertEqual(primary, 0)
+        self.assertGreater(replica, 0)
+
+    def test_writer_reads_own_writes_from_primary(self):
+        self.authenticate(self.client_user)
+        response, primary, replica = self.queries_by_alias(
+            'post', '/api/jobs/', {"title": "Roofer", "description": "Fix roofs"}
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(replica, 0)
+
+        response, primary, replica = self.queries_by_alias('get', '/api/jobs/')
+        self.assertEqual(response.data['count'], 2)
+        self.assertEqual(replica, 0)
+
+        # Other users aren't pinned by someone else's write
+        self.authenticate(self.other)
+        response, primary, replica = self.queries_by_alias('get', '/api/jobs/')
+        self.assertEqual(primary, 0)
+        self.assertGreater(replica, 0)
+
+    @override_settings(REPLICA_ROUTING={'ALIASES': ['missing'], 'STICKY_SECONDS': 5, 'MAX_LAG': 5, 'CHECK_INTERVAL': 10})
+    def test_unusable_replica_falls_back_to_primary(self):
+        response, primary, replica = self.queries_by_alias('get', '/api/jobs/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertGreater(primary, 0)
+
+@override_settings(SHARDING={**settings.SHARDING, 'ENABLED': True})
+class CountryShardingTests(APITestCase):
+    databases = {'default', 'shard_east', 'shard_west', 'shard_south'}
+
+    def setUp(self):
+        self.ke_client = User.objects.create_user(
+            email="ke@example.com", username="ke", password="pass123", role="client", country="KE"
+        )
+        self.ng_client = User.objects.create_user(
+            email="ng@example.com", username="ng", password="pass123", role="client", country="NG"
+        )
+        self.worker = User.objects.create_user(
+            email="worker@example.com", username="worker", password="pass123", role="worker", country="KE"
+        )
+        self.ng_job = JobPosting.objects.using('shard_west').create(
+            title="Tailor", description="Sew uniforms", posted_by=self.ng_client
+        )
+
+    def authenticate(self, user):
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {RefreshToken.for_user(user).access_token}")
+
+    def test_jobs_are_stored_on_their_country_shard(self):
+        self.authenticate(self.ke_client)
+        response = self.client.post('/api/jobs/', {"title": "Driver", "description": "Deliveries"})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        job_id = response.data['id']
+        self.assertEqual(shard_for_id(job_id), 'shard_east')
+        self.assertTrue(JobPosting.objects.using('shard_east').filter(pk=job_id, country='KE').exists())
+        self.assertFalse(JobPosting.objects.using('default').filter(pk=job_id).exists())
+        self.assertTrue(JobParticipation.objects.using('shard_east').filter(job_id=job_id, role='owner').exists())
+
+        # Listings read the requesting user's country shard
+        response = self.client.get('/api/jobs/')
+        self.assertEqual([job['id'] for job in response.data['results']], [job_id])
+
+    def test_reference_rows_are_copied_to_every_shard(self):
+        for alias in ('shard_east', 'shard_west', 'shard_south'):
+            self.assertTrue(User.objects.using(alias).filter(pk=self.worker.pk).exists())
+        self.assertEqual(self.worker._state.db, 'default')
+        self.worker.delete()
+        self.assertFalse(User.objects.using('shard_east').filter(pk=self.worker.pk).exists())
+
+    def test_applications_follow_the_job_across_countries(self):
+        self.authenticate(self.worker)
+        cover_letter = SimpleUploadedFile("cover.pdf", b"fake content", content_type="application/pdf")
+        response = self.client.post('/api/applications/', {
+            "job_id": self.ng_job.id,
+            "cover_letter": cover_letter
+        }, format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        application_id = response.data['id']
+        self.assertEqual(shard_for_id(application_id), 'shard_west')
+        self.assertTrue(
+            JobParticipation.objects.using('shard_west').filter(user=self.worker, job=self.ng_job).exists()
+        )
+
+        # Detail routes find rows on another country's shard by id
+        response = self.client.get(f'/api/applications/{application_id}/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        response = self.client.get(f'/api/jobs/{self.ng_job.id}/')
+        self.assertEqual(response.data['title'], "Tailor")
+
+        # The worker's own listing covers every shard, not just KE's
+        ke_job = JobPosting.objects.using('shard_east').create(
+            title="Driver", description="Deliveries", posted_by=self.ke_client
+        )
+        Application.objects.using('shard_east').create(job=ke_job, worker=self.worker, cover_letter="cover.pdf")
+        response = self.client.get('/api/applications/')
+        self.assertEqual(response.data['count'], 2)
+        self.assertEqual([row['job']['title'] for row in response.data['results']], ["Driver", "Tailor"])
+        response = self.client.get('/api/applications/', {'ordering': 'applied_at'})
+        self.assertEqual(response.data['results'][0]['id'], application_id)
+        response = self.client.get('/api/applications/export/', {'output': 'ndjson'})
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+        self.assertEqual(sorted(row['job_title'] for row in rows), ["Driver", "Tailor"])
+
+    def test_payments_and_ledger_stay_with_the_job(self):
+        Application.objects.using('shard_west').create(
+            job=self.ng_job, worker=self.worker, cover_letter="cover.pdf", status='accepted'
+        )
+        self.authenticate(self.ng_client)
+        response = self.client.post(
+            f'/api/jobs/{self.ng_job.id}/pay/', {'amount': '250.00', 'currency': 'NGN'}, format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        payment = PaymentTransaction.objects.using('shard_west').get(job_id=self.ng_job.id)
+        payment.status = 'completed'
+        payment.save()
+        self.assertEqual(LedgerEntry.objects.using('shard_west').filter(transaction=payment).count(), 2)
+
+        self.authenticate(self.worker)
+        response = self.client.get('/api/payments/balance/')
+        self.assertEqual(response.data['balances'], [{'currency': 'NGN', 'balance': '250.00'}])
+        response = self.client.get('/api/payments/')
+        self.assertEqual([row['id'] for row in response.data['results']], [payment.id])
+
+    def test_user_reviews_cover_every_shard(self):
+        ke_job = JobPosting.objects.using('shard_east').create(
+            title="Driver", description="Deliveries", posted_by=self.ke_client
+        )
+        Review.objects.using('shard_west').create(
+            reviewer=self.ng_client, reviewee=self.worker, job=self.ng_job, rating=5, comment="Neat work"
+        )
+        Review.objects.using('shard_east').create(
+            reviewer=self.ke_client, reviewee=self.worker, job=ke_job, rating=3, comment="Late"
+        )
+        response = self.client.get('/api/reviews/user_reviews/', {'user_id': self.worker.id})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([review['comment'] for review in response.data['results']], ["Late", "Neat work"])
+        self.assertEqual(response.data['total_reviews'], 2)
+        # Summaries are only stored on default; a join on the shards would find none
+        for review in response.data['results']:
+            self.assertEqual(review['reviewee']['rating_summary'], {'average_rating': 4.0, 'total_reviews': 2})
+
+        # Reconciling adds up the reviews on every shard
+        UserRatingSummary.objects.filter(user=self.worker).update(review_count=9)
+        UserRatingSummary.objects.create(user=self.ke_client, review_count=1, rating_sum=5, rating_5=1)
+        stats = reconcile_rating_summaries()
+        self.assertEqual((stats['checked'], stats['updated'], stats['reset']), (1, 1, 1))
+        summary = UserRatingSummary.objects.get(user=self.worker)
+        self.assertEqual((summary.review_count, summary.rating_3, summary.rating_5), (2, 1, 1))
+
+    def test_platform_stats_fan_out_across_shards(self):
+        JobPosting.objects.using('shard_east').create(title="Driver", description="Deliveries", posted_by=self.ke_client)
+        JobPosting.objects.create(title="Guard", description="Night shift", posted_by=self.ke_client, status='closed')
+        response = self.client.get('/api/platform/stats/')
+        self.assertEqual(response.data['total_jobs'], 3)
+        self.assertEqual(response.data['active_jobs'], 2)
+
+    def test_dashboard_stats_count_every_shard(self):
+        ke_job = JobPosting.objects.using('shard_east').create(
+            title="Driver", description="Deliveries", posted_by=self.ke_client
+        )
+        # Posted before the client's country was sharded, so it stayed on default
+        JobPosting.objects.create(title="Guard", description="Night shift", posted_by=self.ke_client)
+        Application.objects.using('shard_east').create(job=ke_job, worker=self.worker, cover_letter="cover.pdf")
+        Application.objects.using('shard_west').create(
+            job=self.ng_job, worker=self.worker, cover_letter="cover.pdf", status='accepted'
+        )
+
+        self.authenticate(self.ke_client)
+        response = self.client.get('/api/dashboard/stats/')
+        self.assertEqual(response.data['total_jobs_posted'], 2)
+        self.assertEqual(response.data['total_applications'], 1)
+
+        self.authenticate(self.worker)
+        response = self.client.get('/api/dashboard/stats/')
+        self.assertEqual(response.data['total_applications'], 2)
+        self.assertEqual(response.data['accepted_applications'], 1)
+
+# Off Redis, so its unavailable-bucket warnings can't leak into the log assertions
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class QueryInstrumentationTests(APITestCase):
+
+    def setUp(self):
+        self.client_user = User.objects.create_user(
+            email="client@example.com", username="client", password="pass123", role="client"
+        )
+        for i in range(3):
+            JobPosting.objects.create(title=f"Job {i}", description="Description", posted_by=self.client_user)
+
+    def test_server_timing_header(self):
+        response = self.client.get('/api/jobs/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertRegex(response['Server-Timing'], r'^db;dur=[\d.]+;desc="\d+ queries", total;dur=[\d.]+$')
+
+    @override_settings(QUERY_INSTRUMENTATION={
+        **settings.QUERY_INSTRUMENTATION,
+        'VIEW_BUDGETS': {'jobposting-list': {'QUERIES': 1, 'DUPLICATES': 0}},
+    })
+    def test_budget_warning_is_structured(self):
+        with self.assertLogs('api', 'WARNING') as logs:
+            self.client.get('/api/jobs/')
+        [record] = [r for r in logs.records if r.getMessage().startswith('Query budget exceeded')]
+        self.assertEqual(record.view, 'jobposting-list')
+        self.assertGreater(record.queries, 1)
+        self.assertIn('queries', record.exceeded)
+        self.assertTrue(record.duplicates)
+
+    def test_within_budget_is_quiet(self):
+        with self.assertNoLogs('api', 'WARNING'):
+            self.client.get('/api/jobs/')
+
+    @override_settings(SLOW_QUERIES={**settings.SLOW_QUERIES, 'THRESHOLD_MS': 0, 'MAX_PER_REQUEST': 100})
+    def test_slow_queries_are_explained_and_redacted(self):
+        with self.assertLogs('api', 'WARNING'):
+            response = self.client.get('/api/jobs/', {'search': 'Plumbing', 'status': 'active'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        entries = list(SlowQuery.objects.all())
+        # EXPLAIN and the log insert run after the request's queries are counted
+        self.assertIn(f'desc="{len(entries)} queries"', response['Server-Timing'])
+        [listing] = [entry for entry in entries if 'LIKE' in entry.sql]
+        self.assertEqual(listing.view, 'jobposting-list')
+        self.assertIn('api_jobposting', listing.plan)
+        self.assertIn('active', listing.params)
+        self.assertNotIn('Plumbing', json.dumps(listing.params))
+        self.assertIn('<str:', json.dumps(listing.params))
+
+class MetricsEndpointTests(APITestCase):
+
+    @override_settings(METRICS={**settings.METRICS, 'DIRECTORY': None})
+    def test_per_route_histograms_in_prometheus_format(self):
+        self.client.get('/api/jobs/')
+        user = User.objects.create_user(email="client@example.com", username="client", password="pass123")
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {RefreshToken.for_user(user).access_token}")
+        self.client.get('/api/jobs/')
+        response = self.client.get('/metrics')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        body = response.content.decode()
+        self.assertIn('# TYPE http_request_duration_seconds histogram', body)
+        self.assertIn('http_requests_total{method="GET",route="jobposting-list",status="200"} 2', body)
+        self.assertIn('http_request_duration_seconds_count{method="GET",route="jobposting-list"} 2', body)
+        self.assertIn('http_request_duration_seconds_bucket{method="GET",route="jobposting-list",le="+Inf"} 2', body)
+        self.assertIn('http_request_db_seconds_count{route="jobposting-list"} 2', body)
+        self.assertIn('http_response_size_bytes_count{route="jobposting-list"} 2', body)
+        # JWT users are looked up in the cache first
+        self.assertRegex(body, r'cache_requests_total\{result="(hit|miss)"\} \d+')
+
+    @override_settings(METRICS={**settings.METRICS, 'TOKEN': 'scrape-secret'})
+    def test_scraping_is_restricted(self):
+        response = self.client.get('/metrics', REMOTE_ADDR='203.0.113.9')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        response = self.client.get(
+            '/metrics', REMOTE_ADDR='203.0.113.9', HTTP_AUTHORIZATION='Bearer scrape-secret'
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+class RequestProfilingTests(APITestCase):
+
+    def setUp(self):
+        self.staff = User.objects.create_user(email="ops@example.com", username="ops", password="pass123", is_staff=True)
+        self.worker = User.objects.create_user(email="worker@example.com", username="worker", password="pass123", role='worker')
+
+    def test_staff_flag_stores_a_profile(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {RefreshToken.for_user(self.staff).access_token}")
+        response = self.client.get('/api/jobs/', HTTP_X_PROFILE='1')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        profile = RequestProfile.objects.get(pk=response['X-Profile-Id'])
+        self.assertEqual(profile.trigger, 'on_demand')
+        self.assertEqual(profile.view, 'jobposting-list')
+        self.assertEqual(profile.user, self.staff)
+        self.assertEqual(profile.query_count, len(profile.queries))
+        self.assertTrue(any(query['caller'].startswith('api/') for query in profile.queries))
+        self.assertIn('cumulative', profile.report)
+
+    def test_flag_from_other_users_is_ignored(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {RefreshToken.for_user(self.worker).access_token}")
+        response = self.client.get('/api/jobs/?profile=1')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn('X-Profile-Id', response)
+        self.assertFalse(RequestProfile.objects.exists())
+
+    def test_admin_downloads_the_pstats_dump(self):
+        self.client.force_login(self.staff)
+        response = self.client.get('/api/jobs/', HTTP_X_PROFILE='1')
+        profile_id = response['X-Profile-Id']
+
+        self.client.force_login(User.objects.create_superuser(email="admin@example.com", password="adminpass"))
+        response = self.client.get(reverse('admin:api_requestprofile_download', args=[profile_id]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn(f'profile-{profile_id}.prof', response['Content-Disposition'])
+        self.assertTrue(marshal.loads(response.content))
+
+        self.client.force_login(self.worker)
+        response = self.client.get(reverse('admin:api_requestprofile_download', args=[profile_id]))
+        self.assertNotEqual(response.status_code, status.HTTP_200_OK)
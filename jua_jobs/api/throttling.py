@@ -0,0 +1,160 @@
+"""
+Token-bucket rate limiting.
+
+Every request takes tokens from a bucket keyed by who is calling (user id, or
+client IP for anonymous requests) and the route class it hits. Buckets hold
+up to CAPACITY tokens and refill at REFILL_RATE tokens per second. Both come
+from the caller's role budget in RATE_LIMITS. Route classes have different
+costs, so a search or an export drains a bucket faster than a detail read.
+
+With django-redis, buckets live in Redis and are updated by a Lua script, so
+concurrent workers share them atomically. If Redis is unavailable, requests
+fall back to per-process buckets, and Redis is retried after REDIS_RETRY
+seconds.
+"""
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django_redis.cache import RedisCache
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.throttling import BaseThrottle
+
+logger = logging.getLogger('api')
+
+# KEYS[1] bucket; ARGV capacity, refill rate, cost. Returns {allowed, seconds to wait}
+TOKEN_BUCKET_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(bucket[1]) or capacity
+local ts = tonumber(bucket[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+local allowed = 0
+local wait = 0
+if tokens >= cost then
+    tokens = tokens - cost
+    allowed = 1
+else
+    wait = (cost - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 1)
+return {allowed, tostring(wait)}
+"""
+
+class LocalBuckets:
+    """In-process token buckets, used when Redis is not configured or is down"""
+
+    def __init__(self, max_buckets=100_000):
+        self.max_buckets = max_buckets
+        self.buckets = {}
+        self._lock = threading.Lock()
+
+    def take(self, key, capacity, rate, cost):
+        now = time.monotonic()
+        with self._lock:
+            tokens, ts, _ = self.buckets.get(key, (capacity, now, now))
+            tokens = min(capacity, tokens + (now - ts) * rate)
+            allowed = tokens >= cost
+            if allowed:
+                tokens -= cost
+            # Third item: when the bucket is full again and can be forgotten
+            self.buckets[key] = (tokens, now, now + (capacity - tokens) / rate)
+            if len(self.buckets) > self.max_buckets:
+                self.buckets = {k: v for k, v in self.buckets.items() if v[2] > now}
+        return allowed, 0 if allowed else (cost - tokens) / rate
+
+    def clear(self):
+        with self._lock:
+            self.buckets.clear()
+
+class RedisBuckets:
+    """Token buckets in Redis, updated atomically by TOKEN_BUCKET_SCRIPT"""
+
+    def __init__(self):
+        self.script = None
+
+    def take(self, key, capacity, rate, cost):
+        if self.script is None:
+            from django_redis import get_redis_connection
+            self.script = get_redis_connection('default').register_script(TOKEN_BUCKET_SCRIPT)
+        allowed, wait = self.script(keys=[cache.make_key(key)], args=[capacity, rate, cost])
+        return bool(allowed), float(wait)
+
+_local = LocalBuckets()
+_redis = RedisBuckets()
+_redis_retry_at = 0
+
+def take_tokens(key, capacity, rate, cost):
+    """(allowed, seconds until ``cost`` tokens are available)"""
+    global _redis_retry_at
+    # By class, since the configured BACKEND is a subclass (api.cache.InstrumentedRedisCache)
+    if isinstance(caches['default'], RedisCache) and time.monotonic() >= _redis_retry_at:
+        try:
+            return _redis.take(key, capacity, rate, cost)
+        except Exception:
+            logger.warning('Rate limit buckets unavailable in Redis, using in-process buckets', exc_info=True)
+            _redis_retry_at = time.monotonic() + settings.RATE_LIMITS['REDIS_RETRY']
+    return _local.take(key, capacity, rate, cost)
+
+@receiver(setting_changed)
+def reset_buckets(setting, **kwargs):
+    global _redis_retry_at
+    if setting in ('RATE_LIMITS', 'CACHES'):
+        _local.clear()
+        _redis.script = None
+        _redis_retry_at = 0
+
+def route_class(request, view):
+    """Which kind of endpoint a request hits, for bucket keys and costs"""
+    url_name = request.resolver_match.url_name if request.resolver_match else None
+    if url_name in settings.RATE_LIMITS['ROUTES']:
+        return settings.RATE_LIMITS['ROUTES'][url_name]
+    action = getattr(view, 'action', None)
+    if action == 'export':
+        return 'export'
+    if request.method not in SAFE_METHODS:
+        return 'write'
+    if request.query_params.get(settings.REST_FRAMEWORK.get('SEARCH_PARAM', 'search')):
+        return 'search'
+    if action == 'list':
+        return 'list'
+    return 'read'
+
+class TokenBucketThrottle(BaseThrottle):
+    """Per-role token buckets; roles without a budget (staff by default) are not limited"""
+
+    def get_role(self, request):
+        user = request.user
+        if not user or not user.is_authenticated:
+            return 'anon'
+        if user.is_staff:
+            return 'staff'
+        return user.role
+
+    def allow_request(self, request, view):
+        config = settings.RATE_LIMITS
+        budget = config['BUDGETS'].get(self.get_role(request))
+        if budget is None:
+            return True
+
+        route = route_class(request, view)
+        if request.user and request.user.is_authenticated:
+            ident = f'user:{request.user.pk}'
+        else:
+            ident = f'ip:{self.get_ident(request)}'
+        allowed, self.wait_seconds = take_tokens(
+            f'throttle:{ident}:{route}', budget['CAPACITY'], budget['REFILL_RATE'], config['COSTS'].get(route, 1)
+        )
+        return allowed
+
+    def wait(self):
+        return self.wait_seconds
@@ -3,9 +3,10 @@ from rest_framework.routers import DefaultRouter
 from rest_framework_simplejwt.views import TokenRefreshView
 from .views import (
     JobPostingViewSet, ApplicationViewSet, ReviewViewSet,
-    UserSignupView, UserLoginView, test_token, UserViewSet,
+    UserSignupView, UserLoginView, TokenRevokeView, test_token, UserViewSet,
     WorkerProfileViewSet, SkillViewSet, CategoryViewSet,
-    PaymentTransactionViewSet, PaymentMethodViewSet, dashboard_stats, platform_stats
+    PaymentTransactionViewSet, PaymentMethodViewSet, dashboard_stats, platform_stats,
+    validate_phones
 )
 from .utils.batch_operations import batch_operations, bulk_job_upload
 
@@ -28,6 +29,7 @@ urlpatterns = [
     path('signup/', UserSignupView.as_view(), name='signup'),
     path('login/', UserLoginView.as_view(), name='login'),
     path('token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
+    path('token/revoke/', TokenRevokeView.as_view(), name='token_revoke'),
     path('test-token/', test_token, name='test-token'),
     
     # Batch operations
@@ -37,4 +39,7 @@ urlpatterns = [
     # Dashboard and analytics
     path('dashboard/stats/', dashboard_stats, name='dashboard-stats'),
     path('platform/stats/', platform_stats, name='platform-stats'),
+
+    # Utilities
+    path('utils/phones/validate/', validate_phones, name='validate-phones'),
 ]
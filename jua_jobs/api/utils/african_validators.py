@@ -1,66 +1,144 @@
 import re
+from collections import namedtuple
 from django.core.exceptions import ValidationError
 from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+INTERNATIONAL_CURRENCIES = ('USD', 'EUR')
+
+CountryRule = namedtuple('CountryRule', 'code name currency dialing_code pattern')
+ProviderRule = namedtuple('ProviderRule', 'name countries currencies')
+
+class ValidatorRegistry:
+    """
+    Country, currency and mobile money rules compiled once from settings.
+
+    Phone patterns are precompiled, numbers without a country are dispatched
+    on their dialing prefix instead of being tried against every country, and
+    currency/provider lookups are frozen sets.
+    """
+
+    def __init__(self, countries, providers):
+        self.countries = {
+            code: CountryRule(code, config['name'], config['currency'], config['dialing_code'],
+                              re.compile(config['phone_pattern']))
+            for code, config in countries.items()
+        }
+        self.by_dialing_code = {}
+        for rule in self.countries.values():
+            self.by_dialing_code.setdefault(f'+{rule.dialing_code}', []).append(rule)
+        # Longest prefix first, so e.g. +2547... resolves to +254 rather than +27
+        self.prefix_lengths = sorted({len(prefix) for prefix in self.by_dialing_code}, reverse=True)
+
+        currencies = [rule.currency for rule in self.countries.values()] + list(INTERNATIONAL_CURRENCIES)
+        self.currency_list = tuple(dict.fromkeys(currencies))
+        self.currencies = frozenset(self.currency_list)
+
+        self.providers = {
+            name: ProviderRule(name, frozenset(config['countries']), frozenset(config['currencies']))
+            for name, config in providers.items()
+        }
+        self.provider_countries = {name: config['countries'] for name, config in providers.items()}
+        self.mobile_money_types = frozenset(self.providers)
+
+    def rules_for_number(self, value):
+        for length in self.prefix_lengths:
+            rules = self.by_dialing_code.get(value[:length])
+            if rules:
+                return rules
+        return ()
+
+    def phone_error(self, value, country_code=None):
+        """Error message for an invalid number, or None if it is valid"""
+        if not value:
+            return None
+        if country_code:
+            rule = self.countries.get(country_code)
+            if rule and not rule.pattern.match(value):
+                return f'Invalid phone number format for {rule.name}. Expected format: {rule.pattern.pattern}'
+            return None
+        if any(rule.pattern.match(value) for rule in self.rules_for_number(value)):
+            return None
+        return 'Invalid African phone number format'
+
+    def currency_error(self, value):
+        if not value or value in self.currencies:
+            return None
+        return f'Currency {value} is not supported. Valid currencies: {", ".join(self.currency_list)}'
+
+    def mobile_money_error(self, payment_type, phone_number, country):
+        provider = self.providers.get(payment_type)
+        if provider is None:
+            return f'Mobile money provider {payment_type} is not supported'
+        if country not in provider.countries:
+            return (
+                f'{payment_type} is not available in {country}. '
+                f'Available countries: {", ".join(self.provider_countries[payment_type])}'
+            )
+        return self.phone_error(phone_number, country)
+
+    def validate_phone(self, value, country_code=None):
+        error = self.phone_error(value, country_code)
+        if error:
+            raise ValidationError(error)
+
+    def validate_currency(self, value):
+        error = self.currency_error(value)
+        if error:
+            raise ValidationError(error)
+
+    def validate_mobile_money(self, payment_type, phone_number, country):
+        error = self.mobile_money_error(payment_type, phone_number, country)
+        if error:
+            raise ValidationError(error)
+
+    def validate_many(self, numbers, countries=None):
+        """
+        Validate phone numbers in bulk, e.g. for imports. ``countries`` is
+        None, one country code for every number, or an iterable of codes
+        aligned with ``numbers``. Returns a list of error messages (None for
+        valid numbers) in input order.
+        """
+        if countries is None or isinstance(countries, str):
+            return [self.phone_error(number, countries) for number in numbers]
+        return [self.phone_error(number, country) for number, country in zip(numbers, countries)]
+
+_registry = None
+
+def get_registry():
+    """The shared registry, built on first use (warmed in ApiConfig.ready)"""
+    global _registry
+    if _registry is None:
+        _registry = ValidatorRegistry(settings.AFRICAN_COUNTRIES, settings.MOBILE_MONEY_PROVIDERS)
+    return _registry
+
+@receiver(setting_changed)
+def reset_registry(setting, **kwargs):
+    global _registry
+    if setting in ('AFRICAN_COUNTRIES', 'MOBILE_MONEY_PROVIDERS'):
+        _registry = None
+
+def validate_many(numbers, countries=None):
+    return get_registry().validate_many(numbers, countries)
 
 class AfricanPhoneValidator:
     """Validator for African phone number formats"""
-    
+
     def __init__(self, country_code=None):
         self.country_code = country_code
-    
+
     def __call__(self, value):
-        if not value:
-            return
-        
-        # If country code is provided, validate against specific pattern
-        if self.country_code:
-            country_config = settings.AFRICAN_COUNTRIES.get(self.country_code)
-            if country_config:
-                pattern = country_config['phone_pattern']
-                if not re.match(pattern, value):
-                    raise ValidationError(
-                        f'Invalid phone number format for {country_config["name"]}. '
-                        f'Expected format: {pattern}'
-                    )
-        else:
-            # Validate against all African patterns
-            valid = False
-            for country_code, config in settings.AFRICAN_COUNTRIES.items():
-                if re.match(config['phone_pattern'], value):
-                    valid = True
-                    break
-            
-            if not valid:
-                raise ValidationError('Invalid African phone number format')
+        get_registry().validate_phone(value, self.country_code)
 
 class CurrencyValidator:
     """Validator for African currencies"""
-    
+
     def __call__(self, value):
-        if not value:
-            return
-        
-        valid_currencies = [config['currency'] for config in settings.AFRICAN_COUNTRIES.values()]
-        valid_currencies.extend(['USD', 'EUR'])  # Add international currencies
-        
-        if value not in valid_currencies:
-            raise ValidationError(f'Currency {value} is not supported. Valid currencies: {", ".join(valid_currencies)}')
+        get_registry().validate_currency(value)
 
 class MobileMoneyValidator:
     """Validator for mobile money payment methods"""
-    
+
     def __call__(self, payment_type, phone_number, country):
-        if payment_type not in settings.MOBILE_MONEY_PROVIDERS:
-            raise ValidationError(f'Mobile money provider {payment_type} is not supported')
-        
-        provider_config = settings.MOBILE_MONEY_PROVIDERS[payment_type]
-        
-        if country not in provider_config['countries']:
-            raise ValidationError(
-                f'{payment_type} is not available in {country}. '
-                f'Available countries: {", ".join(provider_config["countries"])}'
-            )
-        
-        # Validate phone number format
-        validator = AfricanPhoneValidator(country)
-        validator(phone_number)
+        get_registry().validate_mobile_money(payment_type, phone_number, country)
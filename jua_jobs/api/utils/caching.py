@@ -3,6 +3,11 @@ from django.conf import settings
 from functools import wraps
 import hashlib
 import json
+import logging
+
+from .query_stats import track_queries
+
+logger = logging.getLogger('api')
 
 def cache_key_generator(prefix, *args, **kwargs):
     """Generate a cache key from function arguments"""
@@ -20,11 +25,19 @@ def cache_result(timeout=300, prefix="api"):
         @wraps(func)
         def wrapper(*args, **kwargs):
             cache_key = cache_key_generator(f"{prefix}:{func.__name__}", *args, **kwargs)
-            result = cache.get(cache_key)
+            try:
+                result = cache.get(cache_key)
+            except Exception:
+                # Cache outage: compute the result as if nothing was cached
+                logger.warning('Result cache unavailable', exc_info=True)
+                return func(*args, **kwargs)
             
             if result is None:
                 result = func(*args, **kwargs)
-                cache.set(cache_key, result, timeout)
+                try:
+                    cache.set(cache_key, result, timeout)
+                except Exception:
+                    logger.warning('Result cache unavailable', exc_info=True)
             
             return result
         return wrapper
@@ -63,9 +76,12 @@ class CacheManager:
     @staticmethod
     def invalidate_job_cache(job_id):
         cache_key = CacheManager.get_job_cache_key(job_id)
-        cache.delete(cache_key)
-        # Also invalidate related caches
-        invalidate_cache_pattern("jobs_list:*")
+        try:
+            cache.delete(cache_key)
+            # Also invalidate related caches
+            invalidate_cache_pattern("jobs_list:*")
+        except Exception:
+            logger.warning('Could not invalidate cached job %s', job_id, exc_info=True)
     
     @staticmethod
     def invalidate_user_cache(user_id):
@@ -88,21 +104,16 @@ class PerformanceMonitor:
     
     @staticmethod
     def log_query_count(func):
-        """Decorator to log database query count"""
+        """Decorator to log database query count (works with DEBUG off; see api/utils/query_stats.py)"""
         @wraps(func)
         def wrapper(*args, **kwargs):
-            from django.db import connection
-            initial_queries = len(connection.queries)
-            
-            result = func(*args, **kwargs)
-            
-            final_queries = len(connection.queries)
-            query_count = final_queries - initial_queries
+            with track_queries() as stats:
+                result = func(*args, **kwargs)
             
-            if query_count > 10:  # Log if more than 10 queries
-                import logging
-                logger = logging.getLogger('api')
-                logger.warning(f"High query count in {func.__name__}: {query_count} queries")
+            if stats.count > 10:  # Log if more than 10 queries
+                logger.warning(
+                    "High query count in %s: %d queries, %.1f ms", func.__name__, stats.count, stats.duration_ms
+                )
             
             return result
         return wrapper
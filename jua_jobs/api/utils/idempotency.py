@@ -0,0 +1,127 @@
+from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+from functools import wraps
+import hashlib
+import json
+import time
+
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+POLL_INTERVAL = 0.1
+
+def request_fingerprint(request):
+    """Hash of the request payload, including uploaded file contents"""
+    digest = hashlib.sha256()
+    payload = {}
+    for name in sorted(request.data.keys()) if hasattr(request.data, 'keys') else []:
+        values = request.data.getlist(name) if hasattr(request.data, 'getlist') else [request.data[name]]
+        payload[name] = []
+        for value in values:
+            if isinstance(value, UploadedFile):
+                file_digest = hashlib.sha256()
+                for chunk in value.chunks():
+                    file_digest.update(chunk)
+                value.seek(0)
+                value = f'file:{value.name}:{value.size}:{file_digest.hexdigest()}'
+            payload[name].append(value)
+    digest.update(json.dumps(payload, sort_keys=True, default=str).encode())
+    return digest.hexdigest()
+
+def _replay(record):
+    return Response(
+        record.response_body,
+        status=record.response_status,
+        headers={'Idempotent-Replayed': 'true'}
+    )
+
+def idempotent(view_method):
+    """
+    Make a view method safe to retry with an Idempotency-Key header.
+
+    The first request with a key runs normally and its response is stored;
+    replays with the same key and payload get the stored response without
+    touching validation or writes. Concurrent duplicates wait for the first
+    to finish. Requests without the header are unaffected.
+    """
+    @wraps(view_method)
+    def wrapper(self, request, *args, **kwargs):
+        from api.models import IdempotencyKey
+
+        key = request.headers.get(IDEMPOTENCY_HEADER)
+        if not key or not request.user.is_authenticated:
+            return view_method(self, request, *args, **kwargs)
+        if len(key) > 255:
+            return Response(
+                {'error': f'{IDEMPOTENCY_HEADER} must be at most 255 characters'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        config = settings.IDEMPOTENCY
+        scope = f'{request.method} {request.path}'
+        fingerprint = request_fingerprint(request)
+        lookup = {'user': request.user, 'scope': scope, 'key': key}
+
+        record = None
+        for _ in range(2):
+            try:
+                with transaction.atomic():
+                    record = IdempotencyKey.objects.create(
+                        fingerprint=fingerprint,
+                        expires_at=timezone.now() + config['TTL'],
+                        **lookup
+                    )
+                break
+            except IntegrityError:
+                existing = IdempotencyKey.objects.filter(**lookup).first()
+                if existing is None or existing.expires_at <= timezone.now():
+                    # Expired (or just purged): clear it and claim the key afresh
+                    IdempotencyKey.objects.filter(**lookup, expires_at__lte=timezone.now()).delete()
+                    continue
+                if existing.fingerprint != fingerprint:
+                    return Response(
+                        {'error': f'{IDEMPOTENCY_HEADER} was already used with a different request'},
+                        status=status.HTTP_422_UNPROCESSABLE_ENTITY
+                    )
+                deadline = time.monotonic() + config['WAIT_TIMEOUT']
+                while existing.status != 'completed' and time.monotonic() < deadline:
+                    time.sleep(POLL_INTERVAL)
+                    existing = IdempotencyKey.objects.filter(pk=existing.pk).first()
+                    if existing is None:
+                        break
+                if existing is not None and existing.status == 'completed':
+                    return _replay(existing)
+                return Response(
+                    {'error': f'A request with this {IDEMPOTENCY_HEADER} is still being processed'},
+                    status=status.HTTP_409_CONFLICT
+                )
+        if record is None:
+            return Response(
+                {'error': f'A request with this {IDEMPOTENCY_HEADER} is still being processed'},
+                status=status.HTTP_409_CONFLICT
+            )
+
+        try:
+            response = view_method(self, request, *args, **kwargs)
+        except Exception:
+            record.delete()
+            raise
+
+        if response.status_code >= 500:
+            # Server errors are not final; let the client retry with the same key
+            record.delete()
+            return response
+
+        record.status = 'completed'
+        record.response_status = response.status_code
+        record.response_body = response.data
+        record.save(update_fields=['status', 'response_status', 'response_body'])
+        return response
+    return wrapper
+
+def purge_expired_keys():
+    from api.models import IdempotencyKey
+    deleted, _ = IdempotencyKey.objects.filter(expires_at__lte=timezone.now()).delete()
+    return deleted
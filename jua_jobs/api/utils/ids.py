@@ -0,0 +1,70 @@
+"""
+Time-sortable transaction reference ids.
+
+ULID layout: a 48-bit millisecond timestamp followed by 80 random bits,
+written as 26 Crockford base32 characters. Ids sort lexically in creation
+order, so inserts land at the right edge of the reference_id index and a
+range over reference_id is a range over time.
+"""
+from datetime import datetime, timezone as dt_timezone
+import os
+import threading
+import time
+
+ALPHABET = '0123456789ABCDEFGHJKMNPQRSTVWXYZ'
+DECODE = {char: value for value, char in enumerate(ALPHABET)}
+LENGTH = 26
+RANDOM_BITS = 80
+
+_lock = threading.Lock()
+_last_timestamp = -1
+_last_random = 0
+
+def _encode(value):
+    chars = []
+    for _ in range(LENGTH):
+        value, remainder = divmod(value, 32)
+        chars.append(ALPHABET[remainder])
+    return ''.join(reversed(chars))
+
+def generate_reference_id(timestamp_ms=None):
+    """
+    New reference id. Ids generated in the same millisecond by this process
+    increment the random part, so they stay strictly increasing.
+    """
+    global _last_timestamp, _last_random
+    if timestamp_ms is None:
+        timestamp_ms = time.time_ns() // 1_000_000
+    with _lock:
+        if timestamp_ms == _last_timestamp:
+            _last_random = (_last_random + 1) % (1 << RANDOM_BITS)
+        else:
+            _last_timestamp = timestamp_ms
+            _last_random = int.from_bytes(os.urandom(10), 'big')
+        random_part = _last_random
+    return _encode((timestamp_ms << RANDOM_BITS) | random_part)
+
+def reference_id_for_datetime(value, rng=None):
+    """
+    Reference id for an existing timestamp, used when re-keying historical
+    rows. With ``rng`` (a random.Random) the random part comes from it, so
+    seeded synthetic data gets reproducible ids.
+    """
+    timestamp_ms = int(value.timestamp() * 1000)
+    if rng is not None:
+        return _encode((timestamp_ms << RANDOM_BITS) | rng.getrandbits(RANDOM_BITS))
+    return generate_reference_id(timestamp_ms)
+
+def is_reference_id(value):
+    return len(value) == LENGTH and value[0] in '01234567' and all(char in DECODE for char in value)
+
+def reference_id_timestamp(value):
+    """Creation time encoded in a reference id"""
+    number = 0
+    for char in value[:10]:
+        number = number * 32 + DECODE[char]
+    return datetime.fromtimestamp(number / 1000, tz=dt_timezone.utc)
+
+def reference_id_lower_bound(value):
+    """Smallest reference id at or after the given datetime, for time-range keyset filters"""
+    return _encode(int(value.timestamp() * 1000) << RANDOM_BITS)
@@ -0,0 +1,261 @@
+"""
+Double-entry ledger for payment transactions.
+
+A transaction in the ``completed`` state is posted as two LedgerEntry rows:
+a debit on the sender and a credit on the receiver. Leaving ``completed``
+posts the mirror-image reversal, so a transaction is currently posted when
+its entry count is 2 modulo 4. Balances are the latest BalanceSnapshot plus
+the entries written after it.
+
+With country sharding (see api/utils/sharding.py) entries live on their
+transaction's shard. Entry ids from different shards don't form one
+sequence, so each shard keeps the snapshots of its own entries, and balances,
+snapshot runs and integrity checks go through every shard in turn.
+"""
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, F, Max, Q, Sum
+from django.db.models.functions import Mod
+from django.utils import timezone
+
+from .sharding import fan_out, shard_aliases, sharding_enabled
+
+POSTED_STATUS = 'completed'
+
+# Entries younger than this are left out of snapshots so rows from
+# still-open transactions with lower ids can't be skipped over.
+SNAPSHOT_SAFETY_LAG = timedelta(seconds=60)
+
+def _is_posted(entry_count):
+    return (entry_count // 2) % 2 == 1
+
+def _entries_for(payment, sign):
+    from api.models import LedgerEntry
+    amount = Decimal(str(payment.amount)) * sign
+    return [
+        LedgerEntry(transaction_id=payment.id, user_id=payment.sender_id, currency=payment.currency, amount=-amount),
+        LedgerEntry(transaction_id=payment.id, user_id=payment.receiver_id, currency=payment.currency, amount=amount),
+    ]
+
+def sync_ledger(payments):
+    """
+    Bring the ledger in line with the current status of each transaction:
+    post completed ones that are not yet posted and reverse posted ones that
+    left the completed state. Returns the number of entries written.
+    """
+    by_db = defaultdict(list)
+    for payment in payments:
+        if payment.pk:
+            by_db[payment._state.db].append(payment)
+    return sum(_sync_ledger(group, using) for using, group in by_db.items())
+
+def _sync_ledger(payments, using):
+    """
+    sync_ledger() for transactions stored on ``using``; their entries go
+    alongside them. The transactions are locked before their entries are
+    counted, so concurrent syncs of one transaction post it once, and the
+    stored status, not the caller's copy, decides what is posted.
+    """
+    from api.models import LedgerEntry, PaymentTransaction
+
+    entries_on_db = LedgerEntry.objects.db_manager(using)
+    with transaction.atomic(using=using):
+        # In id order, so overlapping syncs can't deadlock. SQLite has no row
+        # locks; its IMMEDIATE transactions (see settings) serialize writers instead.
+        statuses = dict(
+            PaymentTransaction.objects.db_manager(using).select_for_update()
+            .filter(pk__in=[payment.pk for payment in payments]).order_by('pk').values_list('pk', 'status')
+        )
+        counts = dict(
+            entries_on_db.filter(transaction_id__in=list(statuses))
+            .order_by().values('transaction_id').annotate(n=Count('id')).values_list('transaction_id', 'n')
+        )
+        entries = []
+        for payment in payments:
+            # Popped, so a transaction passed twice is still synced once
+            status = statuses.pop(payment.pk, None)
+            if status is None:
+                continue
+            posted = _is_posted(counts.get(payment.pk, 0))
+            should_post = status == POSTED_STATUS
+            if should_post and not posted:
+                entries.extend(_entries_for(payment, 1))
+            elif posted and not should_post:
+                entries.extend(_entries_for(payment, -1))
+
+        entries_on_db.bulk_create(entries, batch_size=1000)
+    return len(entries)
+
+def get_balances(user):
+    """Return {currency: Decimal balance} from the latest snapshots plus newer entries, summed over shards"""
+    from api.models import BalanceSnapshot, LedgerEntry
+
+    balances = {}
+    snapshots = BalanceSnapshot.objects.filter(user=user).order_by('currency', '-last_entry_id')
+    entries = LedgerEntry.objects.filter(user=user)
+    for shard_snapshots, shard_entries in zip(fan_out(snapshots), fan_out(entries)):
+        for currency, balance in _shard_balances(shard_snapshots, shard_entries).items():
+            balances[currency] = balances.get(currency, Decimal('0')) + balance
+    return balances
+
+def _shard_balances(snapshots, entries):
+    latest = {}
+    for snapshot in snapshots:
+        latest.setdefault(snapshot.currency, snapshot)
+
+    since = ~Q(currency__in=list(latest))
+    for currency, snapshot in latest.items():
+        since |= Q(currency=currency, id__gt=snapshot.last_entry_id)
+
+    balances = {currency: snapshot.balance for currency, snapshot in latest.items()}
+    deltas = entries.filter(since).order_by().values('currency').annotate(total=Sum('amount'))
+    for row in deltas:
+        balances[row['currency']] = balances.get(row['currency'], Decimal('0')) + row['total']
+    return balances
+
+def take_snapshots(chunk_size=1000, keep=3, safety_lag=SNAPSHOT_SAFETY_LAG):
+    """
+    Snapshot every (user, currency) pair with entries since the previous run,
+    on every shard. Returns the number of snapshots written.
+    """
+    return sum(_take_snapshots(using, chunk_size, keep, safety_lag) for using in shard_aliases())
+
+def _take_snapshots(using, chunk_size, keep, safety_lag):
+    """
+    take_snapshots() for the entries stored on ``using``; the snapshots go
+    alongside them. All snapshots in a run share one watermark, so the new
+    entries are aggregated with a single GROUP BY. Older snapshots beyond
+    ``keep`` per pair are pruned.
+    """
+    from api.models import BalanceSnapshot, LedgerEntry
+
+    snapshots_on_db = BalanceSnapshot.objects.db_manager(using)
+    entries_on_db = LedgerEntry.objects.db_manager(using)
+    previous_watermark = snapshots_on_db.aggregate(w=Max('last_entry_id'))['w'] or 0
+    watermark = entries_on_db.filter(
+        created_at__lt=timezone.now() - safety_lag
+    ).aggregate(w=Max('id'))['w']
+    if not watermark or watermark <= previous_watermark:
+        return 0
+
+    deltas = (
+        entries_on_db.filter(id__gt=previous_watermark, id__lte=watermark)
+        .order_by().values('user_id', 'currency').annotate(total=Sum('amount'))
+        .order_by('user_id', 'currency')
+    )
+    written = 0
+
+    def flush(rows):
+        user_ids = {row['user_id'] for row in rows}
+        previous = {}
+        for snapshot in snapshots_on_db.filter(user_id__in=user_ids).order_by('-last_entry_id'):
+            previous.setdefault((snapshot.user_id, snapshot.currency), snapshot.balance)
+        snapshots_on_db.bulk_create([
+            BalanceSnapshot(
+                user_id=row['user_id'],
+                currency=row['currency'],
+                balance=previous.get((row['user_id'], row['currency']), Decimal('0')) + row['total'],
+                last_entry_id=watermark,
+            )
+            for row in rows
+        ], batch_size=chunk_size)
+        return len(rows)
+
+    with transaction.atomic(using=using):
+        batch = []
+        for row in deltas:
+            batch.append(row)
+            if len(batch) >= chunk_size:
+                written += flush(batch)
+                batch = []
+        if batch:
+            written += flush(batch)
+
+    if keep:
+        stale = []
+        seen = defaultdict(int)
+        for snapshot_id, user_id, currency in (
+            snapshots_on_db.order_by('user_id', 'currency', '-last_entry_id')
+            .values_list('id', 'user_id', 'currency').iterator(chunk_size=chunk_size)
+        ):
+            seen[(user_id, currency)] += 1
+            if seen[(user_id, currency)] > keep:
+                stale.append(snapshot_id)
+        for start in range(0, len(stale), chunk_size):
+            snapshots_on_db.filter(id__in=stale[start:start + chunk_size]).delete()
+
+    return written
+
+def verify_ledger(limit=100):
+    """
+    Check ledger integrity with set-based queries, on every shard. Returns a
+    dict mapping each check name to a (possibly empty) list of offending rows,
+    capped at ``limit``; with sharding, each row names its ``database``.
+    """
+    sharded = sharding_enabled()
+    issues = defaultdict(list)
+    for using in shard_aliases():
+        for check, rows in _verify_ledger(using, limit).items():
+            issues[check].extend({**row, 'database': using} if sharded else row for row in rows)
+    return {check: rows[:limit] for check, rows in issues.items()}
+
+def _verify_ledger(using, limit):
+    from api.models import BalanceSnapshot, LedgerEntry, PaymentTransaction
+
+    entries_on_db = LedgerEntry.objects.db_manager(using)
+    snapshots_on_db = BalanceSnapshot.objects.db_manager(using)
+    issues = {}
+
+    issues['unbalanced_transactions'] = list(
+        entries_on_db.order_by().values('transaction_id')
+        .annotate(total=Sum('amount')).exclude(total=0)[:limit]
+    )
+    issues['amount_mismatches'] = list(
+        entries_on_db.exclude(amount=F('transaction__amount')).exclude(amount=-F('transaction__amount'))
+        .values('id', 'transaction_id', 'amount')[:limit]
+    )
+    posting_state = PaymentTransaction.objects.db_manager(using).annotate(
+        entry_count=Count('ledger_entries')
+    ).annotate(phase=Mod(F('entry_count'), 4))
+    issues['posting_mismatches'] = list(
+        posting_state.filter(
+            (Q(status=POSTED_STATUS) & ~Q(phase=2)) | (~Q(status=POSTED_STATUS) & Q(phase=2))
+        ).values('id', 'reference_id', 'status', 'entry_count')[:limit]
+    )
+    issues['unbalanced_currencies'] = list(
+        entries_on_db.order_by().values('currency')
+        .annotate(total=Sum('amount')).exclude(total=0)[:limit]
+    )
+
+    # Every latest snapshot must equal the sum of entries up to the newest watermark;
+    # pairs without newer entries are unaffected by the extra range.
+    watermark = snapshots_on_db.aggregate(w=Max('last_entry_id'))['w']
+    snapshot_mismatches = []
+    if watermark:
+        actual = {
+            (row['user_id'], row['currency']): row['total']
+            for row in entries_on_db.filter(id__lte=watermark).order_by()
+            .values('user_id', 'currency').annotate(total=Sum('amount'))
+        }
+        seen = set()
+        for snapshot in snapshots_on_db.order_by('user_id', 'currency', '-last_entry_id').iterator():
+            key = (snapshot.user_id, snapshot.currency)
+            if key in seen:
+                continue
+            seen.add(key)
+            expected = actual.pop(key, Decimal('0'))
+            if snapshot.balance != expected:
+                snapshot_mismatches.append({
+                    'user_id': snapshot.user_id, 'currency': snapshot.currency,
+                    'snapshot': snapshot.balance, 'ledger': expected,
+                })
+        # Pairs with entries up to the watermark but no snapshot at all
+        snapshot_mismatches.extend(
+            {'user_id': user_id, 'currency': currency, 'snapshot': None, 'ledger': total}
+            for (user_id, currency), total in actual.items()
+        )
+    issues['snapshot_mismatches'] = snapshot_mismatches[:limit]
+    return issues
@@ -0,0 +1,195 @@
+"""
+In-process request metrics, exported in the Prometheus text format.
+
+Counters and histograms are aggregated in memory under one lock, so
+recording a request costs a few dict updates. With METRICS['DIRECTORY'] set
+(required under a multi-process server such as gunicorn), each process also
+writes its totals to its own file there at most every FLUSH_INTERVAL
+seconds. Files are replaced atomically, never shared, and summed when
+/metrics is scraped, so any worker can answer for all of them. Clear the
+directory when the server restarts, as with prometheus_client's multiprocess
+mode.
+"""
+import atexit
+import json
+import os
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+# name -> (type, help)
+METRICS = {
+    'http_requests_total': ('counter', 'Requests by route, method and status code'),
+    'http_request_duration_seconds': ('histogram', 'Request latency by route'),
+    'http_request_db_seconds': ('histogram', 'Database time per request by route'),
+    'http_request_size_bytes': ('histogram', 'Request body size by route'),
+    'http_response_size_bytes': ('histogram', 'Response body size by route (non-streaming)'),
+    'cache_requests_total': ('counter', 'Cache lookups by result (hit or miss)'),
+}
+
+def _bucket_setting(name):
+    return 'SIZE_BUCKETS' if name.endswith('_bytes') else 'LATENCY_BUCKETS'
+
+class MetricsRegistry:
+    """One process's counters and histograms; histograms keep per-bucket (not cumulative) counts"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters = {}
+        self.histograms = {}
+        self.path = None
+        self.last_flush = 0.0
+
+    def inc(self, name, labels, amount=1):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def observe(self, name, labels, value):
+        buckets = settings.METRICS[_bucket_setting(name)]
+        key = (name, tuple(sorted(labels.items())))
+        index = len(buckets)
+        for position, bound in enumerate(buckets):
+            if value <= bound:
+                index = position
+                break
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = [[0] * (len(buckets) + 1), 0.0]
+            histogram[0][index] += 1
+            histogram[1] += value
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'counters': [[name, labels, value] for (name, labels), value in self.counters.items()],
+                'histograms': [
+                    [name, labels, list(counts), total] for (name, labels), (counts, total) in self.histograms.items()
+                ],
+            }
+
+    def flush(self, force=False):
+        """Write this process's totals to its file in METRICS['DIRECTORY'] (if any)"""
+        directory = settings.METRICS['DIRECTORY']
+        now = time.monotonic()
+        if not directory or (not force and now - self.last_flush < settings.METRICS['FLUSH_INTERVAL']):
+            return
+        self.last_flush = now
+        os.makedirs(directory, exist_ok=True)
+        if self.path is None or os.path.dirname(self.path) != str(directory):
+            # Start time in the name, so a recycled pid never overwrites a dead process's totals
+            self.path = os.path.join(directory, f'{os.getpid()}-{time.time_ns()}.json')
+        descriptor, temporary = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        with os.fdopen(descriptor, 'w') as handle:
+            json.dump(self.snapshot(), handle)
+        os.replace(temporary, self.path)
+
+    def reset(self):
+        with self._lock:
+            self.counters.clear()
+            self.histograms.clear()
+        self.path = None
+        self.last_flush = 0.0
+
+registry = MetricsRegistry()
+atexit.register(lambda: registry.flush(force=True))
+
+@receiver(setting_changed)
+def reset_metrics(setting, **kwargs):
+    if setting == 'METRICS':
+        registry.reset()
+
+def record_request(route, method, status, duration, db_duration, request_size, response_size):
+    registry.inc('http_requests_total', {'route': route, 'method': method, 'status': str(status)})
+    registry.observe('http_request_duration_seconds', {'route': route, 'method': method}, duration)
+    if db_duration is not None:
+        registry.observe('http_request_db_seconds', {'route': route}, db_duration)
+    registry.observe('http_request_size_bytes', {'route': route}, request_size)
+    if response_size is not None:
+        registry.observe('http_response_size_bytes', {'route': route}, response_size)
+    registry.flush()
+
+def record_cache_lookup(hits, misses):
+    if hits:
+        registry.inc('cache_requests_total', {'result': 'hit'}, hits)
+    if misses:
+        registry.inc('cache_requests_total', {'result': 'miss'}, misses)
+
+def collect():
+    """Totals of every process: the files in METRICS['DIRECTORY'], or just this process without one"""
+    directory = settings.METRICS['DIRECTORY']
+    if not directory:
+        snapshots = [registry.snapshot()]
+    else:
+        registry.flush(force=True)
+        snapshots = []
+        for filename in os.listdir(directory):
+            if not filename.endswith('.json'):
+                continue
+            try:
+                with open(os.path.join(directory, filename)) as handle:
+                    snapshots.append(json.load(handle))
+            except (OSError, ValueError):
+                # Written by a process that exited mid-flush; os.replace makes this rare
+                continue
+
+    counters, histograms = {}, {}
+    for snapshot in snapshots:
+        for name, labels, value in snapshot['counters']:
+            key = (name, tuple(tuple(pair) for pair in labels))
+            counters[key] = counters.get(key, 0) + value
+        for name, labels, counts, total in snapshot['histograms']:
+            key = (name, tuple(tuple(pair) for pair in labels))
+            merged = histograms.get(key)
+            if merged is None or len(merged[0]) != len(counts):
+                # A changed bucket layout restarts the series rather than mixing bounds
+                histograms[key] = [list(counts), total]
+            else:
+                merged[0] = [a + b for a, b in zip(merged[0], counts)]
+                merged[1] += total
+    return counters, histograms
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+def _labels(pairs):
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+def render():
+    """All metrics in the Prometheus text exposition format (version 0.0.4)"""
+    counters, histograms = collect()
+    lines = []
+    for name, (kind, help_text) in METRICS.items():
+        if kind == 'counter':
+            series = sorted((labels, value) for (metric, labels), value in counters.items() if metric == name)
+        else:
+            series = sorted((labels, value) for (metric, labels), value in histograms.items() if metric == name)
+        if not series:
+            continue
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {kind}')
+        for labels, value in series:
+            if kind == 'counter':
+                lines.append(f'{name}{_labels(labels)} {_number(value)}')
+                continue
+            counts, total = value
+            bounds = [repr(float(bound)) for bound in settings.METRICS[_bucket_setting(name)]]
+            if len(bounds) != len(counts) - 1:
+                continue
+            cumulative = 0
+            for bound, count in zip(bounds + ['+Inf'], counts):
+                cumulative += count
+                lines.append(f'{name}_bucket{_labels(labels + (("le", bound),))} {cumulative}')
+            lines.append(f'{name}_sum{_labels(labels)} {_number(total)}')
+            lines.append(f'{name}_count{_labels(labels)} {cumulative}')
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,130 @@
+"""
+(user, job) -> role index behind review and application permission checks.
+
+JobParticipation holds one row per job owner and per applicant, kept current
+from JobPosting and Application saves (see api/signals.py). Lookups go through
+the cache, and a miss is a single query on the (user, job) unique index, so a
+permission check never loads the job or scans its applications. Rows written
+with bulk_create/update() skip the signals; rebuild_participation() repairs
+the index after such writes. Rows live on their job's shard (see
+api/utils/sharding.py).
+"""
+import logging
+
+from django.core.cache import cache
+from django.db import transaction
+
+from .sharding import shard_aliases, shard_for_id
+
+logger = logging.getLogger('api')
+
+OWNER = 'owner'
+APPLICANT = 'applicant'
+ACCEPTED = 'accepted'
+
+CACHE_TTL = 300
+# Cached for users with no part in a job, so repeated denials stay cheap too
+NOT_PARTICIPANT = ''
+
+def participation_cache_key(user_id, job_id):
+    return f'participation:{user_id}:{job_id}'
+
+def get_participation_role(user_id, job_id):
+    """'owner', 'applicant', 'accepted', or None if the user has no part in the job"""
+    from api.models import JobParticipation
+    key = participation_cache_key(user_id, job_id)
+    try:
+        role = cache.get(key)
+    except Exception:
+        # Cache outage: answer from the index
+        logger.warning('Participation cache unavailable', exc_info=True)
+        role = None
+    if role is None:
+        role = JobParticipation.objects.using(shard_for_id(job_id)).filter(
+            user_id=user_id, job_id=job_id
+        ).values_list('role', flat=True).first() or NOT_PARTICIPANT
+        try:
+            cache.set(key, role, CACHE_TTL)
+        except Exception:
+            logger.warning('Participation cache unavailable', exc_info=True)
+    return role or None
+
+def _delete_cached_role(key):
+    try:
+        cache.delete(key)
+    except Exception:
+        logger.warning('Could not invalidate cached participation %s', key, exc_info=True)
+
+def invalidate_participation(user_id, job_id):
+    key = participation_cache_key(user_id, job_id)
+    # Again on commit, so a request racing the transaction can't re-cache the old role
+    _delete_cached_role(key)
+    transaction.on_commit(lambda: _delete_cached_role(key))
+
+def application_role(application_status):
+    return ACCEPTED if application_status == 'accepted' else APPLICANT
+
+def add_participation(user_id, job_id, role):
+    """Index a new job's owner or a new application (one insert; an existing row wins)"""
+    from api.models import JobParticipation
+    JobParticipation.objects.db_manager(shard_for_id(job_id)).bulk_create(
+        [JobParticipation(user_id=user_id, job_id=job_id, role=role)], ignore_conflicts=True
+    )
+    invalidate_participation(user_id, job_id)
+
+def set_participation(user_id, job_id, role):
+    from api.models import JobParticipation
+    JobParticipation.objects.db_manager(shard_for_id(job_id)).update_or_create(user_id=user_id, job_id=job_id, defaults={'role': role})
+    invalidate_participation(user_id, job_id)
+
+def remove_participation(user_id, job_id, roles=(APPLICANT, ACCEPTED)):
+    from api.models import JobParticipation
+    JobParticipation.objects.using(shard_for_id(job_id)).filter(
+        user_id=user_id, job_id=job_id, role__in=roles
+    ).delete()
+    invalidate_participation(user_id, job_id)
+
+def sync_job_owner(job_id, owner_id):
+    """Move the owner row if a saved job changed hands; one query when it didn't"""
+    from api.models import JobParticipation
+    current = JobParticipation.objects.using(shard_for_id(job_id)).filter(
+        job_id=job_id, role=OWNER
+    ).values_list('user_id', flat=True).first()
+    if current == owner_id:
+        return
+    if current:
+        remove_participation(current, job_id, roles=(OWNER,))
+    if owner_id:
+        set_participation(owner_id, job_id, OWNER)
+
+def rebuild_participation(chunk_size=1000):
+    """
+    Recreate the index from jobs and applications, e.g. after bulk imports,
+    on every shard. Returns the number of rows written.
+    """
+    from api.models import Application, JobParticipation, JobPosting
+
+    def rows(using):
+        jobs = JobPosting.objects.using(using).exclude(posted_by=None).values_list('id', 'posted_by_id')
+        for job_id, user_id in jobs.iterator(chunk_size=chunk_size):
+            yield JobParticipation(user_id=user_id, job_id=job_id, role=OWNER)
+        applications = Application.objects.using(using).values_list('job_id', 'worker_id', 'status')
+        for job_id, user_id, status in applications.iterator(chunk_size=chunk_size):
+            yield JobParticipation(user_id=user_id, job_id=job_id, role=application_role(status))
+
+    written = 0
+    for using in shard_aliases():
+        index = JobParticipation.objects.db_manager(using)
+        with transaction.atomic(using=using):
+            index.all().delete()
+            batch = []
+            for row in rows(using):
+                batch.append(row)
+                if len(batch) >= chunk_size:
+                    index.bulk_create(batch, ignore_conflicts=True)
+                    written += len(batch)
+                    batch = []
+            index.bulk_create(batch, ignore_conflicts=True)
+            written += len(batch)
+    # Cached roles may predate the rebuild; they expire within CACHE_TTL
+    return written
@@ -0,0 +1,238 @@
+"""
+Batch payout engine for mobile-money withdrawals.
+
+Pending ``withdrawal`` transactions are claimed in chunks (moved to
+``processing``), paid out concurrently through one pooled asyncio client per
+provider, and their final statuses written back with one UPDATE per outcome.
+An engine only pays the rows its own claiming UPDATE moved, so concurrent
+engines never pay the same withdrawal twice.
+"""
+import asyncio
+import json
+import logging
+from collections import defaultdict
+from urllib.parse import urlsplit
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.utils import timezone
+
+from .sharding import shard_aliases, shard_for_id
+
+logger = logging.getLogger('api')
+
+class ProviderError(Exception):
+    """Transient provider failure (timeout, connection error or 5xx); safe to retry"""
+
+class ProviderClient:
+    """Minimal HTTP/1.1 JSON client with a keep-alive connection pool and a concurrency cap"""
+
+    def __init__(self, url, concurrency=10, timeout=10):
+        parts = urlsplit(url)
+        if parts.scheme not in ('http', 'https'):
+            raise ValueError(f'Unsupported provider URL scheme: {url!r}')
+        self.host = parts.hostname
+        self.ssl = parts.scheme == 'https'
+        self.port = parts.port or (443 if self.ssl else 80)
+        self.path = parts.path or '/'
+        self.timeout = timeout
+        self._slots = asyncio.Semaphore(concurrency)
+        self._idle = []
+
+    async def post(self, payload):
+        async with self._slots:
+            reader, writer = self._idle.pop() if self._idle else await asyncio.wait_for(
+                asyncio.open_connection(self.host, self.port, ssl=self.ssl), self.timeout
+            )
+            try:
+                status, body = await asyncio.wait_for(self._exchange(reader, writer, payload), self.timeout)
+            except BaseException:
+                writer.close()
+                raise
+            self._idle.append((reader, writer))
+            return status, body
+
+    async def _exchange(self, reader, writer, payload):
+        body = json.dumps(payload).encode()
+        writer.write(
+            f'POST {self.path} HTTP/1.1\r\n'
+            f'Host: {self.host}:{self.port}\r\n'
+            f'Content-Type: application/json\r\n'
+            f'Content-Length: {len(body)}\r\n'
+            f'Connection: keep-alive\r\n\r\n'.encode() + body
+        )
+        await writer.drain()
+
+        status_line = await reader.readline()
+        if not status_line:
+            raise ConnectionResetError('connection closed by provider')
+        status = int(status_line.split()[1])
+        length = 0
+        while True:
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode().partition(':')
+            if name.strip().lower() == 'content-length':
+                length = int(value.strip())
+        raw = await reader.readexactly(length) if length else b''
+        return status, json.loads(raw) if raw else {}
+
+    async def close(self):
+        while self._idle:
+            _, writer = self._idle.pop()
+            writer.close()
+
+def claim_ids(ids, using=DEFAULT_DB_ALIAS):
+    """Move those of ``ids`` still pending on ``using`` to processing; returns the ids this call moved"""
+    from api.models import PaymentTransaction
+
+    if not ids:
+        return []
+    now = timezone.now()
+    connection = connections[using]
+    # PostgreSQL and SQLite 3.35+ support UPDATE ... RETURNING
+    if connection.features.can_return_rows_from_bulk_insert:
+        qn = connection.ops.quote_name
+        table = qn(PaymentTransaction._meta.db_table)
+        pk = qn(PaymentTransaction._meta.pk.column)
+        placeholders = ', '.join(['%s'] * len(ids))
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'UPDATE {table} SET {qn("status")} = %s, {qn("updated_at")} = %s '
+                f'WHERE {pk} IN ({placeholders}) AND {qn("status")} = %s RETURNING {pk}',
+                ['processing', connection.ops.adapt_datetimefield_value(now), *ids, 'pending']
+            )
+            return [row[0] for row in cursor.fetchall()]
+    payments = PaymentTransaction.objects.db_manager(using)
+    with transaction.atomic(using=using):
+        claimed = list(
+            payments.select_for_update().filter(id__in=ids, status='pending')
+            .order_by('id').values_list('id', flat=True)
+        )
+        payments.filter(id__in=claimed).update(status='processing', updated_at=now)
+    return claimed
+
+def _claim_on(using, batch_size, providers):
+    from api.models import PaymentTransaction
+
+    with transaction.atomic(using=using):
+        pending = PaymentTransaction.objects.using(using).filter(
+            transaction_type='withdrawal', status='pending', payment_method__in=providers
+        ).order_by('id')
+        if connections[using].features.has_select_for_update_skip_locked:
+            # Lets several engines claim disjoint chunks concurrently
+            pending = pending.select_for_update(skip_locked=True)
+        # Rows another engine moved since the select are left to it
+        ids = claim_ids(list(pending.values_list('id', flat=True)[:batch_size]), using)
+
+    return list(PaymentTransaction.objects.using(using).filter(id__in=ids).values(
+        'id', 'reference_id', 'amount', 'currency', 'payment_method', 'receiver_id'
+    ))
+
+def claim_withdrawals(batch_size, providers):
+    """
+    Move up to batch_size pending withdrawals to processing and return the ones
+    this call claimed. With sharding, shards are claimed from in turn, so a
+    withdrawal stored on its sender's country shard is paid like any other.
+    """
+    from api.models import PaymentMethod
+
+    rows = []
+    for alias in shard_aliases():
+        if len(rows) >= batch_size:
+            break
+        rows.extend(_claim_on(alias, batch_size - len(rows), providers))
+
+    destinations = {}
+    methods = PaymentMethod.objects.filter(
+        user_id__in={row['receiver_id'] for row in rows}, payment_type__in=providers
+    ).exclude(phone_number='').order_by('-is_default', 'id')
+    for user_id, payment_type, phone_number in methods.values_list('user_id', 'payment_type', 'phone_number'):
+        destinations.setdefault((user_id, payment_type), phone_number)
+    for row in rows:
+        row['phone_number'] = destinations.get((row['receiver_id'], row['payment_method']))
+    return rows
+
+def apply_results(results):
+    """Write final statuses in bulk: one UPDATE per outcome (and shard), then post the ledger"""
+    from api.models import PaymentTransaction
+    from .ledger import sync_ledger
+
+    by_shard = defaultdict(lambda: defaultdict(list))
+    for transaction_id, outcome, _ in results:
+        # The id names the shard the claim was made on
+        by_shard[shard_for_id(transaction_id) or DEFAULT_DB_ALIAS][outcome].append(transaction_id)
+
+    now = timezone.now()
+    totals = defaultdict(int)
+    for using, by_status in by_shard.items():
+        payments = PaymentTransaction.objects.db_manager(using)
+        with transaction.atomic(using=using):
+            for outcome, ids in by_status.items():
+                payments.filter(id__in=ids, status='processing').update(status=outcome, updated_at=now)
+                totals[outcome] += len(ids)
+            if by_status.get('completed'):
+                sync_ledger(payments.filter(id__in=by_status['completed']))
+    return dict(totals)
+
+class PayoutEngine:
+    def __init__(self, config=None):
+        self.config = config or settings.PAYOUTS
+        self.providers = self.config['PROVIDERS']
+
+    async def _pay(self, client, row):
+        if not row['phone_number']:
+            return row['id'], 'failed', 'no mobile money number on file'
+        payload = {
+            'reference': row['reference_id'],
+            'amount': str(row['amount']),
+            'currency': row['currency'],
+            'phone_number': row['phone_number'],
+        }
+        retries = self.config['RETRIES']
+        for attempt in range(retries + 1):
+            try:
+                status, body = await client.post(payload)
+                if status >= 500:
+                    raise ProviderError(f'HTTP {status}')
+                if status == 200 and body.get('status') == 'completed':
+                    return row['id'], 'completed', body.get('provider_reference', '')
+                return row['id'], 'failed', body.get('error', f'HTTP {status}')
+            except (ProviderError, OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, ValueError) as exc:
+                if attempt == retries:
+                    # Outcome unknown: leave it in processing for reconciliation
+                    logger.warning('Payout %s gave up after %d attempts: %s', row['reference_id'], attempt + 1, exc)
+                    return row['id'], 'processing', str(exc)
+                await asyncio.sleep(self.config['BACKOFF'] * (2 ** attempt))
+
+    async def run(self, max_batches=None):
+        clients = {
+            name: ProviderClient(provider['url'], provider['concurrency'], self.config['TIMEOUT'])
+            for name, provider in self.providers.items()
+        }
+        totals = defaultdict(int)
+        batches = 0
+        try:
+            while max_batches is None or batches < max_batches:
+                rows = await sync_to_async(claim_withdrawals)(self.config['BATCH_SIZE'], list(self.providers))
+                if not rows:
+                    break
+                results = await asyncio.gather(*(
+                    self._pay(clients[row['payment_method']], row) for row in rows
+                ))
+                # Unknown outcomes stay in processing; only final ones are written
+                final = [result for result in results if result[1] != 'processing']
+                for outcome, count in (await sync_to_async(apply_results)(final)).items():
+                    totals[outcome] += count
+                totals['unresolved'] += len(results) - len(final)
+                batches += 1
+        finally:
+            for client in clients.values():
+                await client.close()
+        return dict(totals)
+
+def process_payouts(max_batches=None, config=None):
+    """Synchronous entry point: drain pending withdrawals and return outcome counts"""
+    return asyncio.run(PayoutEngine(config).run(max_batches=max_batches))
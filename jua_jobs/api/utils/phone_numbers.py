@@ -0,0 +1,80 @@
+"""
+Phone number normalization to E.164 (``+254712345678``).
+
+Accepts the formats partners send us - national with a trunk zero
+(``0712 345 678``), international with or without ``+`` or ``00``
+(``+254 712-345-678``, ``254712345678``, ``00254712345678``) and bare
+national numbers when the country is known - and validates the result
+against the compiled country rules in the validator registry.
+"""
+from django.core.exceptions import ValidationError
+
+from .african_validators import get_registry
+
+# Separators people type between digit groups
+_SEPARATORS = str.maketrans('', '', ' -().\t/')
+
+def _normalize(registry, value, country=None):
+    """Return (e164, None) or (None, error message)"""
+    raw = value.strip().translate(_SEPARATORS)
+    rule = registry.countries.get(country) if country else None
+    if raw.startswith('+'):
+        candidate = raw
+    elif raw.startswith('00'):
+        candidate = '+' + raw[2:]
+    elif rule is None:
+        # No usable country: only full international numbers can be understood
+        candidate = '+' + raw
+    elif raw.startswith(rule.dialing_code) and rule.pattern.match('+' + raw):
+        candidate = '+' + raw
+    elif raw.startswith('0'):
+        candidate = '+' + rule.dialing_code + raw[1:]
+    else:
+        candidate = '+' + rule.dialing_code + raw
+
+    if not candidate[1:].isdigit():
+        return None, 'Phone number may only contain digits, spaces, dashes, dots and brackets'
+    error = registry.phone_error(candidate, country if rule else None)
+    if error:
+        return None, error
+    return candidate, None
+
+def normalize_phone(value, country=None):
+    """E.164 form of ``value``; raises ValidationError if it can't be normalized"""
+    if not value:
+        return value
+    number, error = _normalize(get_registry(), value, country)
+    if error:
+        raise ValidationError(error)
+    return number
+
+def normalize_or_keep(value, country=None):
+    """E.164 form of ``value`` when it can be normalized, otherwise ``value`` unchanged"""
+    if not value:
+        return value
+    number, _ = _normalize(get_registry(), value, country)
+    return number or value
+
+def normalize_many(values, countries=None):
+    """
+    Normalize a batch of numbers. ``countries`` is None, one country code for
+    every number, or an iterable of codes aligned with ``values``. Returns a
+    list of (e164 or None, error or None) in input order.
+    """
+    registry = get_registry()
+    if countries is None or isinstance(countries, str):
+        pairs = ((value, countries) for value in values)
+    else:
+        pairs = zip(values, countries)
+
+    return [
+        _normalize(registry, value, country) if value else (None, 'Phone number is required')
+        for value, country in pairs
+    ]
+
+def country_for_number(number):
+    """Country code of a normalized number, or None"""
+    for rule in get_registry().rules_for_number(number):
+        if rule.pattern.match(number):
+            return rule.code
+    return None
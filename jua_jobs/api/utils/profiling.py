@@ -0,0 +1,153 @@
+"""
+Request profiling with cProfile.
+
+ProfilingMiddleware (api/middleware.py) runs a request under the profiler
+when a staff user asks for it with the X-Profile header or ?profile=1, and
+for a random PROFILING['SAMPLE_RATE'] share of all requests. Each run is
+stored as a RequestProfile with:
+
+- the pstats dump (open the admin download with ``python -m pstats`` or snakeviz);
+- a top-functions report;
+- every query's SQL (no parameters), time and the project line that ran it.
+
+hot_paths() merges the sampled profiles per view for the profile_report command.
+"""
+import cProfile
+import io
+import logging
+import marshal
+import os
+import pstats
+import sys
+import time
+
+from django.conf import settings
+
+from .query_stats import QueryStats, track_queries
+
+logger = logging.getLogger('api')
+
+ON_DEMAND = 'on_demand'
+SAMPLED = 'sampled'
+
+# Frames from these files are instrumentation, not the code that issued a query
+_SKIPPED_FILES = (__file__, sys.modules[QueryStats.__module__].__file__)
+
+def project_caller():
+    """'api/views.py:123 in list' for the innermost project frame on the stack, or ''"""
+    base = str(settings.BASE_DIR)
+    frame = sys._getframe(1)
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if filename.startswith(base) and 'site-packages' not in filename and filename not in _SKIPPED_FILES:
+            return f'{os.path.relpath(filename, base)}:{frame.f_lineno} in {frame.f_code.co_name}'
+        frame = frame.f_back
+    return ''
+
+class QueryTimeline(QueryStats):
+    """QueryStats that also keeps the first ``limit`` queries' SQL, time and calling line"""
+
+    def __init__(self, limit):
+        super().__init__()
+        self.limit = limit
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        before = self.duration
+        try:
+            return super().__call__(execute, sql, params, many, context)
+        finally:
+            if len(self.queries) < self.limit:
+                self.queries.append({
+                    'sql': sql,
+                    'duration_ms': round((self.duration - before) * 1000, 3),
+                    'caller': project_caller(),
+                })
+
+class StoredStats:
+    """A saved pstats dump in the shape pstats.Stats() and Stats.add() accept"""
+
+    def __init__(self, data):
+        self.stats = marshal.loads(bytes(data))
+
+    def create_stats(self):
+        pass
+
+def format_stats(stats, limit):
+    stream = io.StringIO()
+    stats.stream = stream
+    stats.sort_stats('cumulative').print_stats(limit)
+    return stream.getvalue()
+
+def profile_request(get_response, request, trigger):
+    """
+    Run ``get_response(request)`` under cProfile and store a RequestProfile.
+    Returns (response, profile); profile is None if the profiler was busy
+    (e.g. under coverage) or the row couldn't be saved.
+    """
+    from api.models import RequestProfile
+
+    config = settings.PROFILING
+    profiler = cProfile.Profile()
+    timeline = QueryTimeline(config['MAX_QUERIES'])
+    try:
+        profiler.enable()
+    except ValueError:
+        logger.warning('Another profiler is active; serving %s unprofiled', request.path)
+        return get_response(request), None
+
+    start = time.perf_counter()
+    try:
+        with track_queries(timeline):
+            response = get_response(request)
+    finally:
+        profiler.disable()
+    duration_ms = (time.perf_counter() - start) * 1000
+
+    stats = pstats.Stats(profiler)
+    match = request.resolver_match
+    user = getattr(request, 'user', None)
+    try:
+        profile = RequestProfile.objects.create(
+            method=request.method,
+            path=request.get_full_path()[:500],
+            view=(match.url_name or '') if match is not None else '',
+            user=user if user is not None and user.is_authenticated else None,
+            trigger=trigger,
+            status_code=response.status_code,
+            duration_ms=duration_ms,
+            query_count=timeline.count,
+            db_ms=timeline.duration_ms,
+            stats=marshal.dumps(stats.stats),
+            report=format_stats(stats, config['TOP_FUNCTIONS']),
+            queries=timeline.queries,
+        )
+    except Exception:
+        logger.exception('Could not store the profile of %s', request.path)
+        profile = None
+    return response, profile
+
+def hot_paths(profiles, limit=20):
+    """
+    Merge sampled profiles per view. Yields (view, samples, mean ms, mean
+    queries, report of the ``limit`` hottest functions by cumulative time),
+    views with the most sampled time first.
+    """
+    by_view = {}
+    for profile in profiles.only('view', 'duration_ms', 'query_count', 'stats').iterator(chunk_size=100):
+        entry = by_view.get(profile.view)
+        if entry is None:
+            by_view[profile.view] = entry = [pstats.Stats(StoredStats(profile.stats)), 0, 0.0, 0]
+        else:
+            entry[0].add(StoredStats(profile.stats))
+        entry[1] += 1
+        entry[2] += profile.duration_ms
+        entry[3] += profile.query_count
+
+    rows = [
+        (view, samples, total_ms / samples, queries / samples, stats)
+        for view, (stats, samples, total_ms, queries) in by_view.items()
+    ]
+    rows.sort(key=lambda row: row[1] * row[2], reverse=True)
+    for view, samples, mean_ms, mean_queries, stats in rows:
+        yield view, samples, mean_ms, mean_queries, format_stats(stats, limit)
@@ -0,0 +1,109 @@
+"""
+Local stand-in for the mobile-money payout APIs, for offline benchmarking.
+
+Speaks just enough HTTP/1.1 (keep-alive, Content-Length bodies) to serve
+``POST /<provider>/payouts`` with a JSON body containing ``reference``.
+Latency and failure behaviour are configurable; replays of a reference
+return the original outcome, like a real provider's idempotency.
+"""
+import asyncio
+import json
+import random
+import uuid
+
+class ProviderSimulator:
+    def __init__(self, latency_ms=50, jitter_ms=20, failure_rate=0.02, error_rate=0.01, seed=None):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.failure_rate = failure_rate  # Business declines: final, not retried
+        self.error_rate = error_rate  # 503s: transient, retried by the engine
+        self.random = random.Random(seed)
+        self.outcomes = {}
+        self.stats = {'requests': 0, 'completed': 0, 'failed': 0, 'errors': 0, 'replays': 0}
+        self.server = None
+        self._connections = set()
+
+    async def start(self, host='127.0.0.1', port=8765):
+        self.server = await asyncio.start_server(self._handle_connection, host, port)
+        return self.server.sockets[0].getsockname()[1]
+
+    async def serve_forever(self):
+        async with self.server:
+            await self.server.serve_forever()
+
+    async def stop(self, grace=1.0):
+        self.server.close()
+        if self._connections:
+            # Give clients a moment to hang up, then drop whatever is left
+            _, lingering = await asyncio.wait(self._connections, timeout=grace)
+            for task in lingering:
+                task.cancel()
+            await asyncio.gather(*lingering, return_exceptions=True)
+        await self.server.wait_closed()
+
+    async def _handle_connection(self, reader, writer):
+        task = asyncio.current_task()
+        self._connections.add(task)
+        try:
+            while True:
+                request = await self._read_request(reader)
+                if request is None:
+                    break
+                status, body = await self._respond(*request)
+                payload = json.dumps(body).encode()
+                writer.write(
+                    f'HTTP/1.1 {status} {"OK" if status == 200 else "Error"}\r\n'
+                    f'Content-Type: application/json\r\n'
+                    f'Content-Length: {len(payload)}\r\n'
+                    f'Connection: keep-alive\r\n\r\n'.encode() + payload
+                )
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.CancelledError):
+            # Client hung up, or stop() is shutting the connection down
+            pass
+        finally:
+            self._connections.discard(task)
+            writer.close()
+
+    async def _read_request(self, reader):
+        request_line = await reader.readline()
+        if not request_line:
+            return None
+        method, path, _ = request_line.decode().split(' ', 2)
+        length = 0
+        while True:
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode().partition(':')
+            if name.strip().lower() == 'content-length':
+                length = int(value.strip())
+        body = await reader.readexactly(length) if length else b''
+        return method, path, body
+
+    async def _respond(self, method, path, body):
+        self.stats['requests'] += 1
+        if method != 'POST' or not path.endswith('/payouts'):
+            return 404, {'error': 'not found'}
+        try:
+            reference = json.loads(body)['reference']
+        except (ValueError, KeyError):
+            return 400, {'error': 'reference is required'}
+
+        delay = max(0.0, self.random.gauss(self.latency_ms, self.jitter_ms)) / 1000
+        await asyncio.sleep(delay)
+
+        if reference in self.outcomes:
+            self.stats['replays'] += 1
+            return 200, self.outcomes[reference]
+        if self.random.random() < self.error_rate:
+            self.stats['errors'] += 1
+            return 503, {'error': 'provider temporarily unavailable'}
+        if self.random.random() < self.failure_rate:
+            outcome = {'status': 'failed', 'error': 'declined by provider'}
+            self.stats['failed'] += 1
+        else:
+            outcome = {'status': 'completed', 'provider_reference': uuid.uuid4().hex[:12].upper()}
+            self.stats['completed'] += 1
+        self.outcomes[reference] = outcome
+        return 200, outcome
@@ -0,0 +1,72 @@
+"""
+Query instrumentation through ``connection.execute_wrapper``.
+
+Unlike ``connection.queries`` this works with DEBUG off and keeps no SQL
+text beyond one counter per query shape. track_queries() installs a
+QueryStats wrapper on every database connection of the current thread for
+the duration of a block. QueryInstrumentationMiddleware (api/middleware.py),
+the slow query log (api/utils/slow_queries.py) and
+PerformanceMonitor.log_query_count (api/utils/caching.py) are built on it.
+"""
+import contextlib
+import re
+import time
+from collections import Counter
+
+from django.db import connections
+
+# Literals left in the SQL text, and IN lists whose length varies with the data
+_IN_LIST = re.compile(r'\bIN \((?:%s|\?)(?:, (?:%s|\?))*\)', re.IGNORECASE)
+_NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_SPACE = re.compile(r'\s+')
+
+def sql_shape(sql):
+    """``sql`` with literals and IN-list lengths erased, so repeats of one query compare equal"""
+    shape = _STRING.sub('?', sql)
+    shape = _NUMBER.sub('?', shape)
+    shape = _IN_LIST.sub('IN (...)', shape)
+    return _SPACE.sub(' ', shape).strip()
+
+class QueryStats:
+    """
+    Count, total time and per-shape repeats of the queries run through it.
+    With ``slow_ms``, queries taking at least that long are also kept in
+    ``slow`` as (alias, sql, params, many, ms) for the slow query log.
+    """
+
+    def __init__(self, slow_ms=None):
+        self.count = 0
+        self.duration = 0.0
+        self.shapes = Counter()
+        self.slow_ms = slow_ms
+        self.slow = []
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - start
+            self.duration += elapsed
+            self.count += 1
+            self.shapes[sql_shape(sql)] += 1
+            if self.slow_ms is not None and elapsed * 1000 >= self.slow_ms:
+                self.slow.append((context['connection'].alias, sql, params, many, elapsed * 1000))
+
+    @property
+    def duration_ms(self):
+        return self.duration * 1000
+
+    def duplicates(self, threshold=2):
+        """[(shape, times)] for shapes run at least ``threshold`` times, most repeated first"""
+        return [(shape, times) for shape, times in self.shapes.most_common() if times >= threshold]
+
+@contextlib.contextmanager
+def track_queries(stats=None):
+    """Record every query run on this thread's connections inside the block"""
+    stats = stats if stats is not None else QueryStats()
+    with contextlib.ExitStack() as stack:
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(stats))
+        yield stats
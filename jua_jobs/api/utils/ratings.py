@@ -0,0 +1,172 @@
+"""
+Per-user rating summaries (UserRatingSummary), kept up to date from Review
+saves and deletes (see api/signals.py).
+
+Summaries are stored on ``default`` only, including when the reviews are on a
+country shard (see api/utils/sharding.py). In that case the review and its
+summary update are two separate transactions. A failure between them leaves
+the summary out of step until reconcile_rating_summaries() runs.
+Sharded querysets load summaries with with_rating_summaries(), because a join
+on a shard finds no summary rows. reconcile_rating_summaries() adds up the
+reviews from every shard.
+"""
+import heapq
+import itertools
+from operator import itemgetter
+
+from django.db import IntegrityError, router, transaction
+from django.db.models import Count, F, Max, Prefetch, Q, Subquery, Sum
+from django.db.models.functions import Coalesce, Greatest
+
+from .sharding import fan_out, is_sharded, sharding_enabled
+
+RATING_VALUES = range(1, 6)
+
+def _summary_model():
+    from api.models import UserRatingSummary
+    return UserRatingSummary
+
+def with_rating_summaries(queryset, *users):
+    """
+    ``queryset`` with the rating summaries of the ``users`` relations loaded.
+    They are joined in, or prefetched with one query per relation when
+    the rows are on a shard.
+    """
+    UserRatingSummary = _summary_model()
+    lookups = [f'{user}__rating_summary' for user in users]
+    if not sharding_enabled() or not is_sharded(queryset.model):
+        return queryset.select_related(*lookups)
+    summaries = UserRatingSummary.objects.using(router.db_for_read(UserRatingSummary))
+    return queryset.select_related(*users).prefetch_related(
+        *(Prefetch(lookup, queryset=summaries) for lookup in lookups)
+    )
+
+def record_review_added(user_id, rating, reviewed_at):
+    """Add one review to a user's rating summary, creating the row on first review"""
+    UserRatingSummary = _summary_model()
+    updates = {
+        'review_count': F('review_count') + 1,
+        'rating_sum': F('rating_sum') + rating,
+        f'rating_{rating}': F(f'rating_{rating}') + 1,
+    }
+    if reviewed_at is not None:
+        updates['last_review_at'] = Greatest(Coalesce('last_review_at', reviewed_at), reviewed_at)
+
+    with transaction.atomic():
+        if UserRatingSummary.objects.filter(user_id=user_id).update(**updates):
+            return
+        try:
+            with transaction.atomic():
+                UserRatingSummary.objects.create(
+                    user_id=user_id,
+                    review_count=1,
+                    rating_sum=rating,
+                    last_review_at=reviewed_at,
+                    **{f'rating_{rating}': 1}
+                )
+        except IntegrityError:
+            # Another writer created the row first
+            UserRatingSummary.objects.filter(user_id=user_id).update(**updates)
+
+def record_review_removed(user_id, rating):
+    """Remove one review from a user's rating summary"""
+    from api.models import Review
+    UserRatingSummary = _summary_model()
+
+    latest = Review.objects.filter(reviewee_id=user_id).order_by('-created_at').values('created_at')[:1]
+    # No get_or_create here: during a cascade delete of the user the row is already gone
+    UserRatingSummary.objects.filter(user_id=user_id).update(
+        review_count=F('review_count') - 1,
+        rating_sum=F('rating_sum') - rating,
+        last_review_at=Subquery(latest),
+        **{f'rating_{rating}': F(f'rating_{rating}') - 1}
+    )
+
+def _aggregate_reviews():
+    from api.models import Review
+    annotations = {
+        'review_count': Count('id'),
+        'rating_sum': Sum('rating'),
+        'last_review_at': Max('created_at'),
+    }
+    for rating in RATING_VALUES:
+        annotations[f'rating_{rating}'] = Count('id', filter=Q(rating=rating))
+    return Review.objects.order_by().values('reviewee_id').annotate(**annotations).order_by('reviewee_id')
+
+SUMMARY_FIELDS = ['review_count', 'rating_sum'] + [f'rating_{r}' for r in RATING_VALUES] + ['last_review_at']
+
+def _reviewee_totals(chunk_size):
+    """_aggregate_reviews() rows, summed across shards, in reviewee_id order"""
+    shards = [queryset.iterator(chunk_size=chunk_size) for queryset in fan_out(_aggregate_reviews())]
+    if len(shards) == 1:
+        yield from shards[0]
+        return
+    merged = heapq.merge(*shards, key=itemgetter('reviewee_id'))
+    for _reviewee_id, rows in itertools.groupby(merged, key=itemgetter('reviewee_id')):
+        total = dict(next(rows))
+        for row in rows:
+            for field in SUMMARY_FIELDS[:-1]:
+                total[field] += row[field]
+            total['last_review_at'] = max(total['last_review_at'], row['last_review_at'])
+        yield total
+
+def reconcile_rating_summaries(dry_run=False, chunk_size=1000):
+    """
+    Recompute rating summaries from Review and repair any drift.
+
+    Returns a dict with counts of checked, created, updated and reset summaries.
+    """
+    from api.models import Review
+    UserRatingSummary = _summary_model()
+    stats = {'checked': 0, 'created': 0, 'updated': 0, 'reset': 0}
+
+    def flush(rows):
+        existing = UserRatingSummary.objects.in_bulk([row['reviewee_id'] for row in rows])
+        to_create, to_update = [], []
+        for row in rows:
+            summary = existing.get(row['reviewee_id'])
+            if summary is None:
+                to_create.append(UserRatingSummary(
+                    user_id=row['reviewee_id'],
+                    **{field: row[field] for field in SUMMARY_FIELDS}
+                ))
+            elif any(getattr(summary, field) != row[field] for field in SUMMARY_FIELDS):
+                for field in SUMMARY_FIELDS:
+                    setattr(summary, field, row[field])
+                to_update.append(summary)
+        stats['created'] += len(to_create)
+        stats['updated'] += len(to_update)
+        if not dry_run:
+            UserRatingSummary.objects.bulk_create(to_create, batch_size=chunk_size)
+            UserRatingSummary.objects.bulk_update(to_update, SUMMARY_FIELDS, batch_size=chunk_size)
+
+    reviewed = set()
+    batch = []
+    for row in _reviewee_totals(chunk_size):
+        stats['checked'] += 1
+        if sharding_enabled():
+            reviewed.add(row['reviewee_id'])
+        batch.append(row)
+        if len(batch) >= chunk_size:
+            flush(batch)
+            batch = []
+    if batch:
+        flush(batch)
+
+    # Summaries left over for users whose reviews have all gone
+    orphans = UserRatingSummary.objects.filter(review_count__gt=0)
+    if sharding_enabled():
+        # The reviews are on other databases, so no subquery can see them all
+        orphans = orphans.filter(
+            pk__in=[pk for pk in orphans.values_list('pk', flat=True).iterator() if pk not in reviewed]
+        )
+    else:
+        orphans = orphans.exclude(user_id__in=Review.objects.values('reviewee_id'))
+    if dry_run:
+        stats['reset'] = orphans.count()
+    else:
+        stats['reset'] = orphans.update(
+            review_count=0, rating_sum=0, last_review_at=None,
+            **{f'rating_{r}': 0 for r in RATING_VALUES}
+        )
+    return stats
@@ -0,0 +1,208 @@
+"""
+Reconciliation of mobile-money statement exports against PaymentTransaction.
+
+Statements are parsed row by row and matched in chunks, so memory stays flat
+however long the file is: each chunk costs one lookup query plus, when
+corrections are applied, one UPDATE per target status. With sharding, the
+lookup and the corrections run on every shard in turn.
+"""
+import csv
+import io
+import time
+from collections import defaultdict
+from decimal import Decimal, InvalidOperation
+
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .sharding import fan_out, shard_for_id
+
+REFERENCE_COLUMNS = ('reference_id', 'reference', 'transaction_reference', 'ref')
+AMOUNT_COLUMNS = ('amount', 'transaction_amount')
+STATUS_COLUMNS = ('status', 'transaction_status')
+CURRENCY_COLUMNS = ('currency',)
+
+# Provider vocabularies mapped onto PaymentTransaction statuses
+STATUS_ALIASES = {
+    'completed': 'completed', 'complete': 'completed', 'success': 'completed',
+    'successful': 'completed', 'paid': 'completed', 'settled': 'completed',
+    'failed': 'failed', 'failure': 'failed', 'declined': 'failed', 'rejected': 'failed', 'reversed': 'failed',
+    'pending': 'pending', 'queued': 'pending',
+    'processing': 'processing', 'in_progress': 'processing',
+    'cancelled': 'cancelled', 'canceled': 'cancelled',
+}
+
+# Only final provider outcomes overwrite our status
+CORRECTABLE_STATUSES = {'completed', 'failed'}
+
+def _column(header, candidates):
+    for name in candidates:
+        if name in header:
+            return header.index(name)
+    return None
+
+def parse_statement(lines):
+    """
+    Yield (line_number, reference, amount, status, currency, error) for each
+    row of a statement CSV. ``lines`` is any iterable of text lines.
+    """
+    reader = csv.reader(lines)
+    try:
+        header = [name.strip().lower() for name in next(reader)]
+    except StopIteration:
+        return
+    reference_col = _column(header, REFERENCE_COLUMNS)
+    amount_col = _column(header, AMOUNT_COLUMNS)
+    if reference_col is None or amount_col is None:
+        raise ValueError('Statement needs a reference and an amount column')
+    status_col = _column(header, STATUS_COLUMNS)
+    currency_col = _column(header, CURRENCY_COLUMNS)
+
+    for row in reader:
+        line = reader.line_num
+        if not row:
+            continue
+        try:
+            reference = row[reference_col].strip()
+            amount = Decimal(row[amount_col].strip().replace(',', ''))
+        except (IndexError, InvalidOperation):
+            yield line, None, None, None, None, 'unparseable row'
+            continue
+        raw_status = row[status_col].strip().lower() if status_col is not None and status_col < len(row) else ''
+        status = STATUS_ALIASES.get(raw_status) if raw_status else None
+        currency = row[currency_col].strip().upper() if currency_col is not None and currency_col < len(row) else None
+        if not reference:
+            yield line, None, None, None, None, 'missing reference'
+        elif raw_status and status is None:
+            yield line, reference, amount, None, currency, f'unknown status {raw_status!r}'
+        else:
+            yield line, reference, amount, status, currency, None
+
+def open_statement(uploaded_file):
+    """Text line iterator over an uploaded (binary) statement file"""
+    return io.TextIOWrapper(uploaded_file, encoding='utf-8-sig', newline='')
+
+class StatementReconciler:
+    """
+    Match statement rows to transactions by reference and amount.
+
+    Every mismatch is passed to ``on_mismatch`` as a dict with ``line``,
+    ``reference``, ``type`` (missing, amount_drift, currency_drift,
+    status_drift or invalid) and the two sides' values; the first
+    ``sample_size`` are also kept in the report. With ``apply``, status
+    drifts towards a final provider outcome are corrected in bulk and the
+    ledger is synced for the affected transactions.
+    """
+
+    def __init__(self, apply=False, chunk_size=5000, on_mismatch=None, sample_size=100):
+        self.apply = apply
+        self.chunk_size = chunk_size
+        self.on_mismatch = on_mismatch
+        self.sample_size = sample_size
+        self.counts = defaultdict(int)
+        self.samples = []
+
+    def _mismatch(self, **mismatch):
+        self.counts[mismatch['type']] += 1
+        if len(self.samples) < self.sample_size:
+            self.samples.append(mismatch)
+        if self.on_mismatch:
+            self.on_mismatch(mismatch)
+
+    def _reconcile_chunk(self, chunk):
+        from api.models import PaymentTransaction
+
+        references = [row[1] for row in chunk]
+        found = {}
+        matches = PaymentTransaction.objects.filter(
+            Q(reference_id__in=references) | Q(legacy_reference_id__in=references)
+        ).values('id', 'reference_id', 'legacy_reference_id', 'amount', 'currency', 'status')
+        for shard_matches in fan_out(matches):
+            for payment in shard_matches:
+                found[payment['reference_id']] = payment
+                if payment['legacy_reference_id']:
+                    found[payment['legacy_reference_id']] = payment
+
+        corrections = defaultdict(list)
+        for line, reference, amount, status, currency, _ in chunk:
+            payment = found.get(reference)
+            if payment is None:
+                self._mismatch(line=line, reference=reference, type='missing', statement=str(amount), ours=None)
+                continue
+            self.counts['matched'] += 1
+            if amount != payment['amount']:
+                self._mismatch(line=line, reference=reference, type='amount_drift',
+                               statement=str(amount), ours=str(payment['amount']))
+                continue
+            if currency and currency != payment['currency']:
+                self._mismatch(line=line, reference=reference, type='currency_drift',
+                               statement=currency, ours=payment['currency'])
+                continue
+            if status and status != payment['status']:
+                self._mismatch(line=line, reference=reference, type='status_drift',
+                               statement=status, ours=payment['status'])
+                if status in CORRECTABLE_STATUSES:
+                    corrections[status].append(payment['id'])
+
+        if self.apply and corrections:
+            self.counts['corrected'] += self._apply(corrections)
+
+    def _apply(self, corrections):
+        from api.models import PaymentTransaction
+        from .ledger import sync_ledger
+
+        by_shard = defaultdict(lambda: defaultdict(list))
+        for status, ids in corrections.items():
+            for payment_id in ids:
+                by_shard[shard_for_id(payment_id) or DEFAULT_DB_ALIAS][status].append(payment_id)
+
+        corrected = 0
+        now = timezone.now()
+        for using, by_status in by_shard.items():
+            payments = PaymentTransaction.objects.db_manager(using)
+            with transaction.atomic(using=using):
+                for status, ids in by_status.items():
+                    corrected += payments.filter(id__in=ids).exclude(status=status).update(
+                        status=status, updated_at=now
+                    )
+                # update() skips signals, so post (or reverse) ledger entries here
+                sync_ledger(payments.filter(
+                    id__in=[payment_id for ids in by_status.values() for payment_id in ids]
+                ))
+        return corrected
+
+    def run(self, lines):
+        started = time.monotonic()
+        rows = 0
+        chunk = []
+        for parsed in parse_statement(lines):
+            rows += 1
+            line, reference, amount, status, currency, error = parsed
+            if error:
+                self._mismatch(line=line, reference=reference, type='invalid', statement=error, ours=None)
+                continue
+            chunk.append(parsed)
+            if len(chunk) >= self.chunk_size:
+                self._reconcile_chunk(chunk)
+                chunk = []
+        if chunk:
+            self._reconcile_chunk(chunk)
+
+        elapsed = time.monotonic() - started
+        return {
+            'rows': rows,
+            'matched': self.counts['matched'],
+            'mismatches': {
+                kind: self.counts[kind]
+                for kind in ('missing', 'amount_drift', 'currency_drift', 'status_drift', 'invalid')
+            },
+            'corrected': self.counts['corrected'],
+            'applied': self.apply,
+            'seconds': round(elapsed, 3),
+            'rows_per_second': round(rows / elapsed) if elapsed else rows,
+            'samples': self.samples,
+        }
+
+def reconcile_statement(lines, apply=False, chunk_size=5000, on_mismatch=None, sample_size=100):
+    return StatementReconciler(apply, chunk_size, on_mismatch, sample_size).run(lines)
@@ -0,0 +1,160 @@
+"""
+JWT revocation keyed on the token's ``jti``.
+
+Revoked ids are stored in the RevokedToken table (primary key = jti) until the
+token would have expired anyway, then pruned. Each process fronts the table
+with a Bloom filter, so the common case - a token that was never revoked - is
+answered in memory without a query, and only filter hits are confirmed with a
+primary key lookup. The filter is topped up with ids revoked since the last
+sync at most every SYNC_INTERVAL seconds, and rebuilt every REBUILD_INTERVAL
+seconds so pruned ids stop taking up bits.
+
+Another process's revocation is therefore seen up to SYNC_INTERVAL seconds
+late by access token checks. Refresh token reuse is always caught: revoking
+is an INSERT on the primary key, and a second revocation of the same jti fails.
+"""
+import hashlib
+import math
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db import IntegrityError, transaction
+from django.dispatch import receiver
+from django.utils import timezone
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import datetime_from_epoch
+
+# Rows committed slightly out of revoked_at order are picked up by re-reading this window
+SYNC_OVERLAP = timedelta(seconds=5)
+
+class BloomFilter:
+    """Fixed-size Bloom filter over strings (double hashing of one blake2b digest)"""
+
+    def __init__(self, capacity, error_rate=0.001):
+        self.size = max(64, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, value):
+        digest = hashlib.blake2b(value.encode(), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], 'little')
+        step = int.from_bytes(digest[8:], 'little') | 1
+        size = self.size
+        for i in range(self.hashes):
+            yield (first + i * step) % size
+
+    def add(self, value):
+        bits = self.bits
+        for position in self._positions(value):
+            bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, value):
+        bits = self.bits
+        return all(bits[position >> 3] & (1 << (position & 7)) for position in self._positions(value))
+
+class RevocationStore:
+    """Process-local view of RevokedToken: Bloom filter in front, table behind"""
+
+    def __init__(self, capacity=1_000_000, error_rate=0.001, sync_interval=1, rebuild_interval=3600):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.sync_interval = sync_interval
+        self.rebuild_interval = rebuild_interval
+        self.bloom = None
+        self.watermark = None
+        self.synced_at = 0
+        self.built_at = 0
+        self._lock = threading.Lock()
+
+    def _rebuild(self):
+        from api.models import RevokedToken
+        watermark = timezone.now() - SYNC_OVERLAP
+        live = RevokedToken.objects.filter(expires_at__gt=timezone.now())
+        # Size for twice the live set so the error rate holds until the next rebuild
+        bloom = BloomFilter(max(self.capacity, 2 * live.count()), self.error_rate)
+        for jti in live.values_list('jti', flat=True).iterator(chunk_size=10000):
+            bloom.add(jti)
+        self.bloom, self.watermark = bloom, watermark
+
+    def _sync(self):
+        from api.models import RevokedToken
+        watermark = timezone.now() - SYNC_OVERLAP
+        for jti in RevokedToken.objects.filter(revoked_at__gte=self.watermark).values_list('jti', flat=True):
+            self.bloom.add(jti)
+        self.watermark = watermark
+
+    def refresh(self, force=False):
+        """Bring the filter up to date if the sync interval has passed"""
+        now = time.monotonic()
+        if not force and self.bloom is not None and now - self.synced_at < self.sync_interval:
+            return
+        with self._lock:
+            if not force and self.bloom is not None and now - self.synced_at < self.sync_interval:
+                return
+            if force or self.bloom is None or now - self.built_at >= self.rebuild_interval:
+                self._rebuild()
+                self.built_at = now
+            else:
+                self._sync()
+            self.synced_at = now
+
+    def is_revoked(self, jti):
+        from api.models import RevokedToken
+        self.refresh()
+        if jti not in self.bloom:
+            return False
+        return RevokedToken.objects.filter(pk=jti).exists()
+
+    def revoke(self, jti, expires_at):
+        """Revoke ``jti``; False if it was already revoked"""
+        from api.models import RevokedToken
+        try:
+            with transaction.atomic():
+                RevokedToken.objects.create(jti=jti, expires_at=expires_at)
+        except IntegrityError:
+            return False
+        if self.bloom is not None:
+            self.bloom.add(jti)
+        return True
+
+_store = None
+
+def get_revocation_store():
+    global _store
+    if _store is None:
+        config = settings.TOKEN_REVOCATION
+        _store = RevocationStore(
+            capacity=config['CAPACITY'],
+            error_rate=config['ERROR_RATE'],
+            sync_interval=config['SYNC_INTERVAL'],
+            rebuild_interval=config['REBUILD_INTERVAL'],
+        )
+    return _store
+
+@receiver(setting_changed)
+def reset_store(setting, **kwargs):
+    global _store
+    if setting == 'TOKEN_REVOCATION':
+        _store = None
+
+def is_token_revoked(token):
+    """Whether a validated simplejwt token has been revoked"""
+    jti = token.get(api_settings.JTI_CLAIM)
+    return bool(jti) and get_revocation_store().is_revoked(jti)
+
+def revoke_token(token):
+    """Revoke a validated simplejwt token until its expiry; False if it already was"""
+    return get_revocation_store().revoke(
+        token[api_settings.JTI_CLAIM], datetime_from_epoch(token['exp'])
+    )
+
+def prune_revoked_tokens():
+    """Delete revocations of tokens that have expired anyway"""
+    from api.models import RevokedToken
+    deleted, _ = RevokedToken.objects.filter(expires_at__lte=timezone.now()).delete()
+    return deleted
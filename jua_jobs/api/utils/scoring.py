@@ -0,0 +1,102 @@
+import heapq
+import math
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Sum
+from django.utils import timezone
+
+COMPLETED_JOB_STATUSES = ('closed', 'filled')
+
+def bayesian_scores(rating_sums, review_counts, completed_jobs, prior_mean, prior_weight, job_weight):
+    """
+    Score a batch of workers column-wise.
+
+    Each argument is a parallel list; the Bayesian average pulls workers with
+    few reviews towards the platform mean, then completed jobs add a
+    diminishing bonus.
+    """
+    return [
+        (prior_weight * prior_mean + rating_sum) / (prior_weight + count) + job_weight * math.log1p(jobs)
+        for rating_sum, count, jobs in zip(rating_sums, review_counts, completed_jobs)
+    ]
+
+def refresh_worker_scores(chunk_size=2000, top_n=None):
+    """
+    Recompute WorkerProfile.score for every profile and rebuild the
+    WorkerRanking top-N lists. Returns the number of profiles scored.
+    """
+    from api.models import Application, UserRatingSummary, WorkerProfile, WorkerRanking
+
+    config = settings.WORKER_SCORE
+    top_n = top_n or config['TOP_N']
+
+    totals = UserRatingSummary.objects.filter(user__role='worker').aggregate(
+        rating_sum=Sum('rating_sum'), review_count=Sum('review_count')
+    )
+    prior_mean = (totals['rating_sum'] / totals['review_count']) if totals['review_count'] else 0
+
+    completed = dict(
+        Application.objects.filter(status='accepted', job__status__in=COMPLETED_JOB_STATUSES)
+        .order_by().values('worker_id').annotate(jobs=Count('id')).values_list('worker_id', 'jobs')
+    )
+    skills_by_profile = defaultdict(list)
+    for profile_id, skill_id in WorkerProfile.skills.through.objects.values_list('workerprofile_id', 'skill_id'):
+        skills_by_profile[profile_id].append(skill_id)
+
+    rows = WorkerProfile.objects.order_by('id').values_list(
+        'id', 'user_id', 'user__country',
+        'user__rating_summary__rating_sum', 'user__rating_summary__review_count'
+    )
+    leaderboards = defaultdict(list)
+    now = timezone.now()
+    scored = 0
+
+    def flush(batch):
+        scores = bayesian_scores(
+            [row[3] or 0 for row in batch],
+            [row[4] or 0 for row in batch],
+            [completed.get(row[1], 0) for row in batch],
+            prior_mean, config['PRIOR_WEIGHT'], config['JOB_WEIGHT']
+        )
+        WorkerProfile.objects.bulk_update(
+            [WorkerProfile(id=row[0], score=score, score_updated_at=now) for row, score in zip(batch, scores)],
+            ['score', 'score_updated_at'],
+            batch_size=chunk_size
+        )
+        for row, score in zip(batch, scores):
+            profile_id, country = row[0], row[2] or ''
+            keys = [(None, '')] + [(skill_id, '') for skill_id in skills_by_profile[profile_id]]
+            if country:
+                keys += [(skill_id, country) for skill_id, _ in keys]
+            entry = (score, -profile_id)
+            for key in keys:
+                board = leaderboards[key]
+                if len(board) < top_n:
+                    heapq.heappush(board, entry)
+                elif entry > board[0]:
+                    heapq.heapreplace(board, entry)
+
+    # Keyset batches rather than a streaming cursor, since each batch writes back to the same table
+    last_id = 0
+    while True:
+        batch = list(rows.filter(id__gt=last_id)[:chunk_size])
+        if not batch:
+            break
+        flush(batch)
+        scored += len(batch)
+        last_id = batch[-1][0]
+
+    rankings = []
+    for (skill_id, country), board in leaderboards.items():
+        for rank, (score, negative_id) in enumerate(sorted(board, reverse=True), start=1):
+            rankings.append(WorkerRanking(
+                skill_id=skill_id, country=country, rank=rank, profile_id=-negative_id, score=score
+            ))
+    # Swap the lists atomically so readers never see a half-built leaderboard
+    with transaction.atomic():
+        WorkerRanking.objects.all().delete()
+        WorkerRanking.objects.bulk_create(rankings, batch_size=chunk_size)
+
+    return scored
@@ -0,0 +1,279 @@
+"""
+Country sharding of the job graph.
+
+With SHARDING['ENABLED'], a job is stored on the database alias its country
+maps to in SHARDING['SHARDS'] (unmapped countries stay on ``default``), and
+everything that hangs off a job lives with it: required skills, applications,
+reviews, participation rows, payments and their ledger entries. Foreign keys
+and joins therefore never leave a shard. Users, skills and categories are
+copied to every shard when saved (see api/signals.py) so sharded rows can
+reference them.
+
+After migrate, each shard's primary keys start at ``index * ID_SPAN``, so an id
+alone names its shard. Detail lookups and job-scoped writes route with
+shard_for_id() without a directory lookup. Queries with nothing better to go
+on use the requesting user's country, which is where their local jobs live.
+The rare global questions (e.g. platform_stats), and a user's own
+applications, payments and reviews, which follow jobs in any country, fan out
+to every shard and merge the results.
+"""
+import contextlib
+import contextvars
+import copy
+import functools
+import heapq
+import itertools
+import logging
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+logger = logging.getLogger('api')
+
+# Stored together, on the job's (or for jobless payments, the sender's) shard
+SHARDED_MODELS = frozenset({
+    'api.jobposting', 'api.jobposting_required_skills', 'api.application', 'api.review',
+    'api.jobparticipation', 'api.paymenttransaction', 'api.ledgerentry',
+})
+# Copied to every shard so sharded rows can reference and join them
+REFERENCE_MODELS = frozenset({'api.user', 'api.skill', 'api.category'})
+
+# Fields naming the sharded parent a new row belongs with
+PARENT_ID_FIELDS = ('job_id', 'jobposting_id', 'transaction_id')
+
+_shard = contextvars.ContextVar('shard', default=None)
+_request = contextvars.ContextVar('shard_request', default=None)
+
+def sharding_enabled():
+    return settings.SHARDING['ENABLED']
+
+def is_shard(alias):
+    """Whether ``alias`` is a configured shard (migrated even while sharding is off)"""
+    return alias in settings.SHARDING['SHARDS']
+
+def is_sharded(model):
+    return model._meta.label_lower in SHARDED_MODELS
+
+def is_reference(model):
+    return model._meta.label_lower in REFERENCE_MODELS
+
+def shard_aliases():
+    """Every alias holding sharded rows, ``default`` first; just ``default`` while sharding is off"""
+    if not sharding_enabled():
+        return [DEFAULT_DB_ALIAS]
+    return [DEFAULT_DB_ALIAS, *settings.SHARDING['SHARDS']]
+
+def shard_for_country(country):
+    for alias, countries in settings.SHARDING['SHARDS'].items():
+        if country in countries:
+            return alias
+    return DEFAULT_DB_ALIAS
+
+def shard_for_id(pk):
+    """Alias holding the sharded row with primary key ``pk``; None (router's choice) while sharding is off"""
+    if not sharding_enabled() or pk is None:
+        return None
+    try:
+        index = int(pk) // settings.SHARDING['ID_SPAN']
+    except (TypeError, ValueError):
+        return None
+    aliases = shard_aliases()
+    return aliases[index] if 0 <= index < len(aliases) else DEFAULT_DB_ALIAS
+
+@contextlib.contextmanager
+def use_shard(alias):
+    """Send sharded queries that carry no better hint to ``alias`` (no-op for None)"""
+    token = _shard.set(alias) if alias else None
+    try:
+        yield
+    finally:
+        if token is not None:
+            _shard.reset(token)
+
+def begin_request(request):
+    return _request.set(request)
+
+def end_request(token):
+    _request.reset(token)
+
+def home_shard():
+    """The use_shard() alias, else the requesting user's country shard, else ``default``"""
+    alias = _shard.get()
+    if alias:
+        return alias
+    request = _request.get()
+    # DRF copies the authenticated (e.g. JWT) user back onto the Django request
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_authenticated:
+        return shard_for_country(user.country)
+    return DEFAULT_DB_ALIAS
+
+def shard_for_instance(instance):
+    """Shard for queries hinted with ``instance``, or None to fall back to home_shard()"""
+    if not is_sharded(type(instance)):
+        # user.job_postings and friends: a user's own jobs are on their country's shard
+        country = getattr(instance, 'country', None) if is_reference(type(instance)) else None
+        return shard_for_country(country) if country is not None else None
+    if instance.pk is not None:
+        return shard_for_id(instance.pk)
+    for field in PARENT_ID_FIELDS:
+        parent_id = getattr(instance, field, None)
+        if parent_id is not None:
+            return shard_for_id(parent_id)
+    country = getattr(instance, 'country', None)
+    return shard_for_country(country) if country else None
+
+def fan_out(queryset):
+    """``queryset`` on every shard; just ``queryset``, untouched, while sharding is off"""
+    if not sharding_enabled():
+        return [queryset]
+    return [queryset.using(alias) for alias in shard_aliases()]
+
+def count_all(queryset):
+    return sum(shard_queryset.count() for shard_queryset in fan_out(queryset))
+
+def _compare(ordering, a, b):
+    for field in ordering:
+        descending = field.startswith('-')
+        left, right = (_ordering_value(row, field.lstrip('-')) for row in (a, b))
+        if left == right:
+            continue
+        # NULLs first, as SQLite sorts them
+        if left is None or right is None:
+            result = -1 if left is None else 1
+        else:
+            result = -1 if left < right else 1
+        return -result if descending else result
+    return 0
+
+def _ordering_value(row, field):
+    for name in field.split('__'):
+        if row is None:
+            return None
+        row = getattr(row, 'pk' if name == 'pk' else name)
+    return row
+
+class MergedResults:
+    """
+    ``queryset`` read from every shard and merged in its ordering. Supports
+    what Paginator and serializers need: count(), len(), slicing and
+    iteration. A slice ``[start:stop]`` reads at most ``stop`` rows from each
+    shard, so deep pages cost more than with a single database.
+    """
+
+    def __init__(self, queryset):
+        self.queryset = queryset
+        self.querysets = fan_out(queryset)
+        query = queryset.query
+        ordering = query.order_by or (queryset.model._meta.ordering if query.default_ordering else ())
+        if not all(isinstance(field, str) and field != '?' for field in ordering):
+            raise ValueError('Only field orderings can be merged across shards')
+        self.ordering = list(ordering)
+
+    @property
+    def ordered(self):
+        return self.queryset.ordered
+
+    def count(self):
+        return sum(shard_queryset.count() for shard_queryset in self.querysets)
+
+    def __len__(self):
+        return self.count()
+
+    def _merge(self, stop=None):
+        shards = [shard_queryset if stop is None else shard_queryset[:stop] for shard_queryset in self.querysets]
+        if not self.ordering:
+            return itertools.chain.from_iterable(shards)
+        return heapq.merge(*shards, key=functools.cmp_to_key(functools.partial(_compare, self.ordering)))
+
+    def __iter__(self):
+        return iter(self._merge())
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            if (key.start or 0) < 0 or (key.stop or 0) < 0 or key.step not in (None, 1):
+                raise ValueError('MergedResults only supports forward slices')
+            return list(itertools.islice(self._merge(key.stop), key.start, key.stop))
+        rows = self[key:key + 1]
+        if not rows:
+            raise IndexError(key)
+        return rows[0]
+
+def merge_shards(queryset):
+    """MergedResults of ``queryset`` across every shard; ``queryset``, untouched, while sharding is off"""
+    if not sharding_enabled():
+        return queryset
+    return MergedResults(queryset)
+
+def seed_shard_ids(using):
+    """
+    Start the sharded tables on shard ``using`` at its id range. Tables already
+    past the start are left alone. Returns the number of tables seeded.
+    """
+    from django.apps import apps
+
+    if not is_shard(using):
+        return 0
+    start = (list(settings.SHARDING['SHARDS']).index(using) + 1) * settings.SHARDING['ID_SPAN']
+    connection = connections[using]
+    models = [model for model in apps.get_models(include_auto_created=True) if is_sharded(model)]
+    seeded = 0
+    with connection.cursor() as cursor:
+        for model in models:
+            table = model._meta.db_table
+            if connection.vendor == 'sqlite':
+                cursor.execute('DELETE FROM sqlite_sequence WHERE name = %s AND seq < %s', [table, start])
+                cursor.execute(
+                    'INSERT INTO sqlite_sequence (name, seq) SELECT %s, %s '
+                    'WHERE NOT EXISTS (SELECT 1 FROM sqlite_sequence WHERE name = %s)',
+                    [table, start, table]
+                )
+            elif connection.vendor == 'postgresql':
+                cursor.execute(
+                    f'SELECT setval(pg_get_serial_sequence(%s, %s), %s) '
+                    f'WHERE (SELECT COALESCE(MAX({connection.ops.quote_name(model._meta.pk.column)}), 0) '
+                    f'FROM {connection.ops.quote_name(table)}) < %s',
+                    [table, model._meta.pk.column, start, start]
+                )
+            else:
+                logger.warning('Cannot seed id ranges on %s shard %s', connection.vendor, using)
+                return seeded
+            seeded += 1
+    return seeded
+
+def _upsert(model, rows, using):
+    fields = [field for field in model._meta.concrete_fields if not field.primary_key]
+    # Copies, as bulk_create would otherwise point the callers' instances at the shard
+    model._base_manager.using(using).bulk_create(
+        [copy.copy(row) for row in rows], update_conflicts=True,
+        unique_fields=[model._meta.pk.name], update_fields=[field.name for field in fields]
+    )
+
+def replicate_reference_row(instance):
+    """Copy a saved user, skill or category to every shard (one upsert each)"""
+    for alias in shard_aliases()[1:]:
+        _upsert(type(instance), [instance], alias)
+
+def delete_reference_row(instance):
+    """Remove a deleted reference row, and what cascades from it, on every shard"""
+    for alias in shard_aliases()[1:]:
+        type(instance)._base_manager.using(alias).filter(pk=instance.pk).delete()
+
+def copy_reference_data(using, chunk_size=1000):
+    """Bring shard ``using``'s users, skills and categories in line with ``default``. Returns rows copied."""
+    from django.apps import apps
+
+    copied = 0
+    for label in sorted(REFERENCE_MODELS):
+        model = apps.get_model(label)
+        batch = []
+        for row in model._base_manager.using(DEFAULT_DB_ALIAS).order_by('pk').iterator(chunk_size=chunk_size):
+            batch.append(row)
+            if len(batch) >= chunk_size:
+                _upsert(model, batch, using)
+                copied += len(batch)
+                batch = []
+        if batch:
+            _upsert(model, batch, using)
+            copied += len(batch)
+    return copied
@@ -0,0 +1,194 @@
+"""
+Slow query log.
+
+While QueryInstrumentationMiddleware tracks a request, its QueryStats (see
+api/utils/query_stats.py) keeps every query slower than
+SLOW_QUERIES['THRESHOLD_MS']. After the response is built, the middleware
+passes them to record_slow_queries(). That step runs outside the tracked
+block, so none of its own queries count against the request. It:
+
+- captures the plan once per query shape (EXPLAIN QUERY PLAN on SQLite);
+- keeps the entries in a per-process ring buffer of BUFFER_SIZE (recent());
+- stores them as SlowQuery rows in one insert, and logs a warning for each.
+
+Parameters are redacted before they are kept:
+
+- numbers, booleans and dates stay, as do strings that are the choice value
+  of some api model field (a status, role or currency), since they show
+  which filter ran;
+- other strings, such as emails, names and search terms, become
+  '<str:length>'.
+
+top_offenders() groups the stored rows by query shape for the slow_queries
+command.
+"""
+import datetime
+import functools
+import hashlib
+import logging
+import threading
+from collections import deque
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db import DatabaseError, connections
+from django.db.models import Count, Max, Sum
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .query_stats import sql_shape
+
+logger = logging.getLogger('api')
+
+# Statements EXPLAIN can describe without running them
+_EXPLAINABLE = ('SELECT', 'WITH', 'UPDATE', 'DELETE')
+
+_lock = threading.Lock()
+_buffer = None
+
+@receiver(setting_changed)
+def reset_buffer(setting, **kwargs):
+    global _buffer
+    if setting == 'SLOW_QUERIES':
+        with _lock:
+            _buffer = None
+
+def recent():
+    """This process's most recent slow queries, newest first"""
+    with _lock:
+        return list(reversed(_buffer)) if _buffer is not None else []
+
+def _remember(entries):
+    global _buffer
+    with _lock:
+        if _buffer is None:
+            _buffer = deque(maxlen=settings.SLOW_QUERIES['BUFFER_SIZE'])
+        _buffer.extend(entries)
+
+@functools.lru_cache(maxsize=None)
+def _choice_values():
+    from django.apps import apps
+
+    values = set()
+    for model in apps.get_app_config('api').get_models():
+        for field in model._meta.get_fields():
+            for value, _label in getattr(field, 'flatchoices', None) or ():
+                if isinstance(value, str):
+                    values.add(value)
+    return frozenset(values)
+
+def redact(value):
+    """``value`` (a query parameter, or a list or dict of them) with anything personal masked"""
+    if value is None or isinstance(value, (bool, int, float)):
+        return value
+    if isinstance(value, (Decimal, datetime.date, datetime.time, datetime.timedelta)):
+        return str(value)
+    if isinstance(value, str) and value in _choice_values():
+        return value
+    if isinstance(value, (str, bytes, bytearray, memoryview)):
+        return f'<{type(value).__name__}:{len(value)}>'
+    if isinstance(value, (list, tuple)):
+        return [redact(item) for item in value]
+    if isinstance(value, dict):
+        return {key: redact(item) for key, item in value.items()}
+    return f'<{type(value).__name__}>'
+
+def explain(alias, sql, params):
+    """The plan of ``sql`` on ``alias`` as text, or '' if it can't be explained"""
+    connection = connections[alias]
+    if not connection.features.supports_explaining_query_execution:
+        return ''
+    if not sql.lstrip().upper().startswith(_EXPLAINABLE):
+        return ''
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(f'{connection.ops.explain_query_prefix()} {sql}', params)
+            rows = cursor.fetchall()
+    except DatabaseError:
+        logger.warning('Could not explain a slow query on %s', alias, exc_info=True)
+        return ''
+    # SQLite rows are (id, parent, notused, detail); PostgreSQL's are one line each
+    return '\n'.join(str(row[-1]) for row in rows)
+
+def record_slow_queries(request, queries):
+    """Log, explain, buffer and store the (alias, sql, params, many, ms) ``queries`` of ``request``"""
+    from api.models import SlowQuery
+
+    config = settings.SLOW_QUERIES
+    match = request.resolver_match
+    view = (match.url_name or '') if match is not None else ''
+    skipped = len(queries) - config['MAX_PER_REQUEST']
+    if skipped > 0:
+        logger.warning('%d more slow queries on %s not recorded', skipped, view or request.path)
+
+    plans = {}
+    entries = []
+    for alias, sql, params, many, duration_ms in queries[:config['MAX_PER_REQUEST']]:
+        shape = sql_shape(sql)
+        if config['EXPLAIN'] and not many and (alias, shape) not in plans:
+            plans[alias, shape] = explain(alias, sql, params)
+        entry = SlowQuery(
+            database=alias,
+            view=view,
+            method=request.method,
+            path=request.path[:500],
+            duration_ms=round(duration_ms, 3),
+            sql=sql,
+            shape=shape,
+            fingerprint=hashlib.sha1(shape.encode()).hexdigest(),
+            # executemany parameter lists are too long to be useful
+            params=None if many else redact(params),
+            plan=plans.get((alias, shape), ''),
+            created_at=timezone.now(),
+        )
+        entries.append(entry)
+        logger.warning(
+            'Slow query (%.1f ms) on %s %s: %s', duration_ms, request.method, view or request.path, shape,
+            extra={'view': view, 'path': request.path, 'database': alias, 'duration_ms': entry.duration_ms,
+                   'sql': shape, 'params': entry.params, 'plan': entry.plan}
+        )
+
+    _remember(entries)
+    if config['LOG_TABLE']:
+        try:
+            SlowQuery.objects.bulk_create(entries)
+        except DatabaseError:
+            logger.exception('Could not store %d slow queries', len(entries))
+
+def top_offenders(queryset, limit=10):
+    """
+    Query shapes in ``queryset`` (SlowQuery rows) with the most total time.
+    Each is a dict of fingerprint, calls, total_ms, mean_ms, max_ms, views,
+    and the latest occurrence's shape, params and plan.
+    """
+    from api.models import SlowQuery
+
+    groups = list(
+        queryset.values('fingerprint')
+        .annotate(calls=Count('id'), total_ms=Sum('duration_ms'), max_ms=Max('duration_ms'), latest_id=Max('id'))
+        .order_by('-total_ms')[:limit]
+    )
+    latest = SlowQuery.objects.in_bulk([group['latest_id'] for group in groups])
+    views = {}
+    for fingerprint, view in (
+        queryset.filter(fingerprint__in=[group['fingerprint'] for group in groups])
+        .order_by().values_list('fingerprint', 'view').distinct()
+    ):
+        views.setdefault(fingerprint, []).append(view)
+
+    offenders = []
+    for group in groups:
+        row = latest[group['latest_id']]
+        offenders.append({
+            'fingerprint': group['fingerprint'],
+            'calls': group['calls'],
+            'total_ms': group['total_ms'],
+            'mean_ms': group['total_ms'] / group['calls'],
+            'max_ms': group['max_ms'],
+            'views': sorted(views.get(group['fingerprint'], [])),
+            'shape': row.shape,
+            'params': row.params,
+            'plan': row.plan,
+        })
+    return offenders
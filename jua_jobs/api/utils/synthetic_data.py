@@ -0,0 +1,391 @@
+"""
+Seeded synthetic data at load-testing scale (the generate_data command).
+
+Every value comes from one random.Random(seed), so the same seed, counts and
+``until`` date on an empty database produce the same rows. Users are spread
+over settings.AFRICAN_COUNTRIES with matching phone numbers, cities and
+currencies. Jobs, applications, reviews and payments are spread over the
+``days`` before ``until``, each after the rows it depends on.
+
+Rows go in with bulk_create, one transaction per chunk of ``chunk_size``.
+Only ids and the few columns later rows need are kept in memory. All users
+share one password hash, computed once, and skills are linked through
+bulk inserts into the M2M tables.
+
+bulk_create doesn't send signals, so the derived tables are built with the
+same helpers their repair commands use:
+- the ledger, per payment chunk;
+- rating summaries, the participation index, and worker scores and
+  rankings, at the end.
+"""
+import contextlib
+import random
+import re
+import time
+from collections import Counter
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from django.utils import timezone
+
+from .ids import reference_id_for_datetime
+from .ledger import sync_ledger
+from .participation import rebuild_participation
+from .ratings import reconcile_rating_summaries
+from .scoring import refresh_worker_scores
+
+FIRST_NAMES = [
+    'Amina', 'Baraka', 'Chidi', 'Dineo', 'Esi', 'Faith', 'Grace', 'Hassan', 'Ifeoma', 'Juma',
+    'Kofi', 'Lerato', 'Mwangi', 'Nandi', 'Obinna', 'Precious', 'Rehema', 'Sipho', 'Tendai', 'Wanjiru',
+]
+LAST_NAMES = [
+    'Abubakar', 'Banda', 'Dlamini', 'Eze', 'Kamau', 'Kariuki', 'Mensah', 'Moyo', 'Mutua', 'Nakato',
+    'Ndlovu', 'Odhiambo', 'Okafor', 'Okello', 'Otieno', 'Mollel', 'Nkosi', 'Ssempala', 'Wekesa', 'Zulu',
+]
+CITIES = {
+    'KE': ['Nairobi', 'Mombasa', 'Kisumu', 'Nakuru', 'Eldoret'],
+    'NG': ['Lagos', 'Abuja', 'Kano', 'Ibadan', 'Port Harcourt'],
+    'ZA': ['Johannesburg', 'Cape Town', 'Durban', 'Pretoria'],
+    'UG': ['Kampala', 'Gulu', 'Mbarara', 'Jinja'],
+    'TZ': ['Dar es Salaam', 'Arusha', 'Dodoma', 'Mwanza'],
+}
+# category -> (skills, job titles)
+CATALOGUE = {
+    'Technology': (
+        ['Python', 'JavaScript', 'Django', 'React', 'Mobile Development', 'DevOps', 'SQL'],
+        ['Backend Developer', 'Frontend Developer', 'Mobile App Developer', 'Data Engineer', 'IT Support Technician'],
+    ),
+    'Design': (
+        ['UI/UX Design', 'Graphic Design', 'Illustration', 'Video Editing'],
+        ['Product Designer', 'Brand Designer', 'Video Editor'],
+    ),
+    'Marketing': (
+        ['Digital Marketing', 'Social Media', 'SEO', 'Copywriting'],
+        ['Social Media Manager', 'Marketing Assistant', 'SEO Specialist'],
+    ),
+    'Construction': (
+        ['Masonry', 'Plumbing', 'Electrical Wiring', 'Carpentry', 'Welding'],
+        ['Plumber', 'Electrician', 'Carpenter', 'Site Foreman', 'Welder'],
+    ),
+    'Hospitality': (
+        ['Cooking', 'Cleaning', 'Customer Service', 'Event Planning'],
+        ['Chef', 'Housekeeper', 'Front Desk Agent', 'Event Coordinator'],
+    ),
+    'Logistics': (
+        ['Driving', 'Warehouse Operations', 'Inventory Management', 'Motorbike Delivery'],
+        ['Delivery Rider', 'Truck Driver', 'Warehouse Assistant', 'Stock Controller'],
+    ),
+}
+REVIEW_COMMENTS = [
+    'Great work, delivered on time.', 'Good communication throughout.', 'Would hire again.',
+    'Quality was fine but it took longer than agreed.', 'Excellent attention to detail.',
+    'Paid promptly and gave clear instructions.', 'Did not meet expectations.',
+]
+AVAILABILITY = ['available', 'available', 'available', 'busy', 'part_time']
+
+# (value, weight) pairs
+JOB_STATUSES = [('active', 55), ('filled', 15), ('closed', 15), ('paused', 8), ('draft', 7)]
+APPLICATION_STATUSES = [('pending', 55), ('rejected', 35), ('withdrawn', 10)]
+PAYMENT_STATUSES = [('completed', 80), ('pending', 8), ('processing', 2), ('failed', 7), ('cancelled', 3)]
+RATINGS = [(5, 40), (4, 33), (3, 15), (2, 7), (1, 5)]
+
+# Only "+<code>[digits]\d{n}" patterns are generated; other countries get no phone number
+_PHONE_PATTERN = re.compile(r'^\^\\\+(\d+)\[([\d-]+)\]\\d\{(\d+)\}\$$')
+
+def _phone_format(pattern):
+    match = _PHONE_PATTERN.match(pattern)
+    if match is None:
+        return None
+    code, leading, digits = match.groups()
+    if '-' in leading:
+        low, high = leading.split('-')
+        leading = ''.join(str(digit) for digit in range(int(low), int(high) + 1))
+    return f'+{code}', leading, int(digits)
+
+@contextlib.contextmanager
+def _explicit_timestamps(models):
+    """Let bulk_create store the timestamps set on rows instead of auto_now(_add)'s current time"""
+    fields = [
+        field for model in models for field in model._meta.concrete_fields
+        if getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False)
+    ]
+    saved = [(field, field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+class DataGenerator:
+    """
+    Generate one dataset. ``until`` (default: today at midnight) anchors the
+    timestamps, so runs on different days differ only if it is left out.
+    ``progress`` is called with a line of text after each stage.
+    """
+
+    def __init__(self, seed=0, chunk_size=5000, password='password123', prefix='synthetic',
+                 days=365, until=None, client_share=0.2, progress=None):
+        self.rng = random.Random(seed)
+        self.chunk_size = chunk_size
+        self.password = password
+        self.prefix = prefix
+        self.until = until or timezone.now().replace(hour=0, minute=0, second=0, microsecond=0)
+        self.since = self.until - timedelta(days=days)
+        self.client_share = client_share
+        self.progress = progress or (lambda line: None)
+        self.counts = Counter()
+        self.clients = []  # (id, country)
+        self.workers = []  # (id, country)
+        self.jobs = []  # (id, poster id, created_at, salary_min, status)
+        self.accepted = []  # (job id, poster id, worker id, applied_at, salary_min)
+
+    def _choice(self, weighted):
+        return self.rng.choices([value for value, _ in weighted], [weight for _, weight in weighted])[0]
+
+    def _timestamp(self, after=None):
+        start = max(after, self.since) if after else self.since
+        return start + (self.until - start) * self.rng.random()
+
+    def _currency(self, country):
+        return settings.AFRICAN_COUNTRIES.get(country, {}).get('currency', 'USD')
+
+    def _write(self, model, rows):
+        """bulk_create ``rows`` in chunks; yields each chunk as created (with primary keys)"""
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= self.chunk_size:
+                yield self._flush(model, batch)
+                batch = []
+        if batch:
+            yield self._flush(model, batch)
+
+    def _flush(self, model, batch):
+        with transaction.atomic():
+            created = model.objects.bulk_create(batch)
+        self.counts[model._meta.model_name] += len(created)
+        return created
+
+    def _stage(self, name, started):
+        self.progress(f'{name}: {time.monotonic() - started:.1f}s')
+
+    def catalogue(self):
+        """Categories and skills (existing ones, matched by name, are reused)"""
+        from api.models import Category, Skill
+
+        Category.objects.bulk_create([Category(name=name) for name in CATALOGUE], ignore_conflicts=True)
+        Skill.objects.bulk_create([
+            Skill(name=skill, category=category)
+            for category, (skills, _) in CATALOGUE.items() for skill in skills
+        ], ignore_conflicts=True)
+        categories = dict(Category.objects.filter(name__in=CATALOGUE).values_list('name', 'id'))
+        skill_ids = dict(Skill.objects.filter(
+            name__in=[skill for skills, _ in CATALOGUE.values() for skill in skills]
+        ).values_list('name', 'id'))
+        self.categories = [
+            (categories[category], [skill_ids[skill] for skill in skills], titles)
+            for category, (skills, titles) in CATALOGUE.items()
+        ]
+
+    def users(self, count):
+        from api.models import User
+
+        password = make_password(self.password)
+        countries = sorted(settings.AFRICAN_COUNTRIES)
+        phones = {code: _phone_format(config['phone_pattern']) for code, config in settings.AFRICAN_COUNTRIES.items()}
+
+        def rows():
+            for n in range(count):
+                country = self.rng.choice(countries)
+                phone = phones[country]
+                if phone is not None:
+                    prefix, leading, digits = phone
+                    phone = f'{prefix}{self.rng.choice(leading)}{self.rng.randrange(10 ** digits):0{digits}d}'
+                yield User(
+                    email=f'{self.prefix}{n}@example.com', username=f'{self.prefix}{n}', password=password,
+                    role='client' if self.rng.random() < self.client_share else 'worker',
+                    first_name=self.rng.choice(FIRST_NAMES), last_name=self.rng.choice(LAST_NAMES),
+                    country=country, city=self.rng.choice(CITIES.get(country, [''])), phone_number=phone or '',
+                    email_verified=self.rng.random() < 0.7, phone_verified=self.rng.random() < 0.5,
+                    date_joined=self._timestamp(),
+                )
+
+        for chunk in self._write(User, rows()):
+            for user in chunk:
+                (self.clients if user.role == 'client' else self.workers).append((user.id, user.country))
+
+    def worker_profiles(self):
+        from api.models import WorkerProfile
+
+        Through = WorkerProfile.skills.through
+
+        def rows():
+            for user_id, country in self.workers:
+                _, skills, titles = self.rng.choice(self.categories)
+                created_at = self._timestamp()
+                profile = WorkerProfile(
+                    user_id=user_id, title=self.rng.choice(titles), bio='Reliable and experienced.',
+                    hourly_rate=Decimal(self.rng.randrange(300, 6000)) / 100, currency=self._currency(country),
+                    experience_years=self.rng.randrange(15), availability=self.rng.choice(AVAILABILITY),
+                    created_at=created_at, updated_at=created_at,
+                )
+                profile.skill_ids = self.rng.sample(skills, self.rng.randint(1, min(4, len(skills))))
+                yield profile
+
+        for chunk in self._write(WorkerProfile, rows()):
+            Through.objects.bulk_create([
+                Through(workerprofile_id=profile.id, skill_id=skill_id)
+                for profile in chunk for skill_id in profile.skill_ids
+            ], batch_size=self.chunk_size)
+            self.counts['workerprofile_skills'] += sum(len(profile.skill_ids) for profile in chunk)
+
+    def job_postings(self, count):
+        from api.models import JobPosting
+
+        Through = JobPosting.required_skills.through
+        employment_types = [value for value, _ in JobPosting.EMPLOYMENT_TYPE_CHOICES]
+
+        def rows():
+            for _ in range(count):
+                poster_id, country = self.rng.choice(self.clients)
+                category_id, skills, titles = self.rng.choice(self.categories)
+                created_at = self._timestamp()
+                salary_min = Decimal(self.rng.randrange(100, 3000, 50))
+                job = JobPosting(
+                    title=self.rng.choice(titles), description='Synthetic job posting for load testing.',
+                    salary_min=salary_min, salary_max=salary_min + self.rng.randrange(0, 2000, 50),
+                    employment_type=self.rng.choice(employment_types),
+                    location=self.rng.choice(CITIES.get(country, ['Remote'])), country=country,
+                    remote_work=self.rng.random() < 0.25, status=self._choice(JOB_STATUSES),
+                    posted_by_id=poster_id, category_id=category_id,
+                    created_at=created_at, updated_at=created_at,
+                    deadline=created_at + timedelta(days=self.rng.randint(7, 60)) if self.rng.random() < 0.7 else None,
+                )
+                job.skill_ids = self.rng.sample(skills, self.rng.randint(1, min(3, len(skills))))
+                yield job
+
+        for chunk in self._write(JobPosting, rows()):
+            Through.objects.bulk_create([
+                Through(jobposting_id=job.id, skill_id=skill_id) for job in chunk for skill_id in job.skill_ids
+            ], batch_size=self.chunk_size)
+            self.counts['jobposting_required_skills'] += sum(len(job.skill_ids) for job in chunk)
+            self.jobs.extend(
+                (job.id, job.posted_by_id, job.created_at, job.salary_min, job.status) for job in chunk
+            )
+
+    def applications(self, count):
+        """About ``count`` applications, each worker at most once per job; filled and closed jobs get a hire"""
+        from api.models import Application
+
+        worker_ids = [worker_id for worker_id, _ in self.workers]
+        per_job, extra = divmod(count, len(self.jobs)) if self.jobs else (0, 0)
+        extra_share = extra / len(self.jobs) if self.jobs else 0
+
+        def rows():
+            for job_id, poster_id, created_at, salary_min, job_status in self.jobs:
+                if job_status == 'draft':
+                    continue
+                applicants = min(len(worker_ids), per_job + (self.rng.random() < extra_share))
+                for position, worker_id in enumerate(self.rng.sample(worker_ids, applicants)):
+                    applied_at = self._timestamp(after=created_at)
+                    if position == 0 and job_status in ('filled', 'closed'):
+                        status = 'accepted'
+                        self.accepted.append((job_id, poster_id, worker_id, applied_at, salary_min))
+                    else:
+                        status = self._choice(APPLICATION_STATUSES)
+                    yield Application(
+                        worker_id=worker_id, job_id=job_id, status=status,
+                        cover_letter='cover_letters/synthetic.pdf', applied_at=applied_at, updated_at=applied_at,
+                    )
+
+        for _ in self._write(Application, rows()):
+            pass
+
+    def reviews(self, count):
+        """Clients review their hires, then hires review clients, until ``count`` is reached"""
+        from api.models import Review
+
+        hires = list(self.accepted)
+        self.rng.shuffle(hires)
+
+        def rows():
+            pairs = [(poster_id, worker_id, job_id, applied_at) for job_id, poster_id, worker_id, applied_at, _ in hires]
+            pairs += [(worker_id, poster_id, job_id, applied_at) for job_id, poster_id, worker_id, applied_at, _ in hires]
+            for reviewer_id, reviewee_id, job_id, applied_at in pairs[:count]:
+                yield Review(
+                    reviewer_id=reviewer_id, reviewee_id=reviewee_id, job_id=job_id,
+                    rating=self._choice(RATINGS), comment=self.rng.choice(REVIEW_COMMENTS),
+                    created_at=self._timestamp(after=applied_at),
+                )
+
+        for _ in self._write(Review, rows()):
+            pass
+
+    def payment_transactions(self, count):
+        """Job payments from clients to their hires, then worker withdrawals up to ``count``; ledger included"""
+        from api.models import PaymentTransaction
+
+        providers = {}
+        for provider, config in settings.MOBILE_MONEY_PROVIDERS.items():
+            for country in config['countries']:
+                providers.setdefault(country, []).append(provider)
+        job_payments = min(len(self.accepted), int(count * 0.7))
+
+        def row(transaction_type, sender_id, receiver_id, job_id, amount, country, after):
+            created_at = self._timestamp(after=after)
+            return PaymentTransaction(
+                transaction_type=transaction_type, status=self._choice(PAYMENT_STATUSES), amount=amount,
+                currency=self._currency(country), sender_id=sender_id, receiver_id=receiver_id, job_id=job_id,
+                reference_id=reference_id_for_datetime(created_at, self.rng),
+                payment_method=self.rng.choice(providers.get(country, ['bank_transfer'])),
+                created_at=created_at, updated_at=created_at,
+            )
+
+        def rows():
+            countries = dict(self.clients)
+            for job_id, poster_id, worker_id, applied_at, salary_min in self.accepted[:job_payments]:
+                yield row('job_payment', poster_id, worker_id, job_id, salary_min, countries[poster_id], applied_at)
+            for _ in range(count - job_payments if self.workers else 0):
+                worker_id, country = self.rng.choice(self.workers)
+                amount = Decimal(self.rng.randrange(500, 50000)) / 100
+                yield row('withdrawal', worker_id, worker_id, None, amount, country, None)
+
+        for chunk in self._write(PaymentTransaction, rows()):
+            self.counts['ledgerentry'] += sync_ledger(chunk)
+
+    def run(self, users=1000, jobs=500, applications=5000, reviews=1000, transactions=1000):
+        """Generate everything and rebuild the derived tables. Returns row counts by table."""
+        from api.models import Application, JobPosting, PaymentTransaction, Review, WorkerProfile
+
+        stages = [
+            ('catalogue', self.catalogue, ()),
+            ('users', self.users, (users,)),
+            ('worker profiles', self.worker_profiles, ()),
+            ('job postings', self.job_postings, (jobs,)),
+            ('applications', self.applications, (applications,)),
+            ('reviews', self.reviews, (reviews,)),
+            ('payment transactions and ledger', self.payment_transactions, (transactions,)),
+        ]
+        with _explicit_timestamps([WorkerProfile, JobPosting, Application, Review, PaymentTransaction]):
+            for name, stage, args in stages:
+                if name in ('job postings', 'applications') and not (self.clients and self.workers):
+                    continue
+                started = time.monotonic()
+                stage(*args)
+                self._stage(name, started)
+
+        started = time.monotonic()
+        self.counts['userratingsummary'] = reconcile_rating_summaries(chunk_size=self.chunk_size)['created']
+        self._stage('rating summaries', started)
+        started = time.monotonic()
+        self.counts['jobparticipation'] = rebuild_participation(chunk_size=self.chunk_size)
+        self._stage('participation index', started)
+        started = time.monotonic()
+        refresh_worker_scores(chunk_size=self.chunk_size)
+        self._stage('worker scores and rankings', started)
+        return dict(self.counts)
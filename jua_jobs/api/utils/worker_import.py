@@ -0,0 +1,297 @@
+"""
+Bulk onboarding of workers: User + WorkerProfile + skills.
+
+Rows are validated in memory (the User and WorkerProfile field validators plus
+country, currency and phone rules), checked against existing emails/usernames with
+one query per chunk, and written with bulk_create (users, then profiles, then
+WorkerProfile.skills through-rows). Password hashing, by far the most
+expensive step, runs in a process pool; rows without a password get an
+unusable one and are expected to go through password reset (invite flow).
+"""
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from decimal import Decimal, InvalidOperation
+
+from django.contrib.auth.hashers import make_password
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import DataError, IntegrityError, transaction
+
+from .african_validators import get_registry
+from .phone_numbers import normalize_many
+
+IMPORT_COLUMNS = [
+    'email', 'username', 'password', 'phone_number', 'country', 'city',
+    'title', 'bio', 'hourly_rate', 'currency', 'experience_years', 'availability', 'skills',
+]
+MIN_PASSWORD_LENGTH = 8
+# Checked separately: password is hashed later, phone_number is normalized per chunk,
+# and imported profiles may leave the bio for the worker to fill in
+USER_UNCHECKED_FIELDS = ['password', 'phone_number']
+PROFILE_UNCHECKED_FIELDS = ['user', 'bio', 'skills']
+
+def _init_hasher():
+    # Spawned (non-forked) workers need Django configured before hashing
+    import django
+    from django.conf import settings
+    if not settings.configured:
+        django.setup()
+
+def _hash(password):
+    return make_password(password)
+
+def _skill_names(value):
+    if isinstance(value, (list, tuple)):
+        names = value
+    else:
+        names = (value or '').replace(',', ';').split(';')
+    return list(dict.fromkeys(name.strip() for name in names if name and name.strip()))
+
+class WorkerImporter:
+    """
+    Import worker rows (dicts keyed by IMPORT_COLUMNS). ``processes`` sets the
+    hashing pool size: None uses every CPU, 0 hashes in-process.
+    """
+
+    def __init__(self, chunk_size=1000, processes=None):
+        self.chunk_size = chunk_size
+        self.processes = os.cpu_count() if processes is None else processes
+        self.pool = None
+        self.skill_ids = {}
+        self.created = 0
+        self.errors = []
+
+    def _fail(self, index, row, errors):
+        self.errors.append({'row': index, 'email': row.get('email', ''), 'errors': errors})
+
+    def _clean(self, index, row, seen_emails, seen_usernames):
+        """Validated field values for one row, or None after recording its errors"""
+        errors = {}
+        email = (row.get('email') or '').strip().lower()
+        try:
+            validate_email(email)
+        except ValidationError:
+            errors['email'] = ['Enter a valid email address']
+        if email in seen_emails:
+            errors['email'] = ['Duplicate email in this import']
+        username = (row.get('username') or '').strip() or email.split('@')[0]
+        if username in seen_usernames:
+            errors['username'] = ['Duplicate username in this import']
+
+        password = row.get('password') or ''
+        if password and len(password) < MIN_PASSWORD_LENGTH:
+            errors['password'] = [f'Ensure this field has at least {MIN_PASSWORD_LENGTH} characters']
+
+        title = (row.get('title') or '').strip()
+        if not title:
+            errors['title'] = ['This field is required']
+
+        hourly_rate = row.get('hourly_rate')
+        if hourly_rate in (None, ''):
+            hourly_rate = None
+        else:
+            try:
+                hourly_rate = Decimal(str(hourly_rate))
+                if not hourly_rate.is_finite():
+                    raise InvalidOperation
+            except InvalidOperation:
+                errors['hourly_rate'] = ['A valid number is required']
+                hourly_rate = None
+
+        registry = get_registry()
+        country = (row.get('country') or '').strip().upper()
+        if country and country not in registry.countries:
+            errors['country'] = [
+                f'Country {country} is not supported. Valid countries: {", ".join(sorted(registry.countries))}'
+            ]
+
+        currency = (row.get('currency') or 'USD').strip().upper()
+        currency_error = registry.currency_error(currency)
+        if currency_error:
+            errors['currency'] = [currency_error]
+
+        try:
+            experience_years = int(row.get('experience_years') or 0)
+            if experience_years < 0:
+                raise ValueError
+        except (TypeError, ValueError):
+            errors['experience_years'] = ['Must be a whole number of years']
+            experience_years = 0
+
+        record = {
+            'index': index,
+            'email': email,
+            'username': username,
+            'password': password,
+            'phone_number': (row.get('phone_number') or '').strip(),
+            'country': country,
+            'city': (row.get('city') or '').strip(),
+            'title': title,
+            'bio': row.get('bio') or '',
+            'hourly_rate': hourly_rate,
+            'currency': currency,
+            'experience_years': experience_years,
+            'availability': (row.get('availability') or 'available').strip(),
+            'skills': _skill_names(row.get('skills')),
+            'raw': row,
+        }
+        # Lengths, formats and choices, so bad values are reported here instead of failing the insert
+        for field, messages in self._field_errors(record).items():
+            errors.setdefault(field, messages)
+
+        if errors:
+            self._fail(index, row, errors)
+            return None
+        seen_emails.add(email)
+        seen_usernames.add(username)
+        return record
+
+    def _field_errors(self, record):
+        from api.models import User, WorkerProfile
+
+        errors = {}
+        user = User(
+            email=record['email'], username=record['username'], role='worker',
+            country=record['country'], city=record['city'],
+        )
+        profile = WorkerProfile(
+            title=record['title'], hourly_rate=record['hourly_rate'], currency=record['currency'],
+            experience_years=record['experience_years'], availability=record['availability'],
+        )
+        for instance, exclude in ((user, USER_UNCHECKED_FIELDS), (profile, PROFILE_UNCHECKED_FIELDS)):
+            try:
+                instance.clean_fields(exclude=exclude)
+            except ValidationError as exc:
+                errors.update(exc.message_dict)
+        return errors
+
+    def _drop_existing(self, records):
+        from api.models import User
+        emails = User.objects.filter(email__in=[r['email'] for r in records]).values_list('email', flat=True)
+        usernames = User.objects.filter(
+            username__in=[r['username'] for r in records]
+        ).values_list('username', flat=True)
+        emails, usernames = set(emails), set(usernames)
+        kept = []
+        for record in records:
+            if record['email'] in emails:
+                self._fail(record['index'], record['raw'], {'email': ['A user with this email already exists']})
+            elif record['username'] in usernames:
+                self._fail(record['index'], record['raw'], {'username': ['A user with this username already exists']})
+            else:
+                kept.append(record)
+        return kept
+
+    def _check_phones(self, records):
+        with_phone = [r for r in records if r['phone_number']]
+        results = normalize_many([r['phone_number'] for r in with_phone], [r['country'] or None for r in with_phone])
+        failed = set()
+        for record, (number, error) in zip(with_phone, results):
+            if error:
+                self._fail(record['index'], record['raw'], {'phone_number': [error]})
+                failed.add(record['index'])
+            else:
+                record['phone_number'] = number
+        return [r for r in records if r['index'] not in failed]
+
+    def _resolve_skills(self, records):
+        from api.models import Skill
+        missing = {name for record in records for name in record['skills'] if name not in self.skill_ids}
+        if not missing:
+            return
+        Skill.objects.bulk_create([Skill(name=name) for name in missing], ignore_conflicts=True)
+        self.skill_ids.update(Skill.objects.filter(name__in=missing).values_list('name', 'id'))
+
+    def _hash_passwords(self, records):
+        passwords = [r['password'] for r in records if r['password']]
+        if not passwords:
+            hashes = iter(())
+        elif self.processes and len(passwords) > 1:
+            if self.pool is None:
+                self.pool = ProcessPoolExecutor(max_workers=self.processes, initializer=_init_hasher)
+            chunksize = max(1, len(passwords) // (self.processes * 4))
+            hashes = self.pool.map(_hash, passwords, chunksize=chunksize)
+        else:
+            hashes = map(_hash, passwords)
+        for record in records:
+            # make_password(None) gives an unusable password
+            record['password_hash'] = next(hashes) if record['password'] else make_password(None)
+
+    def _write(self, records):
+        from api.models import User, WorkerProfile
+
+        users = User.objects.bulk_create([
+            User(
+                email=r['email'], username=r['username'], password=r['password_hash'], role='worker',
+                phone_number=r['phone_number'], country=r['country'], city=r['city'],
+            )
+            for r in records
+        ])
+        profiles = WorkerProfile.objects.bulk_create([
+            WorkerProfile(
+                user=user, title=r['title'], bio=r['bio'], hourly_rate=r['hourly_rate'], currency=r['currency'],
+                experience_years=r['experience_years'], availability=r['availability'],
+            )
+            for user, r in zip(users, records)
+        ])
+        Through = WorkerProfile.skills.through
+        Through.objects.bulk_create([
+            Through(workerprofile_id=profile.id, skill_id=self.skill_ids[name])
+            for profile, r in zip(profiles, records)
+            for name in r['skills']
+        ], batch_size=self.chunk_size)
+
+    def _import_chunk(self, records):
+        records = self._check_phones(self._drop_existing(records))
+        if not records:
+            return
+        self._resolve_skills(records)
+        self._hash_passwords(records)
+        try:
+            with transaction.atomic():
+                self._write(records)
+            self.created += len(records)
+        except (IntegrityError, DataError):
+            # A concurrent signup took an email/username, or a value the checks above
+            # missed was refused: retry row by row to isolate it
+            for record in records:
+                try:
+                    with transaction.atomic():
+                        self._write([record])
+                    self.created += 1
+                except (IntegrityError, DataError) as exc:
+                    self._fail(record['index'], record['raw'], {'non_field_errors': [str(exc)]})
+
+    def run(self, rows):
+        started = time.monotonic()
+        total = 0
+        seen_emails, seen_usernames = set(), set()
+        chunk = []
+        try:
+            for index, row in enumerate(rows, start=1):
+                total += 1
+                record = self._clean(index, row, seen_emails, seen_usernames)
+                if record:
+                    chunk.append(record)
+                if len(chunk) >= self.chunk_size:
+                    self._import_chunk(chunk)
+                    chunk = []
+            if chunk:
+                self._import_chunk(chunk)
+        finally:
+            if self.pool is not None:
+                self.pool.shutdown()
+
+        elapsed = time.monotonic() - started
+        return {
+            'total': total,
+            'created': self.created,
+            'failed': len(self.errors),
+            'errors': sorted(self.errors, key=lambda error: error['row']),
+            'seconds': round(elapsed, 3),
+            'rows_per_minute': round(total * 60 / elapsed) if elapsed else total,
+        }
+
+def import_workers(rows, chunk_size=1000, processes=None):
+    return WorkerImporter(chunk_size, processes).run(rows)
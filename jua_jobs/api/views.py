@@ -1,25 +1,35 @@
+import csv
+import hmac
+
 from rest_framework import status, viewsets, permissions
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.decorators import api_view, permission_classes, action
 from rest_framework_simplejwt.tokens import RefreshToken
-from rest_framework.parsers import MultiPartParser, FormParser
+from rest_framework.parsers import JSONParser, MultiPartParser, FormParser
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.filters import SearchFilter, OrderingFilter
 from django.utils.decorators import method_decorator
 from django.views.decorators.csrf import csrf_exempt
 from django.contrib.auth import get_user_model
-from django.db.models import Q, Avg, Count
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, OuterRef, Prefetch, Q, Subquery
+from django.db.models.functions import Coalesce
 from django.shortcuts import get_object_or_404
+from django.http import HttpResponse, HttpResponseForbidden
 from django.core.cache import cache
 from drf_spectacular.utils import extend_schema, OpenApiExample
 
-from .models import JobPosting, Application, Review, WorkerProfile, Skill, Category, PaymentTransaction, PaymentMethod
+from .models import (
+    JobPosting, Application, Review, WorkerProfile, Skill, Category,
+    PaymentTransaction, PaymentMethod, UserRatingSummary, WorkerRanking
+)
 from .serializers import (
     JobPostingSerializer, ApplicationSerializer, ReviewSerializer,
     UserSignupSerializer, UserLoginSerializer, UserSerializer,
     WorkerProfileSerializer, SkillSerializer, CategorySerializer,
-    PaymentTransactionSerializer, PaymentMethodSerializer
+    PaymentTransactionSerializer, PaymentMethodSerializer, BulkPaymentSerializer, TokenRevokeSerializer
 )
 from .permissions import (
     IsOwnerOrReadOnly, IsClientRole, IsWorkerRole,
@@ -27,12 +37,98 @@ from .permissions import (
 )
 from .filters import (
     JobPostingFilter, ApplicationFilter, ReviewFilter,
-    WorkerProfileFilter, UserFilter
+    WorkerProfileFilter, UserFilter, PaymentTransactionFilter
 )
 from .utils.caching import CacheManager, cache_result
+from .utils.ledger import get_balances, sync_ledger
+from .utils.ratings import with_rating_summaries
+from .utils.idempotency import idempotent
+from .utils.ids import generate_reference_id
+from .utils.reconciliation import open_statement, reconcile_statement
+from .utils.exports import EXPORT_FORMATS, stream_export
+from .utils.phone_numbers import country_for_number, normalize_many
+from .utils.worker_import import import_workers
+from .utils.revocation import revoke_token
+from .utils.sharding import count_all, fan_out, merge_shards, shard_for_id, use_shard
+from .utils.metrics import render as render_metrics
 
 User = get_user_model()
 
+def serialized_jobs(user, queryset=None):
+    """
+    Jobs with everything JobPostingSerializer reads loaded in a fixed number
+    of queries: poster and rating summary, category, skills, application
+    count and, on the jobs ``user`` posted, the applicants
+    """
+    queryset = JobPosting.objects.all() if queryset is None else queryset
+    applications = Application.objects.filter(job=OuterRef('pk')).order_by().values('job')
+    queryset = with_rating_summaries(
+        queryset.select_related('posted_by', 'category'), 'posted_by'
+    ).prefetch_related('required_skills').annotate(
+        application_count=Coalesce(Subquery(applications.annotate(total=Count('pk')).values('total')), 0)
+    )
+    if user.is_authenticated:
+        queryset = queryset.prefetch_related(Prefetch(
+            'applications', to_attr='owner_applications',
+            queryset=Application.objects.filter(job__posted_by_id=user.id).select_related('worker')
+        ))
+    return queryset
+
+class ExportMixin:
+    """
+    Adds a streaming ``export`` action. Rows come from the same filtered
+    queryset as ``list`` and are written as CSV or NDJSON (``?output=``).
+    """
+    export_columns = {}
+    export_filename = 'export'
+
+    def extend_export_rows(self, rows):
+        pass
+
+    def export_querysets(self, queryset):
+        return [queryset]
+
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        output = request.query_params.get('output', 'csv')
+        if output not in EXPORT_FORMATS:
+            return Response(
+                {'error': f"output must be one of: {', '.join(EXPORT_FORMATS)}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        querysets = self.export_querysets(self.filter_queryset(self.get_queryset()))
+        return stream_export(
+            querysets, self.export_columns, self.export_filename, output,
+            extend_rows=self.extend_export_rows
+        )
+
+class ShardLookupMixin:
+    """Detail routes read from the shard named by the object's id (see api/utils/sharding.py)"""
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        alias = shard_for_id(self.kwargs.get(self.lookup_url_kwarg or self.lookup_field))
+        return queryset.using(alias) if alias else queryset
+
+class FanOutListMixin:
+    """
+    ``list`` and ``export`` read every shard (see api/utils/sharding.py), for
+    a user's own rows, which are stored with jobs in any country
+    """
+
+    def list(self, request, *args, **kwargs):
+        queryset = merge_shards(self.filter_queryset(self.get_queryset()))
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            serializer = self.get_serializer(page, many=True)
+            return self.get_paginated_response(serializer.data)
+
+        serializer = self.get_serializer(queryset, many=True)
+        return Response(serializer.data)
+
+    def export_querysets(self, queryset):
+        return fan_out(queryset)
+
 class UserSignupView(APIView):
     permission_classes = [permissions.AllowAny]
     
@@ -142,6 +238,26 @@ class UserLoginView(APIView):
             }, status=status.HTTP_200_OK)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+class TokenRevokeView(APIView):
+    permission_classes = [permissions.AllowAny]
+
+    @extend_schema(request=TokenRevokeSerializer, responses={200: dict})
+    def post(self, request):
+        """
+        Revoke a refresh token (logout)
+
+        The refresh token stops working immediately. When the request is made
+        with a Bearer access token, that access token is revoked as well.
+        """
+        serializer = TokenRevokeSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        revoked = int(revoke_token(serializer.validated_data['refresh']))
+        if request.auth is not None:
+            revoked += revoke_token(request.auth)
+        return Response({'revoked': revoked}, status=status.HTTP_200_OK)
+
 @extend_schema(
     responses={200: dict},
     examples=[
@@ -173,7 +289,7 @@ def test_token(request):
     })
 
 class UserViewSet(viewsets.ModelViewSet):
-    queryset = User.objects.all()
+    queryset = User.objects.select_related('rating_summary')
     serializer_class = UserSerializer
     permission_classes = [permissions.IsAuthenticated]
     filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
@@ -223,36 +339,104 @@ class CategoryViewSet(viewsets.ModelViewSet):
         return super().list(request, *args, **kwargs)
 
 class WorkerProfileViewSet(viewsets.ModelViewSet):
-    queryset = WorkerProfile.objects.select_related('user').prefetch_related('skills')
+    queryset = WorkerProfile.objects.select_related('user', 'user__rating_summary').prefetch_related('skills')
     serializer_class = WorkerProfileSerializer
     permission_classes = [permissions.IsAuthenticated, IsProfileOwner]
     filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
     filterset_class = WorkerProfileFilter
     search_fields = ['title', 'bio', 'user__username', 'user__email']
-    ordering_fields = ['created_at', 'hourly_rate', 'experience_years']
+    ordering_fields = ['created_at', 'hourly_rate', 'experience_years', 'score']
     ordering = ['-created_at']
 
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
 
+    @action(detail=False, methods=['get'])
+    def top(self, request):
+        """
+        Top-ranked workers, optionally per skill (id or name) and/or country,
+        served from the lists precomputed by refresh_worker_scores.
+        """
+        skill = request.query_params.get('skill')
+        country = request.query_params.get('country', '').upper()
+        try:
+            limit = min(int(request.query_params.get('limit', 10)), settings.WORKER_SCORE['TOP_N'])
+        except ValueError:
+            return Response({'error': 'limit must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+
+        rankings = WorkerRanking.objects.filter(country=country)
+        if skill:
+            skill_filter = Q(skill__name__iexact=skill)
+            if skill.isdigit():
+                skill_filter |= Q(skill_id=int(skill))
+            rankings = rankings.filter(skill_filter)
+        else:
+            rankings = rankings.filter(skill__isnull=True)
+
+        rankings = rankings.select_related(
+            'profile__user', 'profile__user__rating_summary'
+        ).prefetch_related('profile__skills')[:max(limit, 0)]
+        results = []
+        for ranking in rankings:
+            data = self.get_serializer(ranking.profile).data
+            data['rank'] = ranking.rank
+            results.append(data)
+        return Response({'skill': skill, 'country': country or None, 'results': results})
+
+    @action(detail=False, methods=['post'], url_path='import',
+            parser_classes=[JSONParser, MultiPartParser, FormParser])
+    def bulk_import(self, request):
+        """
+        Onboard workers in bulk (staff only): JSON {"workers": [...]} or a CSV
+        upload as "file", with the columns of the import_workers command.
+        """
+        upload = request.FILES.get('file')
+        if upload is not None:
+            rows = list(csv.DictReader(open_statement(upload)))
+        else:
+            rows = request.data.get('workers')
+            if not isinstance(rows, list):
+                return Response(
+                    {'error': 'Provide workers as a JSON list or upload a CSV as "file"'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+        config = settings.WORKER_IMPORT
+        if not rows or len(rows) > config['MAX_API_ROWS']:
+            return Response(
+                {'error': f"Between 1 and {config['MAX_API_ROWS']} workers per request; "
+                          f"use the import_workers command for larger files"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        report = import_workers(rows, chunk_size=config['CHUNK_SIZE'], processes=config['API_PROCESSES'])
+        return Response(report, status=status.HTTP_201_CREATED if report['created'] else status.HTTP_400_BAD_REQUEST)
+
     def get_permissions(self):
-        if self.action in ['list', 'retrieve']:
+        if self.action in ['list', 'retrieve', 'top']:
             permission_classes = [permissions.IsAuthenticatedOrReadOnly]
+        elif self.action == 'bulk_import':
+            permission_classes = [permissions.IsAdminUser]
         else:
             permission_classes = [permissions.IsAuthenticated, IsProfileOwner]
         return [permission() for permission in permission_classes]
 
-class JobPostingViewSet(viewsets.ModelViewSet):
-    queryset = JobPosting.objects.select_related('posted_by', 'category').prefetch_related('required_skills')
+class JobPostingViewSet(ShardLookupMixin, ExportMixin, viewsets.ModelViewSet):
+    queryset = JobPosting.objects.all()
     serializer_class = JobPostingSerializer
     filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
     filterset_class = JobPostingFilter
     search_fields = ['title', 'description', 'location']
     ordering_fields = ['created_at', 'salary_min', 'salary_max', 'deadline']
     ordering = ['-created_at']
+    export_filename = 'jobs'
+    export_columns = {
+        'id': 'id', 'title': 'title', 'status': 'status', 'employment_type': 'employment_type',
+        'location': 'location', 'remote_work': 'remote_work', 'salary_min': 'salary_min',
+        'salary_max': 'salary_max', 'category': 'category__name', 'posted_by': 'posted_by_id',
+        'required_skills': None, 'deadline': 'deadline', 'created_at': 'created_at',
+    }
 
     def get_permissions(self):
-        if self.action == 'create':
+        if self.action in ['create', 'pay']:
             permission_classes = [permissions.IsAuthenticated, IsClientRole]
         elif self.action in ['update', 'partial_update', 'destroy']:
             permission_classes = [permissions.IsAuthenticated, IsOwnerOrReadOnly]
@@ -266,13 +450,22 @@ class JobPostingViewSet(viewsets.ModelViewSet):
         CacheManager.invalidate_job_cache(job.id)
 
     def get_queryset(self):
-        queryset = super().get_queryset()
-        if self.action == 'list':
+        queryset = serialized_jobs(self.request.user, super().get_queryset())
+        if self.action in ['list', 'export']:
             # Only show active jobs for general listing
             if not self.request.user.is_authenticated or self.request.user.role != 'client':
                 queryset = queryset.filter(status='active')
         return queryset
 
+    def extend_export_rows(self, rows):
+        skills = {}
+        for job_id, name in JobPosting.required_skills.through.objects.filter(
+            jobposting_id__in=[row['pk'] for row in rows]
+        ).values_list('jobposting_id', 'skill__name'):
+            skills.setdefault(job_id, []).append(name)
+        for row in rows:
+            row['required_skills'] = ';'.join(sorted(skills.get(row['pk'], [])))
+
     @action(detail=True, methods=['get'])
     def applications(self, request, pk=None):
         job = self.get_object()
@@ -282,10 +475,84 @@ class JobPostingViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_403_FORBIDDEN
             )
         
-        applications = job.applications.select_related('worker')
+        # Each row's job is ``job`` itself, already loaded with its application count
+        applications = with_rating_summaries(job.applications.all(), 'worker')
         serializer = ApplicationSerializer(applications, many=True)
         return Response(serializer.data)
 
+    @action(detail=True, methods=['post'])
+    @idempotent
+    def pay(self, request, pk=None):
+        """Pay several accepted workers on a job in one request"""
+        job = self.get_object()
+        if job.posted_by_id != request.user.id:
+            return Response(
+                {'error': 'You can only pay workers on your own jobs'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+
+        serializer = BulkPaymentSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+
+        # One query validates every recipient
+        accepted = set(job.applications.filter(status='accepted').values_list('worker_id', flat=True))
+        requested = data.get('payments') or [{'receiver_id': worker_id} for worker_id in sorted(accepted)]
+        if not requested:
+            return Response(
+                {'error': 'This job has no accepted applicants to pay'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        results = []
+        payments = []
+        seen = set()
+        for item in requested:
+            receiver_id = item['receiver_id']
+            result = {'receiver_id': receiver_id}
+            if receiver_id in seen:
+                result.update(status='rejected', error='Duplicate recipient')
+            elif receiver_id not in accepted:
+                result.update(status='rejected', error='Not an accepted applicant on this job')
+            else:
+                payment = PaymentTransaction(
+                    transaction_type='job_payment',
+                    amount=item.get('amount', data.get('amount')),
+                    currency=data['currency'],
+                    payment_method=data['payment_method'],
+                    sender=request.user,
+                    receiver_id=receiver_id,
+                    job=job,
+                    reference_id=generate_reference_id()
+                )
+                payments.append(payment)
+                result.update(status='created', payment=payment)
+            seen.add(receiver_id)
+            results.append(result)
+
+        using = shard_for_id(job.pk)
+        with use_shard(using), transaction.atomic(using=using):
+            PaymentTransaction.objects.bulk_create(payments)
+            # bulk_create skips the post_save ledger signal
+            sync_ledger(payments)
+
+        for result in results:
+            payment = result.pop('payment', None)
+            if payment is not None:
+                result.update(
+                    id=payment.id, reference_id=payment.reference_id,
+                    amount=f'{payment.amount:.2f}', currency=payment.currency
+                )
+        return Response(
+            {
+                'job_id': job.id,
+                'created': len(payments),
+                'rejected': len(results) - len(payments),
+                'results': results,
+            },
+            status=status.HTTP_201_CREATED if payments else status.HTTP_400_BAD_REQUEST
+        )
+
     @action(detail=False, methods=['get'])
     def my_jobs(self, request):
         if request.user.role != 'client':
@@ -303,8 +570,8 @@ class JobPostingViewSet(viewsets.ModelViewSet):
         serializer = self.get_serializer(jobs, many=True)
         return Response(serializer.data)
 
-class ApplicationViewSet(viewsets.ModelViewSet):
-    queryset = Application.objects.select_related('worker', 'job', 'job__posted_by')
+class ApplicationViewSet(ShardLookupMixin, FanOutListMixin, ExportMixin, viewsets.ModelViewSet):
+    queryset = Application.objects.select_related('worker')
     serializer_class = ApplicationSerializer
     permission_classes = [permissions.IsAuthenticated]
     parser_classes = [MultiPartParser, FormParser]
@@ -312,6 +579,12 @@ class ApplicationViewSet(viewsets.ModelViewSet):
     filterset_class = ApplicationFilter
     ordering_fields = ['applied_at', 'updated_at']
     ordering = ['-applied_at']
+    export_filename = 'applications'
+    export_columns = {
+        'id': 'id', 'job': 'job_id', 'job_title': 'job__title', 'worker': 'worker_id',
+        'worker_email': 'worker__email', 'status': 'status', 'applied_at': 'applied_at',
+        'updated_at': 'updated_at',
+    }
 
     def get_permissions(self):
         if self.action == 'create':
@@ -322,27 +595,36 @@ class ApplicationViewSet(viewsets.ModelViewSet):
             permission_classes = [permissions.IsAuthenticated, IsApplicationOwnerOrJobOwner]
         return [permission() for permission in permission_classes]
 
+    @idempotent
+    def create(self, request, *args, **kwargs):
+        return super().create(request, *args, **kwargs)
+
     def perform_create(self, serializer):
         job_id = serializer.validated_data['job_id']
-        job = get_object_or_404(JobPosting, id=job_id)
-        serializer.save(worker=self.request.user, job=job)
+        using = shard_for_id(job_id)
+        job = get_object_or_404(JobPosting.objects.using(using), id=job_id)
+        with use_shard(using):
+            serializer.save(worker=self.request.user, job=job)
 
     def get_queryset(self):
         user = self.request.user
+        queryset = with_rating_summaries(self.queryset, 'worker').prefetch_related(
+            Prefetch('job', queryset=serialized_jobs(user))
+        )
         if user.role == 'worker':
             # Workers see their own applications
-            return self.queryset.filter(worker=user)
+            return queryset.filter(worker=user)
         elif user.role == 'client':
             # Clients see applications to their jobs
-            return self.queryset.filter(job__posted_by=user)
-        return self.queryset.none()
+            return queryset.filter(job__posted_by=user)
+        return queryset.none()
 
     @action(detail=True, methods=['patch'])
     def update_status(self, request, pk=None):
         application = self.get_object()
         
         # Only job owner can update application status
-        if application.job.posted_by != request.user:
+        if application.job.posted_by_id != request.user.id:
             return Response(
                 {'error': 'Only job owner can update application status'},
                 status=status.HTTP_403_FORBIDDEN
@@ -361,8 +643,8 @@ class ApplicationViewSet(viewsets.ModelViewSet):
         serializer = self.get_serializer(application)
         return Response(serializer.data)
 
-class ReviewViewSet(viewsets.ModelViewSet):
-    queryset = Review.objects.select_related('reviewer', 'reviewee', 'job')
+class ReviewViewSet(ShardLookupMixin, viewsets.ModelViewSet):
+    queryset = Review.objects.select_related('reviewer', 'reviewee')
     serializer_class = ReviewSerializer
     permission_classes = [permissions.IsAuthenticated, IsReviewParticipant]
     filter_backends = [DjangoFilterBackend, OrderingFilter]
@@ -370,12 +652,19 @@ class ReviewViewSet(viewsets.ModelViewSet):
     ordering_fields = ['created_at', 'rating']
     ordering = ['-created_at']
 
+    def get_queryset(self):
+        return with_rating_summaries(super().get_queryset(), 'reviewer', 'reviewee').prefetch_related(
+            Prefetch('job', queryset=serialized_jobs(self.request.user))
+        )
+
     def perform_create(self, serializer):
         reviewee_id = serializer.validated_data['reviewee_id']
         job_id = serializer.validated_data['job_id']
         reviewee = get_object_or_404(User, id=reviewee_id)
-        job = get_object_or_404(JobPosting, id=job_id)
-        serializer.save(reviewer=self.request.user, reviewee=reviewee, job=job)
+        using = shard_for_id(job_id)
+        job = get_object_or_404(JobPosting.objects.using(using), id=job_id)
+        with use_shard(using):
+            serializer.save(reviewer=self.request.user, reviewee=reviewee, job=job)
 
     @action(detail=False, methods=['get'])
     def user_reviews(self, request):
@@ -386,11 +675,16 @@ class ReviewViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        reviews = self.get_queryset().filter(reviewee_id=user_id)
+        # Reviews are stored with their job, in any country
+        reviews = merge_shards(self.get_queryset().filter(reviewee_id=user_id))
         
-        # Calculate average rating
-        avg_rating = reviews.aggregate(avg_rating=Avg('rating'))['avg_rating']
-        rating_counts = reviews.values('rating').annotate(count=Count('rating'))
+        # Aggregates are maintained on write, so this is a single-row lookup
+        summary = UserRatingSummary.objects.filter(user_id=user_id).first() or UserRatingSummary()
+        rating_data = {
+            'average_rating': summary.average_rating,
+            'total_reviews': summary.review_count,
+            'rating_distribution': summary.rating_distribution
+        }
         
         # Handle pagination properly
         page = self.paginate_queryset(reviews)
@@ -400,21 +694,12 @@ class ReviewViewSet(viewsets.ModelViewSet):
             paginated_response = self.get_paginated_response(serializer.data)
             
             # Add the additional data to the paginated response
-            paginated_response.data.update({
-                'average_rating': round(avg_rating, 2) if avg_rating else None,
-                'total_reviews': reviews.count(),
-                'rating_distribution': list(rating_counts)
-            })
+            paginated_response.data.update(rating_data)
             return paginated_response
         
         # Non-paginated response
         serializer = self.get_serializer(reviews, many=True)
-        return Response({
-            'reviews': serializer.data,
-            'average_rating': round(avg_rating, 2) if avg_rating else None,
-            'total_reviews': reviews.count(),
-            'rating_distribution': list(rating_counts)
-        })
+        return Response({'reviews': serializer.data, **rating_data})
 
     def get_permissions(self):
         # Allow unauthenticated access to user_reviews action
@@ -424,39 +709,78 @@ class ReviewViewSet(viewsets.ModelViewSet):
             permission_classes = [permissions.IsAuthenticated, IsReviewParticipant]
         return [permission() for permission in permission_classes]
 
-class PaymentTransactionViewSet(viewsets.ModelViewSet):
-    queryset = PaymentTransaction.objects.select_related('sender', 'receiver', 'job')
+class PaymentTransactionViewSet(ShardLookupMixin, FanOutListMixin, ExportMixin, viewsets.ModelViewSet):
+    queryset = PaymentTransaction.objects.select_related('sender', 'receiver')
     serializer_class = PaymentTransactionSerializer
     permission_classes = [permissions.IsAuthenticated]
     filter_backends = [DjangoFilterBackend, OrderingFilter]
-    ordering_fields = ['created_at', 'amount']
+    filterset_class = PaymentTransactionFilter
+    ordering_fields = ['created_at', 'amount', 'reference_id']
     ordering = ['-created_at']
+    export_filename = 'payments'
+    export_columns = {
+        'reference_id': 'reference_id', 'transaction_type': 'transaction_type', 'status': 'status',
+        'amount': 'amount', 'currency': 'currency', 'sender': 'sender_id', 'receiver': 'receiver_id',
+        'job': 'job_id', 'payment_method': 'payment_method', 'created_at': 'created_at',
+    }
 
     def get_queryset(self):
         user = self.request.user
         # Users can only see their own transactions
-        return self.queryset.filter(Q(sender=user) | Q(receiver=user))
+        return with_rating_summaries(self.queryset, 'sender', 'receiver').prefetch_related(
+            Prefetch('job', queryset=serialized_jobs(user))
+        ).filter(Q(sender=user) | Q(receiver=user))
+
+    @action(detail=False, methods=['get'])
+    def balance(self, request):
+        """Current balance per currency: latest ledger snapshot plus entries since"""
+        balances = get_balances(request.user)
+        return Response({
+            'balances': [
+                {'currency': currency, 'balance': f'{amount:.2f}'}
+                for currency, amount in sorted(balances.items())
+            ]
+        })
+
+    @action(detail=False, methods=['post'], permission_classes=[permissions.IsAdminUser],
+            parser_classes=[MultiPartParser, FormParser])
+    def reconcile(self, request):
+        """Reconcile an uploaded provider statement CSV (staff only)"""
+        statement = request.FILES.get('file')
+        if statement is None:
+            return Response({'error': 'Upload the statement CSV as "file"'}, status=status.HTTP_400_BAD_REQUEST)
+        apply = str(request.data.get('apply', '')).lower() in ('1', 'true', 'yes')
+        try:
+            report = reconcile_statement(open_statement(statement), apply=apply)
+        except (ValueError, UnicodeDecodeError) as exc:
+            return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(report)
+
+    @idempotent
+    def create(self, request, *args, **kwargs):
+        return super().create(request, *args, **kwargs)
 
     def perform_create(self, serializer):
-        import uuid
-        reference_id = str(uuid.uuid4())
         receiver_id = serializer.validated_data['receiver_id']
         job_id = serializer.validated_data.get('job_id')
         
         receiver = get_object_or_404(User, id=receiver_id)
         job = None
+        using = shard_for_id(job_id)
         if job_id:
-            job = get_object_or_404(JobPosting, id=job_id)
+            job = get_object_or_404(JobPosting.objects.using(using), id=job_id)
         
-        serializer.save(
-            sender=self.request.user,
-            receiver=receiver,
-            job=job,
-            reference_id=reference_id
-        )
+        # Stored with the job; payments without one stay on the sender's shard
+        with use_shard(using):
+            serializer.save(
+                sender=self.request.user,
+                receiver=receiver,
+                job=job,
+                reference_id=generate_reference_id()
+            )
 
 class PaymentMethodViewSet(viewsets.ModelViewSet):
-    queryset = PaymentMethod.objects.select_related('user')
+    queryset = PaymentMethod.objects.select_related('user', 'user__rating_summary')
     serializer_class = PaymentMethodSerializer
     permission_classes = [permissions.IsAuthenticated]
     filter_backends = [DjangoFilterBackend, OrderingFilter]
@@ -512,24 +836,26 @@ def dashboard_stats(request):
     """
     user = request.user
     
+    # A user's jobs stay on the shard of the country they posted from, and
+    # their applications follow jobs in any country, so counts cover every shard
     if user.role == 'client':
         stats = {
-            'total_jobs_posted': JobPosting.objects.filter(posted_by=user).count(),
-            'active_jobs': JobPosting.objects.filter(posted_by=user, status='active').count(),
-            'total_applications': Application.objects.filter(job__posted_by=user).count(),
-            'pending_applications': Application.objects.filter(
+            'total_jobs_posted': count_all(JobPosting.objects.filter(posted_by=user)),
+            'active_jobs': count_all(JobPosting.objects.filter(posted_by=user, status='active')),
+            'total_applications': count_all(Application.objects.filter(job__posted_by=user)),
+            'pending_applications': count_all(Application.objects.filter(
                 job__posted_by=user, status='pending'
-            ).count(),
+            )),
         }
     elif user.role == 'worker':
         stats = {
-            'total_applications': Application.objects.filter(worker=user).count(),
-            'pending_applications': Application.objects.filter(
+            'total_applications': count_all(Application.objects.filter(worker=user)),
+            'pending_applications': count_all(Application.objects.filter(
                 worker=user, status='pending'
-            ).count(),
-            'accepted_applications': Application.objects.filter(
+            )),
+            'accepted_applications': count_all(Application.objects.filter(
                 worker=user, status='accepted'
-            ).count(),
+            )),
             'profile_exists': hasattr(user, 'worker_profile'),
         }
     else:
@@ -564,12 +890,91 @@ def platform_stats(request):
     
     Public endpoint that returns general platform statistics.
     """
+    # Job-side counts are summed across country shards
     stats = {
-        'total_jobs': JobPosting.objects.count(),
-        'active_jobs': JobPosting.objects.filter(status='active').count(),
+        'total_jobs': count_all(JobPosting.objects.all()),
+        'active_jobs': count_all(JobPosting.objects.filter(status='active')),
         'total_workers': User.objects.filter(role='worker').count(),
         'total_clients': User.objects.filter(role='client').count(),
-        'total_applications': Application.objects.count(),
-        'total_reviews': Review.objects.count(),
+        'total_applications': count_all(Application.objects.all()),
+        'total_reviews': count_all(Review.objects.all()),
     }
     return Response(stats)
+
+PHONE_VALIDATION_LIMIT = 10000
+
+@extend_schema(
+    request=dict,
+    responses={200: dict},
+    examples=[
+        OpenApiExample(
+            'Phone Validation Request',
+            summary='Normalize a batch of Kenyan numbers',
+            value={"country": "KE", "numbers": ["0712 345 678", "+254 733-123456", "12345"]},
+            request_only=True,
+        ),
+    ]
+)
+@api_view(['POST'])
+@permission_classes([permissions.IsAuthenticated])
+def validate_phones(request):
+    """
+    Normalize and validate phone numbers in bulk
+
+    Numbers are converted to E.164 using the country rules; ``country`` applies
+    to every number unless an item is given as {"number": ..., "country": ...}.
+    """
+    numbers = request.data.get('numbers')
+    if not isinstance(numbers, list) or not numbers:
+        return Response({'error': 'numbers must be a non-empty list'}, status=status.HTTP_400_BAD_REQUEST)
+    if len(numbers) > PHONE_VALIDATION_LIMIT:
+        return Response(
+            {'error': f'Maximum {PHONE_VALIDATION_LIMIT} numbers per request'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    default_country = request.data.get('country') or None
+    if default_country is not None and not isinstance(default_country, str):
+        return Response({'error': 'country must be a country code'}, status=status.HTTP_400_BAD_REQUEST)
+    values, countries, country_errors = [], [], {}
+    for item in numbers:
+        if isinstance(item, dict):
+            country = item.get('country') or default_country
+            if not isinstance(country, str) and country is not None:
+                country_errors[len(values)] = 'country must be a country code'
+                country = None
+            values.append(str(item.get('number') or ''))
+            countries.append(country)
+        else:
+            values.append(str(item))
+            countries.append(default_country)
+
+    results = []
+    for index, (value, (number, error)) in enumerate(zip(values, normalize_many(values, countries))):
+        if index in country_errors:
+            number, error = None, country_errors[index]
+        results.append({
+            'input': value,
+            'normalized': number,
+            'country': country_for_number(number) if number else None,
+            'error': error,
+        })
+    valid = sum(1 for result in results if result['error'] is None)
+    return Response({
+        'count': len(results),
+        'valid': valid,
+        'invalid': len(results) - valid,
+        'results': results,
+    })
+
+def metrics(request):
+    """Prometheus scrape endpoint: clients in METRICS['ALLOWED_IPS'] or bearing METRICS_TOKEN"""
+    config = settings.METRICS
+    token = config['TOKEN']
+    authorization = request.META.get('HTTP_AUTHORIZATION', '')
+    allowed = request.META.get('REMOTE_ADDR') in config['ALLOWED_IPS'] or (
+        token and hmac.compare_digest(authorization, f'Bearer {token}')
+    )
+    if not allowed:
+        return HttpResponseForbidden()
+    return HttpResponse(render_metrics(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -26,6 +26,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.middleware.MetricsMiddleware',  # Per-route latency/size/status histograms for /metrics
+    'api.middleware.QueryInstrumentationMiddleware',  # Query counts, Server-Timing and budgets
     'django.middleware.gzip.GZipMiddleware',  # Response compression
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
@@ -33,6 +35,9 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'api.middleware.ProfilingMiddleware',  # cProfile on demand for staff, and sampled
+    'api.middleware.ReplicaRoutingMiddleware',  # Safe requests may read from replicas
+    'api.middleware.ShardRoutingMiddleware',  # Job data is read from the user's country shard
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -61,13 +66,64 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'CONN_MAX_AGE': 600,  # Keep connections (and their pragmas) across requests
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            # Take the write lock at BEGIN so concurrent writers wait on busy_timeout
+            # instead of failing when a read transaction tries to upgrade
+            'transaction_mode': 'IMMEDIATE',
+        },
     }
 }
 
+# Read replica. Locally, DATABASE_REPLICA_NAME can point at a copy of the primary
+# file (e.g. restored by litestream) to exercise routing; without it the alias is
+# the primary's own file and no reads are routed to it.
+DATABASES['replica'] = {
+    **DATABASES['default'],
+    'NAME': os.environ.get('DATABASE_REPLICA_NAME', DATABASES['default']['NAME']),
+    'TEST': {'MIRROR': 'default'},
+}
+
+# Country shards for the job graph (see api/utils/sharding.py). The aliases are
+# always defined and migrated by prepare_shards, but nothing is routed to them
+# unless SHARDING_ENABLED=1. Locally they are SQLite files beside the primary.
+SHARDING = {
+    'ENABLED': os.environ.get('SHARDING_ENABLED') == '1',
+    'SHARDS': {  # Alias -> countries; other countries stay on default. Append only: order fixes id ranges
+        'shard_east': ['KE', 'UG', 'TZ'],
+        'shard_west': ['NG'],
+        'shard_south': ['ZA'],
+    },
+    'ID_SPAN': 10 ** 12,  # Ids on the n-th shard start at n * ID_SPAN, so an id names its shard
+}
+for alias in SHARDING['SHARDS']:
+    DATABASES[alias] = {**DATABASES['default'], 'NAME': BASE_DIR / f'{alias}.sqlite3'}
+
+DATABASE_ROUTERS = ['api.db_routers.CountryShardRouter', 'api.db_routers.ReplicaRouter']
+
+# Read-replica routing (see api/db_routers.py)
+REPLICA_ROUTING = {
+    'ALIASES': ['replica'] if os.environ.get('DATABASE_REPLICA_NAME') else [],  # Replicas safe requests read from
+    'STICKY_SECONDS': 5,  # Reads stay on the primary this long after a user's write; keep >= MAX_LAG
+    'MAX_LAG': 5,  # Seconds of replication lag before a replica is skipped
+    'CHECK_INTERVAL': 10,  # Seconds between replica health/lag probes
+}
+
+# Applied to every new SQLite connection (see api/utils/sqlite.py)
+SQLITE_PRAGMAS = {
+    'journal_mode': 'wal',  # Readers don't block on the writer
+    'synchronous': 'normal',  # Durable with WAL; fsync at checkpoints, not every commit
+    'mmap_size': 268435456,  # 256 MB memory-mapped reads
+    'cache_size': -65536,  # 64 MB page cache (negative = KiB)
+    'busy_timeout': 5000,  # ms a writer waits for the lock before "database is locked"
+    'temp_store': 'memory',
+}
+
 # Redis Cache Configuration
 CACHES = {
     'default': {
-        'BACKEND': 'django_redis.cache.RedisCache',
+        'BACKEND': 'api.cache.InstrumentedRedisCache',  # django-redis, counting hits/misses for /metrics
         'LOCATION': 'redis://127.0.0.1:6379/1',
         'OPTIONS': {
             'CLIENT_CLASS': 'django_redis.client.DefaultClient',
@@ -112,7 +168,7 @@ AUTH_USER_MODEL = 'api.User'
 # REST Framework configuration
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'api.authentication.CachedJWTAuthentication',  # JWT with users resolved from the cache
         'rest_framework.authentication.SessionAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
@@ -126,8 +182,97 @@ REST_FRAMEWORK = {
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 20,
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
+    'DEFAULT_THROTTLE_CLASSES': [
+        'api.throttling.TokenBucketThrottle',  # Per-role token buckets, see RATE_LIMITS
+    ],
+}
+
+# Token-bucket rate limits (see api/throttling.py)
+RATE_LIMITS = {
+    # Burst size and tokens refilled per second, per caller and route class; None = unlimited
+    'BUDGETS': {
+        'anon': {'CAPACITY': 200, 'REFILL_RATE': 2},
+        'worker': {'CAPACITY': 600, 'REFILL_RATE': 10},
+        'client': {'CAPACITY': 600, 'REFILL_RATE': 10},
+        'staff': None,
+    },
+    # Tokens a request takes, by route class
+    'COSTS': {
+        'read': 1,
+        'list': 2,
+        'write': 2,
+        'search': 5,
+        'stats': 5,
+        'bulk': 20,
+        'export': 20,
+    },
+    # URL names whose route class isn't inferred from the action and query string
+    'ROUTES': {
+        'platform-stats': 'stats',
+        'dashboard-stats': 'stats',
+        'batch-operations': 'bulk',
+        'bulk-job-upload': 'bulk',
+        'validate-phones': 'bulk',
+    },
+    'REDIS_RETRY': 30,  # Seconds on in-process buckets after a Redis error
+}
+
+# Per-request query instrumentation (see QueryInstrumentationMiddleware in api/middleware.py)
+QUERY_INSTRUMENTATION = {
+    'ENABLED': True,
+    'SERVER_TIMING': True,  # Server-Timing header with DB time and query count
+    # A warning is logged when a request goes over any of these
+    'BUDGETS': {
+        'QUERIES': 25,
+        'DB_MS': 250,
+        'DUPLICATES': 5,  # Times one query shape may repeat before it looks like an N+1
+    },
+    # URL name -> budget overrides for views that legitimately do more
+    'VIEW_BUDGETS': {
+        'batch-operations': {'QUERIES': 200, 'DB_MS': 2000, 'DUPLICATES': 100},
+        'bulk-job-upload': {'QUERIES': 200, 'DB_MS': 2000, 'DUPLICATES': 100},
+        'workerprofile-bulk-import': {'QUERIES': 100, 'DB_MS': 2000},
+    },
+}
+
+# Slow query log (see api/utils/slow_queries.py); needs QUERY_INSTRUMENTATION enabled
+SLOW_QUERIES = {
+    'ENABLED': True,
+    'THRESHOLD_MS': float(os.environ.get('SLOW_QUERY_MS', '100')),
+    'EXPLAIN': True,  # Capture each slow query shape's plan (EXPLAIN QUERY PLAN on SQLite)
+    'BUFFER_SIZE': 200,  # Recent slow queries kept in memory per process
+    'LOG_TABLE': True,  # Also store them as SlowQuery rows for the slow_queries command
+    'MAX_PER_REQUEST': 20,  # Slow queries recorded per request; the rest are only counted
+}
+
+# Request metrics served at /metrics in the Prometheus text format (see api/utils/metrics.py)
+METRICS = {
+    'ENABLED': True,
+    # Per-process files summed at scrape time; set under multi-process servers (gunicorn)
+    # and clear on restart. Without it /metrics reports only the process that answers.
+    'DIRECTORY': os.environ.get('METRICS_DIR'),
+    'FLUSH_INTERVAL': 5,  # Seconds between a process's file writes
+    'LATENCY_BUCKETS': (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+    'SIZE_BUCKETS': (100, 1000, 10000, 100000, 1000000, 10000000),
+    # Clients allowed to scrape; a METRICS_TOKEN bearer token also works from anywhere
+    'ALLOWED_IPS': ['127.0.0.1', '::1'],
+    'TOKEN': os.environ.get('METRICS_TOKEN'),
+}
+
+# Request profiling (see api/utils/profiling.py); profiles are browsed and downloaded in the admin
+PROFILING = {
+    'ENABLED': True,
+    'HEADER': 'HTTP_X_PROFILE',  # Staff send "X-Profile: 1" ...
+    'QUERY_PARAM': 'profile',  # ... or ?profile=1
+    # Share of all requests profiled in the background for profile_report, e.g. 0.001 in production
+    'SAMPLE_RATE': float(os.environ.get('PROFILING_SAMPLE_RATE', '0')),
+    'TOP_FUNCTIONS': 40,  # Lines in each profile's stored report
+    'MAX_QUERIES': 500,  # Queries kept per profile
 }
 
+# Seconds a JWT-authenticated user is served from the cache (see api/authentication.py)
+JWT_USER_CACHE_TTL = 60
+
 # JWT Configuration
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(hours=1),
@@ -150,6 +295,15 @@ SIMPLE_JWT = {
     'AUTH_TOKEN_CLASSES': ('rest_framework_simplejwt.tokens.AccessToken',),
     'TOKEN_TYPE_CLAIM': 'token_type',
     'JTI_CLAIM': 'jti',
+    'TOKEN_REFRESH_SERIALIZER': 'api.serializers.RevokingTokenRefreshSerializer',
+}
+
+# Revoked JWT ids (see api/utils/revocation.py)
+TOKEN_REVOCATION = {
+    'CAPACITY': 1_000_000,  # Bloom filter sizing; grows at rebuild if more tokens are live
+    'ERROR_RATE': 0.001,  # False positives cost one primary key lookup
+    'SYNC_INTERVAL': 1,  # Seconds between picking up other processes' revocations
+    'REBUILD_INTERVAL': 3600,  # Seconds between full rebuilds, dropping pruned ids
 }
 
 # Spectacular settings for API documentation
@@ -197,12 +351,13 @@ FILE_UPLOAD_MAX_MEMORY_SIZE = 5242880  # 5MB
 DATA_UPLOAD_MAX_MEMORY_SIZE = 5242880  # 5MB
 
 # African Market Configurations
+# Compiled into api.utils.african_validators.ValidatorRegistry at startup
 AFRICAN_COUNTRIES = {
-    'KE': {'name': 'Kenya', 'currency': 'KES', 'phone_pattern': r'^\+254[17]\d{8}$'},
-    'NG': {'name': 'Nigeria', 'currency': 'NGN', 'phone_pattern': r'^\+234[789]\d{9}$'},
-    'ZA': {'name': 'South Africa', 'currency': 'ZAR', 'phone_pattern': r'^\+27[1-9]\d{8}$'},
-    'UG': {'name': 'Uganda', 'currency': 'UGX', 'phone_pattern': r'^\+256[37]\d{8}$'},
-    'TZ': {'name': 'Tanzania', 'currency': 'TZS', 'phone_pattern': r'^\+255[67]\d{8}$'},
+    'KE': {'name': 'Kenya', 'currency': 'KES', 'dialing_code': '254', 'phone_pattern': r'^\+254[17]\d{8}$'},
+    'NG': {'name': 'Nigeria', 'currency': 'NGN', 'dialing_code': '234', 'phone_pattern': r'^\+234[789]\d{9}$'},
+    'ZA': {'name': 'South Africa', 'currency': 'ZAR', 'dialing_code': '27', 'phone_pattern': r'^\+27[1-9]\d{8}$'},
+    'UG': {'name': 'Uganda', 'currency': 'UGX', 'dialing_code': '256', 'phone_pattern': r'^\+256[37]\d{8}$'},
+    'TZ': {'name': 'Tanzania', 'currency': 'TZS', 'dialing_code': '255', 'phone_pattern': r'^\+255[67]\d{8}$'},
 }
 
 MOBILE_MONEY_PROVIDERS = {
@@ -211,6 +366,41 @@ MOBILE_MONEY_PROVIDERS = {
     'mtn_mobile_money': {'countries': ['UG', 'ZA'], 'currencies': ['UGX', 'ZAR']},
 }
 
+# Batch payout engine (see api/utils/payouts.py). Defaults point at the local
+# simulator started with `python manage.py run_provider_simulator`.
+PAYOUT_PROVIDER_URL = os.environ.get('PAYOUT_PROVIDER_URL', 'http://127.0.0.1:8765')
+PAYOUTS = {
+    'BATCH_SIZE': 500,  # Withdrawals claimed per chunk
+    'TIMEOUT': 10,  # Seconds per provider call, connect included
+    'RETRIES': 3,  # Extra attempts on timeouts, connection errors and 5xx
+    'BACKOFF': 0.5,  # Seconds, doubled on each retry
+    'PROVIDERS': {
+        provider: {'url': f'{PAYOUT_PROVIDER_URL}/{provider}/payouts', 'concurrency': 20}
+        for provider in MOBILE_MONEY_PROVIDERS
+    },
+}
+
+# Idempotency-Key support on create endpoints (see api/utils/idempotency.py)
+IDEMPOTENCY = {
+    'TTL': timedelta(hours=24),  # How long a stored response can be replayed
+    'WAIT_TIMEOUT': 5,  # Seconds a duplicate waits for an in-flight original before 409
+}
+
+# Bulk worker onboarding (see api/utils/worker_import.py)
+WORKER_IMPORT = {
+    'CHUNK_SIZE': 1000,  # Rows validated and inserted per batch
+    'PROCESSES': None,  # import_workers command's password hashing pool; None = one per CPU, 0 = in-process
+    'API_PROCESSES': 0,  # The same for the import endpoint; in-process, so requests don't start worker pools
+    'MAX_API_ROWS': 5000,  # Larger files go through `manage.py import_workers`
+}
+
+# Worker leaderboard scoring (see api/utils/scoring.py)
+WORKER_SCORE = {
+    'PRIOR_WEIGHT': 5,  # Pseudo-reviews at the platform mean added to every worker
+    'JOB_WEIGHT': 0.25,  # Bonus per log(1 + completed jobs)
+    'TOP_N': 20,  # Length of each precomputed skill/country list
+}
+
 # Logging configuration
 LOGGING = {
     'version': 1,
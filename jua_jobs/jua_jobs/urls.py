@@ -3,10 +3,12 @@ from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
 from drf_spectacular.views import SpectacularAPIView, SpectacularSwaggerView, SpectacularRedocView
+from api.views import metrics
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/', include('api.urls')),
+    path('metrics', metrics, name='metrics'),  # Prometheus scrape target
     
     # API Documentation - These create the Swagger UI automatically
     path('api/schema/', SpectacularAPIView.as_view(), name='schema'),
@@ -0,0 +1,131 @@
+#!/usr/bin/env python
+"""
+Concurrent read/write throughput of SQLite with default settings vs SQLITE_PRAGMAS.
+
+Each run creates a scratch database, then for --seconds runs --readers threads
+doing indexed lookups and small range scans against --writers threads doing
+short insert+update transactions, every thread on its own connection (as with
+one connection per worker thread in production). Prints operations per second
+and the number of "database is locked" failures for each configuration.
+
+    python scripts/benchmark_sqlite.py --seconds 10 --readers 8 --writers 2
+"""
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+import django
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'jua_jobs.settings')
+django.setup()
+
+from django.conf import settings
+from api.utils.sqlite import pragma_statements
+
+ROWS = 20000
+
+def connect(path, tuned):
+    # isolation_level=None: transactions are managed explicitly below
+    connection = sqlite3.connect(path, timeout=5, isolation_level=None)
+    if tuned:
+        for statement in pragma_statements(settings.SQLITE_PRAGMAS):
+            connection.execute(statement)
+    return connection
+
+def setup(path, tuned):
+    connection = connect(path, tuned)
+    connection.execute(
+        'CREATE TABLE job (id INTEGER PRIMARY KEY, owner INTEGER, status TEXT, title TEXT, views INTEGER)'
+    )
+    connection.execute('CREATE INDEX job_owner ON job (owner)')
+    connection.execute('BEGIN')
+    connection.executemany(
+        'INSERT INTO job (owner, status, title, views) VALUES (?, ?, ?, 0)',
+        ((i % 500, 'active', f'Job {i}') for i in range(ROWS))
+    )
+    connection.execute('COMMIT')
+    connection.close()
+
+def reader(path, tuned, stop, counts):
+    connection = connect(path, tuned)
+    done = locked = 0
+    while not stop.is_set():
+        try:
+            if random.random() < 0.5:
+                connection.execute('SELECT * FROM job WHERE id = ?', (random.randint(1, ROWS),)).fetchall()
+            else:
+                connection.execute(
+                    'SELECT id, title FROM job WHERE owner = ? ORDER BY id DESC LIMIT 20', (random.randint(0, 499),)
+                ).fetchall()
+            done += 1
+        except sqlite3.OperationalError:
+            locked += 1
+    counts.append(('read', done, locked))
+
+def writer(path, tuned, stop, counts):
+    connection = connect(path, tuned)
+    begin = 'BEGIN IMMEDIATE' if tuned else 'BEGIN'
+    done = locked = 0
+    while not stop.is_set():
+        try:
+            connection.execute(begin)
+            connection.execute(
+                'INSERT INTO job (owner, status, title, views) VALUES (?, ?, ?, 0)',
+                (random.randint(0, 499), 'active', 'New job')
+            )
+            connection.execute('UPDATE job SET views = views + 1 WHERE id = ?', (random.randint(1, ROWS),))
+            connection.execute('COMMIT')
+            done += 1
+        except sqlite3.OperationalError:
+            locked += 1
+            if connection.in_transaction:
+                connection.execute('ROLLBACK')
+    counts.append(('write', done, locked))
+
+def run(tuned, seconds, readers, writers):
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'bench.sqlite3')
+        setup(path, tuned)
+        stop = threading.Event()
+        counts = []
+        threads = [threading.Thread(target=reader, args=(path, tuned, stop, counts)) for _ in range(readers)]
+        threads += [threading.Thread(target=writer, args=(path, tuned, stop, counts)) for _ in range(writers)]
+        for thread in threads:
+            thread.start()
+        time.sleep(seconds)
+        stop.set()
+        for thread in threads:
+            thread.join()
+
+    totals = {}
+    for kind, done, locked in counts:
+        total_done, total_locked = totals.get(kind, (0, 0))
+        totals[kind] = (total_done + done, total_locked + locked)
+    return totals
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--readers', type=int, default=8)
+    parser.add_argument('--writers', type=int, default=2)
+    options = parser.parse_args()
+
+    print(f'{options.readers} readers, {options.writers} writers, {options.seconds:g}s per run')
+    print(f'{"configuration":<15}{"reads/s":>12}{"writes/s":>12}{"locked":>10}')
+    for label, tuned in (('default', False), ('SQLITE_PRAGMAS', True)):
+        totals = run(tuned, options.seconds, options.readers, options.writers)
+        reads, read_locked = totals.get('read', (0, 0))
+        writes, write_locked = totals.get('write', (0, 0))
+        print(
+            f'{label:<15}{reads / options.seconds:>12,.0f}{writes / options.seconds:>12,.0f}'
+            f'{read_locked + write_locked:>10,}'
+        )
+
+if __name__ == '__main__':
+    main()